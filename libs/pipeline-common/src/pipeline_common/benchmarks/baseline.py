@@ -0,0 +1,161 @@
+import json
+import multiprocessing
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable
+
+# A stage regresses if its throughput drops, or its peak memory grows, by more than
+# the tolerance. Small peaks are noisy, so the memory check has an absolute slack.
+DEFAULT_TOLERANCE = 0.2
+MEMORY_SLACK_MB = 16.0
+
+
+@dataclass
+class BenchmarkResult:
+    """The best time and the peak memory of one stage at one data size"""
+
+    stage: str
+    size: str
+    rows: int
+    seconds: float
+    peak_rss_mb: float
+
+    @property
+    def key(self) -> str:
+        return f'{self.stage}/{self.size}'
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float('inf')
+
+
+def run_isolated(case: Callable[..., BenchmarkResult], *args) -> BenchmarkResult:
+    """
+    Run a benchmark case in a fresh process
+
+    Every case starts from the same memory state, so its peak RSS does not depend on
+    what the allocators of the cases before it kept.
+
+    Args:
+        case (Callable[..., BenchmarkResult]): A module level function
+        *args: The arguments of the case
+
+    Returns:
+        BenchmarkResult: The result of the case
+    """
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context('spawn')
+    ) as pool:
+        return pool.submit(case, *args).result()
+
+
+def time_best_of(run: Callable[[], object], repeats: int) -> float:
+    """The fastest of `repeats` runs in seconds, the least noisy estimate"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _machine() -> dict:
+    return {
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+    }
+
+
+def _regressions(
+    result: BenchmarkResult, baseline: dict, tolerance: float
+) -> list[str]:
+    regressions = []
+    baseline_rows_per_second = baseline['rows'] / baseline['seconds']
+    if result.rows_per_second < (1 - tolerance) * baseline_rows_per_second:
+        regressions.append('throughput')
+    if result.peak_rss_mb > (1 + tolerance) * baseline['peak_rss_mb'] + MEMORY_SLACK_MB:
+        regressions.append('memory')
+    return regressions
+
+
+def report(
+    results: list[BenchmarkResult],
+    baseline_path: Path,
+    update_baseline: bool = False,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> int:
+    """
+    Print the results next to the baseline and flag the regressions
+
+    The baseline is written when there is none yet, or when `update_baseline` is set.
+    Baselines are only comparable on the same machine, a baseline recorded on
+    another one is reported as such.
+
+    Args:
+        results (list[BenchmarkResult]): The results of the suite
+        baseline_path (Path): The JSON file of the baseline
+        update_baseline (bool): Whether to replace the baseline with the results
+        tolerance (float): The relative change that counts as a regression
+
+    Returns:
+        int: The exit code, 1 if any stage regressed
+    """
+    baseline = None
+    if baseline_path.exists():
+        with baseline_path.open() as f:
+            baseline = json.load(f)
+        if baseline['machine'] != _machine():
+            print(
+                f'The baseline was recorded on another machine: {baseline["machine"]}'
+            )
+
+    print(
+        f'{"stage":<10} {"size":>7} {"rows":>9} {"seconds":>8} {"rows/s":>10} '
+        f'{"peak MB":>8} {"vs baseline":>22}'
+    )
+    n_regressions = 0
+    for result in results:
+        comparison = ''
+        if baseline is not None and result.key in baseline['results']:
+            reference = baseline['results'][result.key]
+            throughput_change = result.rows_per_second / (
+                reference['rows'] / reference['seconds']
+            )
+            comparison = (
+                f'{throughput_change:5.2f}x rows/s '
+                f'{result.peak_rss_mb - reference["peak_rss_mb"]:+6.1f} MB'
+            )
+            regressions = _regressions(result, reference, tolerance)
+            if regressions:
+                n_regressions += 1
+                comparison += f'  REGRESSED ({", ".join(regressions)})'
+        print(
+            f'{result.stage:<10} {result.size:>7} {result.rows:>9} '
+            f'{result.seconds:>8.3f} {result.rows_per_second:>10.1f} '
+            f'{result.peak_rss_mb:>8.1f} {comparison}'
+        )
+
+    if baseline is None or update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with baseline_path.open('w') as f:
+            json.dump(
+                {
+                    'machine': _machine(),
+                    'recorded_at': time.time(),
+                    'results': {result.key: asdict(result) for result in results},
+                },
+                f,
+                indent=4,
+            )
+        print(f'Saved the baseline to {baseline_path}')
+    elif n_regressions:
+        print(
+            f'{n_regressions} of {len(results)} results regressed by more than '
+            f'{tolerance:.0%}'
+        )
+    return 1 if n_regressions else 0
@@ -0,0 +1,45 @@
+import os
+import threading
+import time
+
+
+def _current_rss() -> int:
+    # Resident set size in bytes (Linux), the second field of /proc/self/statm
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class PeakRssSampler:
+    """
+    Context manager that samples the resident set size of the current process.
+
+    `ru_maxrss` is a high-water mark for the whole process lifetime, so work that
+    peaks lower than e.g. the imports would not show up. Sampling the current RSS in
+    a background thread measures the peak of the wrapped block only.
+    """
+
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.baseline = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    @property
+    def peak_increase_mb(self) -> float:
+        return (self.peak - self.baseline) / 1024**2
+
+    def _sample(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _current_rss())
+            time.sleep(self.interval)
+
+    def __enter__(self) -> 'PeakRssSampler':
+        self.baseline = self.peak = _current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
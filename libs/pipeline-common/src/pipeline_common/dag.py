@@ -0,0 +1,248 @@
+import hashlib
+import inspect
+import io
+import json
+import os
+import pickle
+import shutil
+import time
+from dataclasses import dataclass
+from graphlib import TopologicalSorter
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Optional, Sequence, Union
+
+import polars as pl
+from loguru import logger
+
+from pipeline_common import instrumentation
+
+METADATA_FILE = '_stage.json'
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline.
+
+    `run` is called with the outputs of the `inputs` stages as keyword arguments, and
+    with a function returning the output for every one of `lazy_inputs`, so an
+    expensive input (e.g. tuning) is only run or loaded if the stage needs it.
+
+    The output of a cached stage is stored under a digest of the stage name, its
+    `config`, the source of the modules of `run` and `code` and the digests of its
+    inputs. A stage with `cache=False` reads an external source and always runs, its
+    output is addressed by its content instead, so the stages downstream are still
+    skipped when it returns the same data. A stage with `sink=True` writes to an
+    external system (e.g. the feature store), so it always runs and its output is
+    never cached; no stage may depend on it.
+    """
+
+    name: str
+    run: Callable[..., Any]
+    inputs: tuple[str, ...] = ()
+    lazy_inputs: tuple[str, ...] = ()
+    config: Any = None
+    code: tuple[Union[ModuleType, Callable], ...] = ()
+    cache: bool = True
+    sink: bool = False
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, 'model_dump'):
+        return value.model_dump(mode='json')
+    return str(value)
+
+
+def _source_digest(code: Union[ModuleType, Callable]) -> str:
+    # The whole module, so a change to a helper of the function counts as well
+    module = code if isinstance(code, ModuleType) else inspect.getmodule(code)
+    return hashlib.sha256(inspect.getsource(module).encode()).hexdigest()
+
+
+def _content_digest(output: Any) -> str:
+    digest = hashlib.sha256()
+    if isinstance(output, pl.LazyFrame):
+        output = output.collect()
+    if isinstance(output, pl.DataFrame):
+        # The IPC bytes hold the schema and the values, unlike the row hashes they are
+        # meant to stay the same across Polars versions
+        buffer = io.BytesIO()
+        output.rechunk().write_ipc(buffer, compression='uncompressed')
+        digest.update(buffer.getvalue())
+    else:
+        digest.update(pickle.dumps(output))
+    return digest.hexdigest()[:32]
+
+
+def _height(output: Any) -> Optional[int]:
+    return output.height if isinstance(output, pl.DataFrame) else None
+
+
+class DagRunner:
+    """
+    Runs the stages a target depends on, skipping those whose output is cached.
+
+    Outputs are pulled from the targets: a stage is only run, or its cached output
+    loaded, if a stage that runs needs it. A target whose inputs have not changed
+    is loaded from the cache without touching the stages upstream of it, except the
+    uncached ones its digest depends on. The latest `keep` outputs of every stage are
+    kept.
+
+    Layout:
+        <cache_dir>/<stage>/<digest>/output.parquet (DataFrames) or output.pkl
+        <cache_dir>/<stage>/<digest>/_stage.json (written last)
+    """
+
+    def __init__(
+        self, stages: Sequence[Stage], cache_dir: Optional[Path], keep: int = 3
+    ):
+        """
+        Set up the runner
+
+        Args:
+            stages (Sequence[Stage]): The stages, in any order
+            cache_dir (Optional[Path]): The cache directory, None to run every stage
+            keep (int): The number of outputs kept per stage
+
+        Raises:
+            ValueError: If a stage depends on an unknown stage, on a sink or on
+                itself
+        """
+        self._stages = {stage.name: stage for stage in stages}
+        self._cache_dir = cache_dir
+        self._keep = keep
+        self._digests: dict[str, str] = {}
+        self._outputs: dict[str, Any] = {}
+
+        for stage in stages:
+            unknown = set(stage.inputs + stage.lazy_inputs) - set(self._stages)
+            if unknown:
+                raise ValueError(
+                    f'Stage {stage.name} depends on unknown stages {sorted(unknown)}'
+                )
+            sinks = [
+                input_name
+                for input_name in stage.inputs + stage.lazy_inputs
+                if self._stages[input_name].sink
+            ]
+            if sinks:
+                raise ValueError(f'Stage {stage.name} depends on the sinks {sinks}')
+        # Raises a CycleError (a ValueError) on cycles
+        TopologicalSorter(
+            {
+                stage.name: stage.inputs + stage.lazy_inputs
+                for stage in self._stages.values()
+            }
+        ).prepare()
+
+    def run(self, targets: Sequence[str]) -> dict[str, Any]:
+        """
+        Get the outputs of the targets
+
+        Args:
+            targets (Sequence[str]): The names of the stages to get the output of
+
+        Returns:
+            dict[str, Any]: The output of every target
+        """
+        return {target: self._output(target) for target in targets}
+
+    def _entry_dir(self, name: str) -> Optional[Path]:
+        if self._cache_dir is None:
+            return None
+        return self._cache_dir / name / self._digest(name)
+
+    def _digest(self, name: str) -> str:
+        if name in self._digests:
+            return self._digests[name]
+
+        stage = self._stages[name]
+        if not stage.cache:
+            self._digests[name] = _content_digest(self._output(name))
+            return self._digests[name]
+
+        key = {
+            'stage': name,
+            'config': stage.config,
+            'code': [_source_digest(code) for code in (stage.run, *stage.code)],
+            'inputs': {
+                input_name: self._digest(input_name)
+                for input_name in stage.inputs + stage.lazy_inputs
+            },
+        }
+        self._digests[name] = hashlib.sha256(
+            json.dumps(key, sort_keys=True, default=_json_default).encode()
+        ).hexdigest()[:32]
+        return self._digests[name]
+
+    def _output(self, name: str) -> Any:
+        if name in self._outputs:
+            return self._outputs[name]
+
+        stage = self._stages[name]
+        entry_dir = self._entry_dir(name) if stage.cache and not stage.sink else None
+        if entry_dir is not None and (entry_dir / METADATA_FILE).exists():
+            logger.info(f'Stage {name} is unchanged, loading its output')
+            # Touched, so the entries are evicted least recently used first
+            os.utime(entry_dir)
+            with instrumentation.measure(
+                name, kind='stage', cache='hit'
+            ) as measurement:
+                self._outputs[name] = self._load(entry_dir)
+                measurement.rows_out = _height(self._outputs[name])
+            return self._outputs[name]
+
+        kwargs = {input_name: self._output(input_name) for input_name in stage.inputs}
+        kwargs.update(
+            {
+                input_name: (lambda input_name=input_name: self._output(input_name))
+                for input_name in stage.lazy_inputs
+            }
+        )
+        logger.info(f'Running stage {name}')
+        with instrumentation.measure(
+            name, kind='stage', cache='miss' if entry_dir is not None else 'off'
+        ) as measurement:
+            measurement.rows_in = sum(
+                _height(kwargs[input_name]) or 0 for input_name in stage.inputs
+            )
+            output = stage.run(**kwargs)
+            if isinstance(output, pl.LazyFrame):
+                output = output.collect()
+            measurement.rows_out = _height(output)
+
+            if entry_dir is not None:
+                self._save(name, entry_dir, output)
+        logger.info(f'Stage {name} took {measurement.wall_seconds:.2f} s')
+        self._outputs[name] = output
+        return output
+
+    def _save(self, name: str, entry_dir: Path, output: Any) -> None:
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        entry_dir.mkdir(parents=True)
+        if isinstance(output, pl.DataFrame):
+            output.write_parquet(entry_dir / 'output.parquet')
+        else:
+            with (entry_dir / 'output.pkl').open('wb') as f:
+                pickle.dump(output, f)
+
+        # The metadata marks the entry as complete, so it is written last
+        tmp_path = entry_dir / f'{METADATA_FILE}.tmp'
+        with tmp_path.open('w') as f:
+            json.dump({'stage': name, 'created_at': time.time()}, f, indent=4)
+        os.replace(tmp_path, entry_dir / METADATA_FILE)
+
+        entries = sorted(
+            (entry for entry in entry_dir.parent.iterdir() if entry.is_dir()),
+            key=lambda entry: entry.stat().st_mtime,
+            reverse=True,
+        )
+        for entry in entries[self._keep :]:
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _load(self, entry_dir: Path) -> Any:
+        if (entry_dir / 'output.parquet').exists():
+            return pl.read_parquet(entry_dir / 'output.parquet')
+        with (entry_dir / 'output.pkl').open('rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,168 @@
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Literal, Optional
+
+from loguru import logger
+
+from pipeline_common import instrumentation
+from pipeline_common.local_feature_store import LocalFeatureStore
+
+
+@contextmanager
+def log_duration(operation: str) -> Iterator[None]:
+    """Log how long the wrapped operation took"""
+    start = time.perf_counter()
+    yield
+    logger.info(f'{operation} took {time.perf_counter() - start:.2f}s')
+
+
+class FeatureStoreConnection:
+    """
+    A lazily created connection to the feature store of one Hopsworks project.
+
+    The login only happens on first use, and the handles of feature groups and
+    feature views are cached, so all managers sharing a connection pay for the
+    login and the metadata lookups once per run.
+    """
+
+    def __init__(
+        self,
+        project_name: str,
+        api_key: Optional[str] = None,
+        feature_store: Optional[Any] = None,
+    ):
+        """
+        Set up the connection, without logging in yet
+
+        Args:
+            project_name (str): The name of the Hopsworks project
+            api_key (Optional[str]): The API key for the Hopsworks project
+            feature_store (Optional[Any]): An existing feature store with the same
+                interface (e.g. the in-memory stand-in), used instead of logging in
+        """
+        self.project_name = project_name
+        self._api_key = api_key
+        self._feature_store = feature_store
+        self._feature_groups: dict[tuple[str, int], Any] = {}
+        self._feature_views: dict[tuple[str, Optional[int]], Any] = {}
+        self._lock = threading.RLock()
+
+    @property
+    def feature_store(self) -> Any:
+        with self._lock:
+            if self._feature_store is None:
+                # Imported here, it takes seconds and runs on the local store never
+                # need it
+                import hopsworks
+
+                with log_duration(
+                    f'Logging in to Hopsworks project {self.project_name}'
+                ):
+                    with instrumentation.measure(
+                        'hopsworks_login', project=self.project_name
+                    ):
+                        project = hopsworks.login(
+                            project=self.project_name, api_key_value=self._api_key
+                        )
+                with log_duration('Getting the feature store'):
+                    self._feature_store = project.get_feature_store()
+
+            return self._feature_store
+
+    def get_or_create_feature_group(
+        self, name: str, version: int, **kwargs: Any
+    ) -> Any:
+        with self._lock:
+            if (name, version) not in self._feature_groups:
+                with log_duration(
+                    f'Getting or creating feature group {name} v{version}'
+                ):
+                    self._feature_groups[(name, version)] = (
+                        self.feature_store.get_or_create_feature_group(
+                            name=name, version=version, **kwargs
+                        )
+                    )
+
+            return self._feature_groups[(name, version)]
+
+    def get_feature_group(self, name: str, version: int) -> Any:
+        with self._lock:
+            if (name, version) not in self._feature_groups:
+                with log_duration(f'Getting feature group {name} v{version}'):
+                    self._feature_groups[(name, version)] = (
+                        self.feature_store.get_feature_group(name, version)
+                    )
+
+            return self._feature_groups[(name, version)]
+
+    def get_or_create_feature_view(self, name: str, version: int, **kwargs: Any) -> Any:
+        with self._lock:
+            if (name, version) not in self._feature_views:
+                with log_duration(
+                    f'Getting or creating feature view {name} v{version}'
+                ):
+                    self._feature_views[(name, version)] = (
+                        self.feature_store.get_or_create_feature_view(
+                            name=name, version=version, **kwargs
+                        )
+                    )
+
+            return self._feature_views[(name, version)]
+
+    def get_feature_view(self, name: str, version: Optional[int] = None) -> Any:
+        with self._lock:
+            if (name, version) not in self._feature_views:
+                with log_duration(f'Getting feature view {name}'):
+                    self._feature_views[(name, version)] = (
+                        self.feature_store.get_feature_view(name, version)
+                    )
+
+            return self._feature_views[(name, version)]
+
+
+_connections: dict[tuple[str, str, Optional[Path]], FeatureStoreConnection] = {}
+_connections_lock = threading.Lock()
+
+
+def get_connection(
+    project_name: str,
+    api_key: str,
+    backend: Literal['hopsworks', 'local'] = 'hopsworks',
+    local_store_dir: Optional[Path] = None,
+) -> FeatureStoreConnection:
+    """
+    Get the shared connection of a project, creating it on first use.
+
+    With the local feature store backend, the connection wraps the local store and
+    never logs in to Hopsworks.
+
+    Args:
+        project_name (str): The name of the Hopsworks project
+        api_key (str): The API key for the Hopsworks project
+        backend (Literal['hopsworks', 'local']): The feature store backend
+        local_store_dir (Optional[Path]): The directory of the local feature store,
+            required with the local backend
+
+    Returns:
+        FeatureStoreConnection: The connection shared by all callers in this process
+
+    Raises:
+        ValueError: If the local backend has no store directory
+    """
+    if backend == 'local' and local_store_dir is None:
+        raise ValueError('The local feature store backend needs a store directory.')
+
+    key = (project_name, backend, local_store_dir if backend == 'local' else None)
+    with _connections_lock:
+        if key not in _connections:
+            _connections[key] = FeatureStoreConnection(
+                project_name,
+                api_key,
+                feature_store=LocalFeatureStore(local_store_dir)
+                if backend == 'local'
+                else None,
+            )
+
+        return _connections[key]
@@ -0,0 +1,282 @@
+import cProfile
+import faulthandler
+import json
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from loguru import logger
+
+# How often the resident set size is sampled while a measurement is active
+SAMPLE_INTERVAL_SECONDS = 0.01
+METRIC_PREFIX = 'solar_pipeline'
+
+
+@dataclass
+class Measurement:
+    """
+    What one stage or external call cost.
+
+    The CPU time is that of the whole process (all threads, not child processes)
+    while the measurement was active, so measurements that overlap, e.g. concurrent
+    requests, share it. The peak RSS is sampled, so it is that of the measured block
+    and not the high-water mark of the process.
+    """
+
+    name: str
+    kind: str
+    labels: dict[str, str] = field(default_factory=dict)
+    parent: Optional[str] = None
+    started_at: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    peak_rss_bytes: int = 0
+    rows_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    bytes_transferred: Optional[int] = None
+    error: Optional[str] = None
+
+
+_lock = threading.Lock()
+_records: list[Measurement] = []
+_active: set[int] = set()
+_peaks: dict[int, int] = {}
+_stack = threading.local()
+_sampler: Optional[threading.Thread] = None
+_service = 'pipeline'
+_profile_dir: Optional[Path] = None
+_profiling = False
+
+
+def _current_rss() -> int:
+    # Resident set size in bytes (Linux), the second field of /proc/self/statm
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return 0
+
+
+def _sample() -> None:
+    while True:
+        time.sleep(SAMPLE_INTERVAL_SECONDS)
+        if not _active:
+            continue
+        rss = _current_rss()
+        with _lock:
+            for key in _active:
+                _peaks[key] = max(_peaks[key], rss)
+
+
+def configure(service: str, profile_dir: Optional[Path] = None) -> None:
+    """
+    Set up the instrumentation of a run
+
+    With a profile directory, every stage is profiled with cProfile into
+    `<profile_dir>/<stage>.prof` (pstats format, e.g. for snakeviz), and the stacks
+    of all threads are dumped to stderr on SIGUSR1, like `py-spy dump` would, to see
+    the hot path of a long running stage.
+
+    Args:
+        service (str): The name of the service, a label of every metric
+        profile_dir (Optional[Path]): Where to write the profiles, None to not profile
+    """
+    global _service, _profile_dir
+    _service = service
+    _profile_dir = profile_dir
+    if profile_dir is not None:
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        if hasattr(signal, 'SIGUSR1'):
+            faulthandler.register(signal.SIGUSR1, all_threads=True)
+            logger.info(
+                f'Profiling stages into {profile_dir}, dump the stacks with kill -USR1 {os.getpid()}'
+            )
+
+
+@contextmanager
+def measure(name: str, kind: str = 'call', **labels: Any) -> Iterator[Measurement]:
+    """
+    Measure the wrapped block and add it to the run report
+
+    The caller sets `rows_in`, `rows_out` and `bytes_transferred` on the yielded
+    measurement where they are known. Exceptions are recorded and raised again.
+
+    Args:
+        name (str): The name of the stage or call, e.g. `meteostat_request`
+        kind (str): `stage`, `call`, `trial` or `fold`
+        **labels (Any): Labels of the measurement, e.g. the station
+
+    Yields:
+        Measurement: The measurement, filled in when the block exits
+    """
+    global _sampler, _profiling
+
+    if not hasattr(_stack, 'names'):
+        _stack.names = []
+    stack = _stack.names
+    measurement = Measurement(
+        name=name,
+        kind=kind,
+        labels={key: str(value) for key, value in labels.items()},
+        parent=stack[-1] if stack else None,
+        started_at=time.time(),
+    )
+    key = id(measurement)
+    with _lock:
+        _active.add(key)
+        _peaks[key] = _current_rss()
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample, daemon=True)
+            _sampler.start()
+
+    # Only one profiler can be active, nested stages are part of the outer profile
+    profiler = None
+    if kind == 'stage' and _profile_dir is not None and not _profiling:
+        _profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    stack.append(name)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield measurement
+    except BaseException as e:
+        measurement.error = type(e).__name__
+        raise
+    finally:
+        measurement.wall_seconds = time.perf_counter() - wall_start
+        measurement.cpu_seconds = time.process_time() - cpu_start
+        stack.pop()
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(_profile_dir / f'{name}.prof')
+            _profiling = False
+        with _lock:
+            _active.discard(key)
+            measurement.peak_rss_bytes = max(_peaks.pop(key), _current_rss())
+            _records.append(measurement)
+
+
+def records() -> list[dict]:
+    """The measurements of this process so far, e.g. to return from a worker"""
+    with _lock:
+        return [asdict(measurement) for measurement in _records]
+
+
+def add_records(worker_records: list[dict]) -> None:
+    """Add the measurements of a worker process to the report of this process"""
+    with _lock:
+        _records.extend(Measurement(**record) for record in worker_records)
+
+
+def _summary(measurements: list[Measurement]) -> list[dict]:
+    totals: dict[tuple[str, str], dict] = {}
+    for measurement in measurements:
+        total = totals.setdefault(
+            (measurement.kind, measurement.name),
+            {
+                'kind': measurement.kind,
+                'name': measurement.name,
+                'count': 0,
+                'errors': 0,
+                'wall_seconds': 0.0,
+                'cpu_seconds': 0.0,
+                'peak_rss_bytes': 0,
+                'rows_in': 0,
+                'rows_out': 0,
+                'bytes_transferred': 0,
+            },
+        )
+        total['count'] += 1
+        total['errors'] += measurement.error is not None
+        total['wall_seconds'] += measurement.wall_seconds
+        total['cpu_seconds'] += measurement.cpu_seconds
+        total['peak_rss_bytes'] = max(
+            total['peak_rss_bytes'], measurement.peak_rss_bytes
+        )
+        for counter in ('rows_in', 'rows_out', 'bytes_transferred'):
+            total[counter] += getattr(measurement, counter) or 0
+    return list(totals.values())
+
+
+def _prometheus_text(summary: list[dict], finished_at: float) -> str:
+    # Gauges, every run replaces the values of the previous one
+    metrics = [
+        ('calls', 'count', 'Number of measured stages and calls'),
+        ('errors', 'errors', 'Number of stages and calls that raised'),
+        ('wall_seconds', 'wall_seconds', 'Wall time'),
+        ('cpu_seconds', 'cpu_seconds', 'CPU time of the process'),
+        ('peak_rss_bytes', 'peak_rss_bytes', 'Peak resident set size'),
+        ('rows_in', 'rows_in', 'Rows going in'),
+        ('rows_out', 'rows_out', 'Rows coming out'),
+        ('transferred_bytes', 'bytes_transferred', 'Bytes transferred'),
+    ]
+    lines = []
+    for metric, column, description in metrics:
+        lines.append(f'# HELP {METRIC_PREFIX}_{metric} {description} in the last run')
+        lines.append(f'# TYPE {METRIC_PREFIX}_{metric} gauge')
+        lines.extend(
+            f'{METRIC_PREFIX}_{metric}{{service="{_service}",kind="{total["kind"]}",'
+            f'name="{total["name"]}"}} {total[column]}'
+            for total in summary
+        )
+    lines.append(f'# HELP {METRIC_PREFIX}_last_run_timestamp_seconds End of the run')
+    lines.append(f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge')
+    lines.append(
+        f'{METRIC_PREFIX}_last_run_timestamp_seconds{{service="{_service}"}} {finished_at}'
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def write_report(report_dir: Path) -> Path:
+    """
+    Write the measurements of the run as a JSON report and a Prometheus textfile
+
+    The report keeps every measurement, `run_<time>.json`. The textfile,
+    `<service>.prom`, holds the totals per stage and call and is replaced on every
+    run, for the textfile collector of the node exporter.
+
+    Args:
+        report_dir (Path): The directory to write to
+
+    Returns:
+        Path: The JSON report
+    """
+    finished_at = time.time()
+    with _lock:
+        measurements = list(_records)
+    summary = _summary(measurements)
+
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_path = report_dir / f'run_{datetime.now():%Y-%m-%dT%H-%M-%S}.json'
+    with report_path.open('w') as f:
+        json.dump(
+            {
+                'service': _service,
+                'pid': os.getpid(),
+                'started_at': min(
+                    (measurement.started_at for measurement in measurements),
+                    default=finished_at,
+                ),
+                'finished_at': finished_at,
+                'summary': summary,
+                'measurements': [asdict(measurement) for measurement in measurements],
+            },
+            f,
+            indent=4,
+        )
+
+    # Written to a temporary file first, so the collector never reads half a file
+    prometheus_path = report_dir / f'{_service}.prom'
+    tmp_path = prometheus_path.with_suffix('.tmp')
+    tmp_path.write_text(_prometheus_text(summary, finished_at))
+    os.replace(tmp_path, prometheus_path)
+
+    logger.info(f'Wrote the run report to {report_path}')
+    return report_path
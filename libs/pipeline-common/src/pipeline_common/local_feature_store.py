@@ -0,0 +1,509 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+import polars as pl
+from loguru import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+@dataclass
+class LocalFeature:
+    name: str
+    description: str = ''
+
+
+def _to_datetime(value: Union[str, datetime, None]) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def _write_json(file_path: Path, content: dict) -> None:
+    """Write a JSON file atomically, so a crash never leaves half written metadata"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(content, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, file_path)
+
+
+class LocalQuery:
+    """A `select_all` query on a local feature group, optionally as of a point in time"""
+
+    def __init__(self, feature_group: 'LocalFeatureGroup', as_of: Optional[Any] = None):
+        self.feature_group = feature_group
+        self._as_of = _to_datetime(as_of)
+
+    def as_of(self, wallclock_time: Union[str, datetime]) -> 'LocalQuery':
+        return LocalQuery(self.feature_group, as_of=wallclock_time)
+
+    @property
+    def featuregroups(self) -> list['LocalFeatureGroup']:
+        return [self.feature_group]
+
+    def scan(self) -> pl.LazyFrame:
+        return self.feature_group.scan(as_of=self._as_of)
+
+    def read(self) -> 'pd.DataFrame':
+        return self.scan().collect().to_pandas()
+
+    def to_dict(self) -> dict:
+        return {
+            'feature_group_name': self.feature_group.name,
+            'feature_group_version': self.feature_group.version,
+            'as_of': self._as_of.isoformat() if self._as_of else None,
+        }
+
+
+class LocalFeatureGroup:
+    """
+    A feature group stored as partitioned Parquet files on the local disk.
+
+    Every insert is written as a new commit partition,
+    `<name>_<version>/commit=<commit id>/data.parquet`, and recorded with its commit
+    time in `_metadata.json`. Inserts are upserts on the primary key: a read keeps,
+    per primary key, the row of the latest commit. Reads as of a point in time only
+    consider the commits made until then, like time travel on an offline feature
+    group.
+    """
+
+    def __init__(self, root_dir: Path, name: str, version: int):
+        self.name = name
+        self.version = version
+        self._dir = root_dir / f'{name}_{version}'
+        self._metadata_path = self._dir / '_metadata.json'
+        self._lock = threading.Lock()
+
+        with self._metadata_path.open('r') as f:
+            self._metadata: dict = json.load(f)
+
+    @classmethod
+    def create(
+        cls,
+        root_dir: Path,
+        name: str,
+        version: int,
+        primary_key: list[str],
+        event_time: Optional[str] = None,
+        description: str = '',
+    ) -> 'LocalFeatureGroup':
+        _write_json(
+            root_dir / f'{name}_{version}' / '_metadata.json',
+            {
+                'description': description,
+                'primary_key': primary_key,
+                'event_time': event_time,
+                'features': {},
+                'commits': [],
+            },
+        )
+        return cls(root_dir, name, version)
+
+    @property
+    def primary_key(self) -> list[str]:
+        return self._metadata['primary_key']
+
+    @property
+    def event_time(self) -> Optional[str]:
+        return self._metadata['event_time']
+
+    @property
+    def features(self) -> list[LocalFeature]:
+        return [
+            LocalFeature(name=name, description=description)
+            for name, description in self._metadata['features'].items()
+        ]
+
+    def insert(
+        self,
+        features: Union['pd.DataFrame', pl.DataFrame],
+        write_options: Optional[dict] = None,
+    ) -> tuple[None, None]:
+        data = (
+            features if isinstance(features, pl.DataFrame) else pl.from_pandas(features)
+        )
+
+        with self._lock:
+            commit_id = len(self._metadata['commits']) + 1
+            commit_dir = self._dir / f'commit={commit_id:08d}'
+            commit_dir.mkdir(parents=True, exist_ok=True)
+
+            tmp_path = commit_dir / 'data.parquet.tmp'
+            data.write_parquet(tmp_path)
+            os.replace(tmp_path, commit_dir / 'data.parquet')
+
+            # The commit only becomes visible once it is recorded in the metadata
+            for column in data.columns:
+                self._metadata['features'].setdefault(column, '')
+            self._metadata['commits'].append(
+                {
+                    'commit_id': commit_id,
+                    'committed_at': datetime.now().isoformat(),
+                    'rows': data.height,
+                }
+            )
+            _write_json(self._metadata_path, self._metadata)
+
+        logger.info(
+            f'Committed {data.height} rows to local feature group {self.name} version {self.version} (commit {commit_id})'
+        )
+        # Like a stream feature group, a local insert does not start a job
+        return None, None
+
+    def update_feature_description(self, name: str, description: str) -> None:
+        self.update_features([LocalFeature(name=name, description=description)])
+
+    def update_features(self, features: list[LocalFeature]) -> None:
+        with self._lock:
+            for feature in features:
+                self._metadata['features'][feature.name] = feature.description
+            _write_json(self._metadata_path, self._metadata)
+
+    def commit_details(
+        self, wallclock_time: Optional[Any] = None, limit: Optional[int] = None
+    ) -> dict[int, dict[str, Any]]:
+        """Get the commits until `wallclock_time`, latest first, shaped like in hsfs"""
+        wallclock_time = _to_datetime(wallclock_time)
+        commits = [
+            commit
+            for commit in reversed(self._metadata['commits'])
+            if wallclock_time is None
+            or datetime.fromisoformat(commit['committed_at']) <= wallclock_time
+        ]
+        return {
+            commit['commit_id']: {
+                'committedOn': commit['committed_at'],
+                'rowsInserted': commit['rows'],
+            }
+            for commit in commits[:limit]
+        }
+
+    def scan(self, as_of: Optional[datetime] = None) -> pl.LazyFrame:
+        """
+        Scan the feature group as of a point in time
+
+        Args:
+            as_of (Optional[datetime]): Only commits made until then are read, all
+                commits when None
+
+        Returns:
+            pl.LazyFrame: The latest row per primary key
+        """
+        commits = [
+            commit
+            for commit in self._metadata['commits']
+            if as_of is None or datetime.fromisoformat(commit['committed_at']) <= as_of
+        ]
+        if not commits:
+            return pl.LazyFrame(
+                schema=dict.fromkeys(self._metadata['features'], pl.String)
+            )
+
+        lf = pl.concat(
+            [
+                pl.scan_parquet(
+                    self._dir / f'commit={commit["commit_id"]:08d}' / 'data.parquet'
+                )
+                for commit in commits
+            ],
+            how='diagonal_relaxed',
+        )
+        if len(commits) == 1:
+            return lf
+
+        # The commits are concatenated in order, so the last row per key is the latest
+        return lf.unique(subset=self.primary_key, keep='last', maintain_order=True)
+
+    def select_all(self) -> LocalQuery:
+        return LocalQuery(self)
+
+    def read(self) -> pl.DataFrame:
+        return self.scan().sort(self.primary_key).collect()
+
+
+class LocalFeatureView:
+    """A feature view on a local feature group, with the Hopsworks read interface"""
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        query: LocalQuery,
+        description: str = '',
+        labels: Optional[list[str]] = None,
+    ):
+        self.name = name
+        self.version = version
+        self.query = query
+        self.description = description
+        self.labels = labels or []
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'description': self.description,
+            'labels': self.labels,
+            'query': self.query.to_dict(),
+        }
+
+    def get_batch_data(
+        self,
+        start_time: Optional[Union[str, datetime]] = None,
+        end_time: Optional[Union[str, datetime]] = None,
+        primary_key: bool = False,
+        event_time: bool = False,
+        dataframe_type: str = 'default',
+        **kwargs: Any,
+    ) -> Union['pd.DataFrame', pl.DataFrame]:
+        """
+        Get the features between two event times, without the labels
+
+        Args:
+            start_time (Optional[Union[str, datetime]]): The first event time
+            end_time (Optional[Union[str, datetime]]): The last event time
+            primary_key (bool): Whether to keep the primary key columns
+            event_time (bool): Whether to keep the event time column
+            dataframe_type (str): `polars` for a Polars DataFrame, Pandas otherwise
+
+        Returns:
+            Union[pd.DataFrame, pl.DataFrame]: The features
+        """
+        X, _ = self.training_data(
+            start_time,
+            end_time,
+            label=self.labels,
+            primary_key=primary_key,
+            event_time=event_time,
+            dataframe_type=dataframe_type,
+        )
+        return X
+
+    def training_data(
+        self,
+        start_time: Optional[Union[str, datetime]] = None,
+        end_time: Optional[Union[str, datetime]] = None,
+        label: Optional[Union[str, list[str]]] = None,
+        primary_key: bool = False,
+        event_time: bool = False,
+        dataframe_type: str = 'default',
+        **kwargs: Any,
+    ) -> tuple[
+        Union['pd.DataFrame', pl.DataFrame],
+        Optional[Union['pd.DataFrame', pl.DataFrame]],
+    ]:
+        """
+        Get the training data between two event times
+
+        Args:
+            start_time (Optional[Union[str, datetime]]): The first event time
+            end_time (Optional[Union[str, datetime]]): The last event time
+            label (Optional[Union[str, list[str]]]): The label columns, the labels of
+                the feature view when None
+            primary_key (bool): Whether to keep the primary key columns in X
+            event_time (bool): Whether to keep the event time column in X
+            dataframe_type (str): `polars` for Polars DataFrames, Pandas otherwise
+
+        Returns:
+            tuple: X (features) and y (labels), y is None without labels
+        """
+        labels = [label] if isinstance(label, str) else list(label or self.labels)
+        feature_group = self.query.feature_group
+
+        data = self._scan(start_time, end_time).collect()
+        excluded = set(labels)
+        if not primary_key:
+            excluded.update(feature_group.primary_key)
+        if not event_time and feature_group.event_time:
+            excluded.add(feature_group.event_time)
+
+        X = data.select([c for c in data.columns if c not in excluded])
+        y = data.select(labels) if labels else None
+        if dataframe_type == 'polars':
+            return X, y
+        return X.to_pandas(), y.to_pandas() if y is not None else None
+
+    def _scan(
+        self,
+        start_time: Optional[Union[str, datetime]],
+        end_time: Optional[Union[str, datetime]],
+    ) -> pl.LazyFrame:
+        feature_group = self.query.feature_group
+        lf = self.query.scan()
+
+        if feature_group.event_time is not None:
+            event_time = pl.col(feature_group.event_time).cast(pl.Datetime)
+            if start_time is not None:
+                lf = lf.filter(event_time >= _to_datetime(start_time))
+            if end_time is not None:
+                lf = lf.filter(event_time <= _to_datetime(end_time))
+            lf = lf.sort(feature_group.primary_key)
+
+        return lf
+
+
+class LocalFeatureStore:
+    """
+    A feature store backend on the local disk, with the Hopsworks interface used by
+    the pipelines.
+
+    Feature groups are partitioned Parquet files with point-in-time reads (see
+    `LocalFeatureGroup`), feature views are JSON definitions on top of them. The whole
+    ETL -> training path can run against it offline.
+    """
+
+    def __init__(self, root_dir: Union[str, Path]):
+        """
+        Args:
+            root_dir (Union[str, Path]): The directory the feature store is kept in
+        """
+        self.root_dir = Path(root_dir)
+        self._feature_views_dir = self.root_dir / '_feature_views'
+        self._feature_groups: dict[tuple[str, int], LocalFeatureGroup] = {}
+        self._lock = threading.RLock()
+
+    def get_or_create_feature_group(
+        self,
+        name: str,
+        version: int,
+        primary_key: list[str],
+        event_time: Optional[str] = None,
+        description: str = '',
+        **kwargs: Any,
+    ) -> LocalFeatureGroup:
+        with self._lock:
+            if not (self.root_dir / f'{name}_{version}' / '_metadata.json').exists():
+                logger.info(f'Creating local feature group {name} version {version}')
+                self._feature_groups[(name, version)] = LocalFeatureGroup.create(
+                    self.root_dir,
+                    name,
+                    version,
+                    primary_key=primary_key,
+                    event_time=event_time,
+                    description=description,
+                )
+
+            return self.get_feature_group(name, version)
+
+    def get_feature_group(self, name: str, version: int) -> LocalFeatureGroup:
+        # One instance per feature group, so concurrent inserts share its lock
+        with self._lock:
+            if (name, version) not in self._feature_groups:
+                if not (
+                    self.root_dir / f'{name}_{version}' / '_metadata.json'
+                ).exists():
+                    raise ValueError(
+                        f'Local feature group {name} version {version} not found'
+                    )
+                self._feature_groups[(name, version)] = LocalFeatureGroup(
+                    self.root_dir, name, version
+                )
+
+            return self._feature_groups[(name, version)]
+
+    def create_feature_view(
+        self,
+        name: str,
+        query: LocalQuery,
+        version: Optional[int] = None,
+        description: str = '',
+        labels: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> LocalFeatureView:
+        """
+        Create a feature view on a query
+
+        Without a version the next free version is used, unless the latest version
+        already has the same definition, which is then returned as is.
+        """
+        with self._lock:
+            versions = self._feature_view_versions(name)
+            feature_view = LocalFeatureView(
+                name,
+                version or (max(versions, default=0) + 1),
+                query,
+                description=description,
+                labels=labels,
+            )
+
+            if version is None and versions:
+                latest = self.get_feature_view(name, max(versions))
+                if {**latest.to_dict(), 'version': None} == {
+                    **feature_view.to_dict(),
+                    'version': None,
+                }:
+                    return latest
+            elif feature_view.version in versions:
+                raise ValueError(
+                    f'Local feature view {name} version {feature_view.version} already exists'
+                )
+
+            _write_json(
+                self._feature_views_dir / f'{name}_{feature_view.version}.json',
+                feature_view.to_dict(),
+            )
+            logger.info(
+                f'Created local feature view {name} version {feature_view.version}'
+            )
+            return feature_view
+
+    def get_or_create_feature_view(
+        self,
+        name: str,
+        query: LocalQuery,
+        version: int,
+        description: str = '',
+        labels: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> LocalFeatureView:
+        """Get a version of a feature view, creating it on the query if it is missing"""
+        with self._lock:
+            if version in self._feature_view_versions(name):
+                return self.get_feature_view(name, version)
+            return self.create_feature_view(
+                name, query, version=version, description=description, labels=labels
+            )
+
+    def get_feature_view(
+        self, name: str, version: Optional[int] = None
+    ) -> LocalFeatureView:
+        if version is None:
+            version = max(self._feature_view_versions(name), default=None)
+
+        file_path = self._feature_views_dir / f'{name}_{version}.json'
+        if version is None or not file_path.exists():
+            raise ValueError(f'Local feature view {name} version {version} not found')
+
+        with file_path.open('r') as f:
+            definition = json.load(f)
+
+        query = LocalQuery(
+            self.get_feature_group(
+                definition['query']['feature_group_name'],
+                definition['query']['feature_group_version'],
+            ),
+            as_of=definition['query']['as_of'],
+        )
+        return LocalFeatureView(
+            definition['name'],
+            definition['version'],
+            query,
+            description=definition['description'],
+            labels=definition['labels'],
+        )
+
+    def _feature_view_versions(self, name: str) -> list[int]:
+        if not self._feature_views_dir.exists():
+            return []
+        return [
+            int(file_path.stem.rsplit('_', 1)[1])
+            for file_path in self._feature_views_dir.glob(f'{name}_*.json')
+            if file_path.stem.rsplit('_', 1)[0] == name
+        ]
@@ -0,0 +1,159 @@
+import importlib
+import sys
+from collections import Counter
+
+import polars as pl
+import pytest
+from pipeline_common.dag import DagRunner, Stage
+
+STAGE_MODULE = """
+def fit(data):
+    return data.height + {offset}
+"""
+
+
+@pytest.fixture
+def calls() -> Counter:
+    return Counter()
+
+
+@pytest.fixture
+def stage_module(tmp_path, monkeypatch):
+    # A stage in a module of its own, so its source can change between runs
+    module_path = tmp_path / 'dag_test_stages.py'
+    module_path.write_text(STAGE_MODULE.format(offset=1))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'dag_test_stages', raising=False)
+    module = importlib.import_module('dag_test_stages')
+    yield module
+    sys.modules.pop('dag_test_stages', None)
+
+
+def _counted(calls: Counter, name: str, function):
+    def run(**kwargs):
+        calls[name] += 1
+        return function(**kwargs)
+
+    return run
+
+
+def _data_stage(calls: Counter, values=(1, 2, 3), **kwargs) -> Stage:
+    return Stage(
+        'data',
+        _counted(calls, 'data', lambda: pl.DataFrame({'value': list(values)})),
+        **kwargs,
+    )
+
+
+def _run(stages, cache_dir, target):
+    return DagRunner(stages, cache_dir=cache_dir).run([target])[target]
+
+
+def test_unchanged_stage_is_loaded_from_the_cache(tmp_path, calls):
+    stages = [_data_stage(calls, config={'size': 3})]
+
+    first = _run(stages, tmp_path, 'data')
+    second = _run(stages, tmp_path, 'data')
+
+    assert calls['data'] == 1
+    assert second.equals(first)
+
+
+def test_changed_config_reruns_the_stage(tmp_path, calls):
+    _run([_data_stage(calls, config={'size': 3})], tmp_path, 'data')
+    _run([_data_stage(calls, config={'size': 4})], tmp_path, 'data')
+
+    assert calls['data'] == 2
+
+
+def test_changed_code_reruns_the_stage(tmp_path, calls, stage_module):
+    def stages():
+        return [
+            _data_stage(calls),
+            Stage('fit', stage_module.fit, inputs=('data',), code=(stage_module,)),
+        ]
+
+    assert _run(stages(), tmp_path / 'cache', 'fit') == 4
+    assert _run(stages(), tmp_path / 'cache', 'fit') == 4
+
+    # A different size, so the source is read again even within the mtime resolution
+    (tmp_path / 'dag_test_stages.py').write_text(STAGE_MODULE.format(offset=10))
+    importlib.reload(stage_module)
+
+    assert _run(stages(), tmp_path / 'cache', 'fit') == 13
+
+
+def test_changed_lazy_input_reruns_the_stage(tmp_path, calls):
+    def stages(n_trials):
+        return [
+            _data_stage(calls),
+            Stage(
+                'tune',
+                _counted(calls, 'tune', lambda: {'n_trials': n_trials}),
+                config={'n_trials': n_trials},
+            ),
+            Stage(
+                'fit',
+                _counted(calls, 'fit', lambda data, tune: (data.height, tune())),
+                inputs=('data',),
+                lazy_inputs=('tune',),
+            ),
+        ]
+
+    assert _run(stages(4), tmp_path, 'fit') == (3, {'n_trials': 4})
+    assert _run(stages(4), tmp_path, 'fit') == (3, {'n_trials': 4})
+    assert calls == {'data': 1, 'tune': 1, 'fit': 1}
+
+    assert _run(stages(8), tmp_path, 'fit') == (3, {'n_trials': 8})
+    assert calls == {'data': 1, 'tune': 2, 'fit': 2}
+
+
+def test_uncached_input_with_the_same_content_hits(tmp_path, calls):
+    def stages(values):
+        return [
+            _data_stage(calls, values=values, cache=False),
+            Stage(
+                'transform',
+                _counted(calls, 'transform', lambda data: data.sum()),
+                inputs=('data',),
+            ),
+        ]
+
+    _run(stages((1, 2, 3)), tmp_path, 'transform')
+    _run(stages((1, 2, 3)), tmp_path, 'transform')
+
+    # The uncached stage always runs, the stage downstream is loaded
+    assert calls == {'data': 2, 'transform': 1}
+    assert not (tmp_path / 'data').exists()
+
+    assert _run(stages((1, 2, 4)), tmp_path, 'transform').item() == 7
+    assert calls == {'data': 3, 'transform': 2}
+
+
+def test_sink_never_caches(tmp_path, calls):
+    stages = [
+        _data_stage(calls),
+        Stage(
+            'load',
+            _counted(calls, 'load', lambda data: data.height),
+            inputs=('data',),
+            sink=True,
+        ),
+    ]
+
+    _run(stages, tmp_path, 'load')
+    _run(stages, tmp_path, 'load')
+
+    assert calls == {'data': 1, 'load': 2}
+    assert not (tmp_path / 'load').exists()
+
+
+def test_stage_depending_on_a_sink_is_rejected(calls):
+    with pytest.raises(ValueError, match='sinks'):
+        DagRunner(
+            [
+                _data_stage(calls, sink=True),
+                Stage('fit', lambda data: data, inputs=('data',)),
+            ],
+            cache_dir=None,
+        )
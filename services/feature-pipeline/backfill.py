@@ -0,0 +1,246 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Optional
+
+import polars as pl
+from config import config
+from etl import extract, transform, watermarks
+from etl.backfill_checkpoint import BackfillCheckpoint
+from hopsworks_utils import HopsworksFeatureGroupManager
+from loguru import logger
+from pipeline_common.feature_store_connection import FeatureStoreConnection
+
+
+@dataclass(frozen=True)
+class BackfillChunk:
+    station_id: str
+    start_date: date
+    end_date: date
+
+    @property
+    def chunk_id(self) -> str:
+        return f'{self.station_id}/{self.start_date}/{self.end_date}'
+
+
+def _plan_chunks(
+    station_ids: list[str], start_date: date, end_date: date, chunk_months: int
+) -> list[BackfillChunk]:
+    """
+    Split the backfill into chunks of one station and `chunk_months` months each.
+
+    Args:
+        station_ids (list[str]): The stations to backfill
+        start_date (date): The first day of the backfill
+        end_date (date): The last day of the backfill
+        chunk_months (int): The number of months per chunk
+
+    Returns:
+        list[BackfillChunk]: The chunks, ordered by time and station
+    """
+    chunks = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        month = chunk_start.month - 1 + chunk_months
+        next_start = date(chunk_start.year + month // 12, month % 12 + 1, 1)
+        chunk_end = min(next_start - timedelta(days=1), end_date)
+
+        chunks.extend(
+            BackfillChunk(station_id, chunk_start, chunk_end)
+            for station_id in station_ids
+        )
+        chunk_start = next_start
+
+    return chunks
+
+
+def _partition_chunks(
+    data: pl.DataFrame,
+    chunks: list[BackfillChunk],
+    pending_chunks: list[BackfillChunk],
+) -> dict[str, pl.DataFrame]:
+    """
+    Split the transformed data into the pending chunks in a single pass.
+
+    Args:
+        data (pl.DataFrame): The transformed data, starting on the first chunk day
+        chunks (list[BackfillChunk]): All chunks of the backfill, whose start dates
+            are the chunk boundaries
+        pending_chunks (list[BackfillChunk]): The chunks to return the data of
+
+    Returns:
+        dict[str, pl.DataFrame]: The data per pending chunk id, chunks without data
+            are left out
+    """
+    chunk_starts = pl.Series(sorted({chunk.start_date for chunk in chunks}))
+    # The last chunk start on or before the date of every row
+    chunk_start_indexes = (
+        chunk_starts.search_sorted(data.get_column('date'), side='right') - 1
+    )
+    partitions = data.with_columns(
+        chunk_starts.gather(chunk_start_indexes).alias('chunk_start')
+    ).partition_by(['station_id', 'chunk_start'], as_dict=True)
+
+    return {
+        chunk.chunk_id: partition.drop('chunk_start')
+        for chunk in pending_chunks
+        if (partition := partitions.get((chunk.station_id, chunk.start_date)))
+        is not None
+    }
+
+
+def _insert_chunk(
+    feature_group_manager: HopsworksFeatureGroupManager,
+    checkpoint: BackfillCheckpoint,
+    chunk: BackfillChunk,
+    data: pl.DataFrame,
+) -> None:
+    """
+    Insert one chunk without blocking on the insert, then wait for its job.
+
+    Args:
+        feature_group_manager (HopsworksFeatureGroupManager): The feature group
+        checkpoint (BackfillCheckpoint): The checkpoint the chunk is recorded in
+        chunk (BackfillChunk): The chunk to insert
+        data (pl.DataFrame): The transformed data of the chunk
+
+    Raises:
+        RuntimeError: If the materialization job of the chunk does not finish
+    """
+    if data.is_empty():
+        logger.info(f'Chunk {chunk.chunk_id} has no data.')
+        checkpoint.mark_committed(chunk.chunk_id, rows=0)
+        return
+
+    job = feature_group_manager.insert_data_into_feature_group(
+        data, wait_for_job=False, update_descriptions=False
+    )
+    checkpoint.mark_submitted(
+        chunk.chunk_id, rows=data.height, job_name=getattr(job, 'name', None)
+    )
+
+    # Inserts into stream feature groups do not start a job
+    if job is not None:
+        while (final_state := job.get_final_state()) == 'UNDEFINED':
+            time.sleep(config.backfillSettingsConfig.job_poll_interval)
+
+        if final_state != 'FINISHED':
+            raise RuntimeError(
+                f'Job {job.name} of chunk {chunk.chunk_id} ended with state {final_state}.'
+            )
+
+    checkpoint.mark_committed(chunk.chunk_id, rows=data.height)
+    logger.info(f'Committed chunk {chunk.chunk_id} ({data.height} rows).')
+
+
+def backfill(connection: Optional[FeatureStoreConnection] = None) -> None:
+    """
+    Backfill the feature group in chunks by station and time range.
+
+    Chunks are inserted concurrently without waiting on each job in turn, and every
+    committed chunk is recorded in a local checkpoint. After a crash, running the
+    backfill again skips the committed chunks. The raw data comes from the raw cache,
+    so a resumed run does not download it again.
+
+    Args:
+        connection (Optional[FeatureStoreConnection]): The feature store connection,
+            e.g. wrapping the in-memory stand-in; the shared Hopsworks connection of
+            the project when None
+
+    Raises:
+        RuntimeError: If any chunk could not be committed
+    """
+    station_ids = config.meteostatSettingsConfig.station_ids or [
+        config.meteostatSettingsConfig.station_id
+    ]
+    start_date = config.backfillSettingsConfig.backfill_start_date
+    end_date = (
+        config.backfillSettingsConfig.backfill_end_date
+        or config.meteostatSettingsConfig.end_date
+    )
+
+    chunks = _plan_chunks(
+        station_ids,
+        date.fromisoformat(start_date),
+        date.fromisoformat(end_date),
+        config.backfillSettingsConfig.chunk_months,
+    )
+    checkpoint = BackfillCheckpoint(config.backfillSettingsConfig.checkpoint_path)
+    pending_chunks = [
+        chunk for chunk in chunks if not checkpoint.is_committed(chunk.chunk_id)
+    ]
+    logger.info(
+        f'Backfilling {start_date} to {end_date}: {len(pending_chunks)} of {len(chunks)} chunks pending.'
+    )
+    if not pending_chunks:
+        logger.info('Nothing to backfill, all chunks are committed.')
+        return
+
+    # Extract and transform the pending stations once, so labels are correct across
+    # chunk boundaries
+    pending_station_ids = sorted({chunk.station_id for chunk in pending_chunks})
+    data = transform.transform_data(
+        extract.extract_data_for_stations(
+            pending_station_ids, start_date=start_date, end_date=end_date
+        ).collect(),
+        horizons=config.meteostatSettingsConfig.label_horizons,
+    )
+    extracted_station_ids = set(data.get_column('station_id').unique())
+    latest_dates = data.group_by('station_id').agg(pl.col('date').max())
+    chunk_data = _partition_chunks(data, chunks, pending_chunks)
+    # Keep only the partitions, so every row is held in memory once
+    del data
+
+    feature_group_manager = HopsworksFeatureGroupManager(
+        api_key=config.hopsworksCredentialsConfig.api_key,
+        project_name=config.hopsworksCredentialsConfig.project_name,
+        feature_group_name=config.hopsworksSettingsConfig.feature_group_name,
+        feature_group_version=config.hopsworksSettingsConfig.feature_group_version,
+        feature_group_primary_keys=config.hopsworksSettingsConfig.feature_group_primary_keys,
+        feature_group_description=config.hopsworksSettingsConfig.feature_group_description,
+        feature_group_event_time=config.hopsworksSettingsConfig.feature_group_event_time,
+        arrow_backed_insert=config.hopsworksSettingsConfig.arrow_backed_insert,
+        connection=connection,
+    )
+
+    failed_chunk_ids = [
+        chunk.chunk_id
+        for chunk in pending_chunks
+        if chunk.station_id not in extracted_station_ids
+    ]
+    with ThreadPoolExecutor(
+        max_workers=config.backfillSettingsConfig.max_concurrent_inserts
+    ) as executor:
+        futures = {
+            executor.submit(
+                _insert_chunk,
+                feature_group_manager,
+                checkpoint,
+                chunk,
+                chunk_data.pop(chunk.chunk_id, pl.DataFrame()),
+            ): chunk
+            for chunk in pending_chunks
+            if chunk.station_id in extracted_station_ids
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    f'Failed to backfill chunk {futures[future].chunk_id}: {e}'
+                )
+                failed_chunk_ids.append(futures[future].chunk_id)
+
+    if failed_chunk_ids:
+        raise RuntimeError(
+            f'{len(failed_chunk_ids)} chunks could not be committed, run the backfill again to resume: {failed_chunk_ids}'
+        )
+
+    feature_group_manager.update_feature_descriptions()
+    watermarks.update_watermarks(latest_dates)
+    logger.info('Successfully completed the backfill.')
+
+
+if __name__ == '__main__':
+    backfill()
@@ -0,0 +1,112 @@
+"""
+Offline run of the chunked backfill against the Meteostat stub server and the
+in-memory feature store: compares insert concurrency and checks that a crashed
+backfill resumes without re-sending committed chunks.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.backfill_benchmark
+"""
+
+import os
+import tempfile
+import time
+
+# Dummy credentials, the benchmark never talks to an API or Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import backfill  # noqa: E402
+from config.config import (  # noqa: E402
+    backfillSettingsConfig,
+    hopsworksSettingsConfig,
+    meteostatSettingsConfig,
+)
+from loguru import logger  # noqa: E402
+from pipeline_common.feature_store_connection import (  # noqa: E402
+    FeatureStoreConnection,
+)
+from tests.in_memory_feature_store import InMemoryFeatureStore  # noqa: E402
+
+from benchmarks.meteostat_stub_server import MeteostatStubServer  # noqa: E402
+
+N_STATIONS = 20
+START_DATE = '2021-01-01'
+END_DATE = '2023-12-31'
+CHUNK_MONTHS = 3
+JOB_DURATION = 0.05
+N_CHUNKS = N_STATIONS * 12
+
+
+def _configure(tmp_dir: str, max_concurrent_inserts: int) -> None:
+    meteostatSettingsConfig.station_ids = [str(10000 + i) for i in range(N_STATIONS)]
+    meteostatSettingsConfig.raw_cache_dir = os.path.join(tmp_dir, 'raw')
+    meteostatSettingsConfig.watermark_path = os.path.join(tmp_dir, 'watermarks.json')
+    backfillSettingsConfig.backfill_start_date = START_DATE
+    backfillSettingsConfig.backfill_end_date = END_DATE
+    backfillSettingsConfig.chunk_months = CHUNK_MONTHS
+    backfillSettingsConfig.max_concurrent_inserts = max_concurrent_inserts
+    backfillSettingsConfig.job_poll_interval = 0.01
+    backfillSettingsConfig.checkpoint_path = os.path.join(tmp_dir, 'checkpoint.json')
+
+
+def _connect(feature_store: InMemoryFeatureStore) -> FeatureStoreConnection:
+    return FeatureStoreConnection('benchmark', feature_store=feature_store)
+
+
+def _feature_group(feature_store: InMemoryFeatureStore):
+    return feature_store.get_feature_group(
+        hopsworksSettingsConfig.feature_group_name,
+        hopsworksSettingsConfig.feature_group_version,
+    )
+
+
+def main() -> None:
+    logger.remove()
+
+    with MeteostatStubServer() as server:
+        meteostatSettingsConfig.meteostat_endpoint = server.url
+
+        print(f'{N_CHUNKS} chunks, {JOB_DURATION * 1000:.0f} ms per job')
+        for max_concurrent_inserts in (1, 8):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                _configure(tmp_dir, max_concurrent_inserts)
+                # Warm up the raw cache, so only the inserts are timed
+                backfill.backfill(_connect(InMemoryFeatureStore()))
+
+                feature_store = InMemoryFeatureStore(job_duration=JOB_DURATION)
+                os.remove(backfillSettingsConfig.checkpoint_path)
+                start = time.perf_counter()
+                backfill.backfill(_connect(feature_store))
+                elapsed = time.perf_counter() - start
+                print(
+                    f'max_concurrent_inserts={max_concurrent_inserts:<2} {elapsed:6.2f} s '
+                    f'({_feature_group(feature_store).insert_count} inserts)'
+                )
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            _configure(tmp_dir, max_concurrent_inserts=8)
+            try:
+                backfill.backfill(
+                    _connect(InMemoryFeatureStore(fail_after=N_CHUNKS // 2))
+                )
+                raise SystemExit('The simulated crash did not happen.')
+            except RuntimeError:
+                pass
+
+            requests_before = server.total_requests
+            feature_store = InMemoryFeatureStore()
+            backfill.backfill(_connect(feature_store))
+            resumed_inserts = _feature_group(feature_store).insert_count
+            print(
+                f'resume: {resumed_inserts} chunks re-sent after a crash at '
+                f'{N_CHUNKS // 2} of {N_CHUNKS}, '
+                f'{server.total_requests - requests_before} API requests'
+            )
+            if resumed_inserts != N_CHUNKS - N_CHUNKS // 2:
+                raise SystemExit('The resumed backfill re-sent committed chunks.')
+
+
+if __name__ == '__main__':
+    main()
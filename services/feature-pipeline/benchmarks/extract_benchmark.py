@@ -0,0 +1,88 @@
+"""
+Offline benchmark of the multi-station extraction against the Meteostat stub server.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.extract_benchmark
+"""
+
+import os
+import tempfile
+import time
+
+# Dummy credentials, the stub server does not check them
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+os.environ.setdefault('BACKOFF_FACTOR', '0.01')
+
+from config.config import meteostatSettingsConfig  # noqa: E402
+from etl import extract  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from benchmarks.meteostat_stub_server import MeteostatStubServer  # noqa: E402
+
+N_STATIONS = 64
+LATENCY = 0.05
+START_DATE = '2024-01-01'
+END_DATE = '2024-12-31'
+
+
+def _run(
+    server: MeteostatStubServer, max_concurrent_requests: int, cache_dir: str
+) -> float:
+    meteostatSettingsConfig.meteostat_endpoint = server.url
+    meteostatSettingsConfig.raw_cache_dir = cache_dir
+    station_ids = [str(10000 + i) for i in range(N_STATIONS)]
+
+    start = time.perf_counter()
+    df = extract.extract_data_for_stations(
+        station_ids,
+        start_date=START_DATE,
+        end_date=END_DATE,
+        max_concurrent_requests=max_concurrent_requests,
+    ).collect()
+    elapsed = time.perf_counter() - start
+
+    if df['station_id'].n_unique() != N_STATIONS or df.height != N_STATIONS * 366:
+        raise SystemExit(f'Unexpected extraction result: {df.shape}')
+
+    return elapsed
+
+
+def main() -> None:
+    logger.remove()
+
+    print(f'{N_STATIONS} stations, {LATENCY * 1000:.0f} ms latency per request')
+    with MeteostatStubServer(latency=LATENCY) as server:
+        for concurrency in (1, 8, 32):
+            with tempfile.TemporaryDirectory() as cache_dir:
+                elapsed = _run(server, concurrency, cache_dir)
+            print(
+                f'concurrency={concurrency:<3} {elapsed:6.2f} s '
+                f'{N_STATIONS / elapsed:8.1f} stations/s (cold cache)'
+            )
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            _run(server, 8, cache_dir)
+            requests_before = server.total_requests
+            elapsed = _run(server, 8, cache_dir)
+            print(f'warm cache      {elapsed:6.2f} s')
+            if server.total_requests != requests_before:
+                raise SystemExit('The warm run requested data from the API.')
+
+    with (
+        MeteostatStubServer(latency=LATENCY, failures_per_station=2) as server,
+        tempfile.TemporaryDirectory() as cache_dir,
+    ):
+        elapsed = _run(server, 8, cache_dir)
+        print(
+            f'retries: {server.failed_requests} rate limited requests retried, '
+            f'{server.total_requests} requests in total, {elapsed:.2f} s'
+        )
+        if server.failed_requests != 2 * N_STATIONS:
+            raise SystemExit('Not every rate limited request was retried.')
+
+
+if __name__ == '__main__':
+    main()
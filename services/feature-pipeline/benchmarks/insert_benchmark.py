@@ -0,0 +1,131 @@
+"""
+Memory benchmark of the Polars -> Pandas hand-off before a feature group insert.
+
+A local fake feature group stands in for Hopsworks: like the hsfs Python engine it
+converts the inserted frame to an Arrow table and serializes it to Parquet. Every
+variant runs in a fresh process and the peak RSS is sampled around its own work.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.insert_benchmark
+"""
+
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import pandas as pd  # noqa: E402
+import polars as pl  # noqa: E402
+import pyarrow as pa  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+from config.config import meteostatSettingsConfig  # noqa: E402
+from etl import transform  # noqa: E402
+from etl.table_config.raw_table_config import RawTableConfig  # noqa: E402
+from hopsworks_utils import to_insert_frame  # noqa: E402
+from loguru import logger  # noqa: E402
+from pipeline_common.benchmarks.memory import PeakRssSampler  # noqa: E402
+
+from benchmarks.synthetic_data import generate_station_rows  # noqa: E402
+
+N_STATIONS = 200
+START_DATE = '2015-01-01'
+END_DATE = '2024-12-31'
+
+
+class _FakeFeatureGroup:
+    """Mimics what the hsfs Python engine does with the frame passed to insert"""
+
+    def __init__(self):
+        self.inserted_rows = 0
+
+    def insert(self, features: pd.DataFrame, write_options: dict):
+        table = pa.Table.from_pandas(features, preserve_index=False)
+        pq.write_table(table, io.BytesIO())
+        self.inserted_rows += table.num_rows
+        return None, None
+
+
+def _legacy_insert_frame(data: pl.DataFrame) -> pd.DataFrame:
+    """The conversion as it was before the Arrow hand-off, kept for comparison"""
+    pandas_df = data.to_pandas()
+    pandas_df['date'] = pd.to_datetime(pandas_df['date']).dt.date
+    return pandas_df
+
+
+def _make_data() -> pl.DataFrame:
+    schema = RawTableConfig(meteostatSettingsConfig.yaml_config_file).get_schema(
+        meteostatSettingsConfig.table_name
+    )
+    raw = pl.concat(
+        [
+            pl.DataFrame(
+                generate_station_rows(str(station_id), START_DATE, END_DATE),
+                schema=schema,
+            ).with_columns(pl.lit(str(station_id)).alias('station_id'))
+            for station_id in range(N_STATIONS)
+        ]
+    )
+    return transform.transform_data(raw)
+
+
+def _run_variant(variant: str, data_path: str, queue: multiprocessing.Queue) -> None:
+    logger.remove()
+    data = pl.read_ipc(data_path, memory_map=False)
+    feature_group = _FakeFeatureGroup()
+
+    with PeakRssSampler() as memory:
+        start = time.perf_counter()
+        if variant == 'legacy':
+            pandas_df = _legacy_insert_frame(data)
+        else:
+            pandas_df = to_insert_frame(data, arrow_backed=variant == 'arrow')
+        conversion_time = time.perf_counter() - start
+
+        feature_group.insert(pandas_df, write_options={'wait_for_job': True})
+        elapsed = time.perf_counter() - start
+
+    queue.put(
+        (
+            conversion_time,
+            elapsed,
+            memory.peak_increase_mb,
+            feature_group.inserted_rows,
+        )
+    )
+
+
+def main() -> None:
+    logger.remove()
+
+    data = _make_data()
+    print(f'{data.height} rows, {data.estimated_size("mb"):.1f} MB in Polars')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, 'data.arrow')
+        data.write_ipc(data_path)
+
+        context = multiprocessing.get_context('spawn')
+        for variant in ('legacy', 'numpy', 'arrow'):
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_variant, args=(variant, data_path, queue)
+            )
+            process.start()
+            conversion_time, elapsed, peak_mb, rows = queue.get()
+            process.join()
+
+            print(
+                f'{variant:<7} conversion {conversion_time * 1000:7.1f} ms  '
+                f'insert {elapsed * 1000:7.1f} ms  peak RSS +{peak_mb:7.1f} MB  {rows} rows'
+            )
+
+
+if __name__ == '__main__':
+    main()
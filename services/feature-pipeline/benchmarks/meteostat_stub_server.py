@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks.synthetic_data import generate_station_rows
+
+
+class MeteostatStubServer:
+    """
+    A local stand-in for the Meteostat daily endpoint, serving synthetic data.
+
+    The server can add a fixed latency to every response and fail the first requests
+    of every station with a rate limit, so throughput and retry behaviour can be
+    checked without network access. It records the requests per station and the
+    most requests it had in flight at once. In replay mode, a response is generated once and
+    then served from memory like a recorded one, so the time of a request is that of
+    the client and not of the generator.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        failures_per_station: int = 0,
+        failure_status: int = 429,
+        retry_after: Optional[int] = 0,
+        replay: bool = False,
+        host: str = '127.0.0.1',
+        port: int = 0,
+    ):
+        """
+        Set up the stub server (call `start` or use it as a context manager)
+
+        Args:
+            latency (float): Seconds to wait before answering every request
+            failures_per_station (int): Number of requests per station that fail
+            failure_status (int): The status code returned for failed requests
+            retry_after (Optional[int]): The `Retry-After` seconds sent with failed
+                requests, None to not send the header
+            replay (bool): Whether to keep the responses and serve them again
+            host (str): The host to bind to
+            port (int): The port to bind to, 0 picks a free port
+        """
+        self.latency = latency
+        self.failures_per_station = failures_per_station
+        self.failure_status = failure_status
+        self.retry_after = retry_after
+        self.replay = replay
+
+        self.requests_per_station = Counter()
+        self.failed_requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._responses: dict[tuple[str, str, str], bytes] = {}
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/stations/daily'
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests_per_station.values())
+
+    def start(self) -> 'MeteostatStubServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MeteostatStubServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                station_id = query['station'][0]
+
+                with stub._lock:
+                    stub.requests_per_station[station_id] += 1
+                    should_fail = (
+                        stub.requests_per_station[station_id]
+                        <= stub.failures_per_station
+                    )
+                    if should_fail:
+                        stub.failed_requests += 1
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+
+                # A request is in flight until it is answered, the client can only
+                # send its next one after that
+                try:
+                    time.sleep(stub.latency)
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+                if should_fail:
+                    self.send_response(stub.failure_status)
+                    if stub.retry_after is not None:
+                        self.send_header('Retry-After', str(stub.retry_after))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                key = (station_id, query['start'][0], query['end'][0])
+                body = stub._responses.get(key)
+                if body is None:
+                    body = json.dumps(
+                        {
+                            'meta': {'generated': time.strftime('%Y-%m-%d %H:%M:%S')},
+                            'data': generate_station_rows(*key),
+                        }
+                    ).encode()
+                    if stub.replay:
+                        stub._responses[key] = body
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Keep the benchmark output readable
+                pass
+
+        return Handler
@@ -0,0 +1,153 @@
+"""
+Startup benchmark of the entry points, the cost of a scheduled run doing little work.
+
+Every entry point is imported in a fresh interpreter with `-X importtime`, a few
+times. The median wall time of the process, its peak RSS, the packages that took
+the longest to import and which of the heavy libraries were imported are reported.
+The page cache stays warm between the runs, so the first start after a reboot is
+slower still.
+
+The settings are only read when a run uses them, so importing an entry point needs
+no credentials. The first start runs without them, also not from the environment,
+and an entry point that fails without them or creates settings on import fails the
+benchmark.
+
+A start is one row of the baseline of the benchmark suite, so the throughput is
+starts per second, and slower or bigger starts are flagged like the stages of the
+suite. The first run, or one with --update-baseline, records the baseline.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.startup_benchmark [--update-baseline]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+from pipeline_common.benchmarks.baseline import (
+    DEFAULT_TOLERANCE,
+    BenchmarkResult,
+    report,
+)
+
+ENTRY_POINTS = ['pipeline', 'backfill']
+HEAVY_MODULES = ['hopsworks', 'hsfs', 'pandas', 'pyarrow']
+REPEATS = 5
+# Dummy credentials, importing an entry point never talks to an API
+CREDENTIALS = {
+    'API_KEY': 'benchmark',
+    'API_HOST': 'localhost',
+    'PROJECT_NAME': 'benchmark',
+}
+SERVICE_DIR = Path(__file__).parent.parent
+DEFAULT_BASELINE_PATH = (
+    SERVICE_DIR / 'etl' / 'data' / 'benchmarks' / 'startup_baseline.json'
+)
+
+# Run in the child: the heavy modules it imported, the settings it created and its
+# peak RSS in kB
+_CHILD_REPORT = (
+    'import json, resource, sys; print(json.dumps({{'
+    "'heavy': [m for m in {heavy!r} if m in sys.modules], "
+    "'settings': [s for s in getattr(sys.modules.get('config.config'), '_SETTINGS', "
+    "()) if s in vars(sys.modules['config.config'])], "
+    "'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))"
+)
+
+
+def _start(module: str, credentials: bool = True) -> tuple[float, dict]:
+    env = (
+        {**CREDENTIALS, **os.environ}
+        if credentials
+        else {k: v for k, v in os.environ.items() if k not in CREDENTIALS}
+    )
+    code = f'import {module}; ' + _CHILD_REPORT.format(heavy=HEAVY_MODULES)
+
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=SERVICE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        raise SystemExit(
+            f'Importing {module}{"" if credentials else " without credentials"} '
+            f'failed:\n{process.stderr[-2000:]}'
+        )
+
+    # `import time: self [us] | cumulative | imported package`, the self times of a
+    # package add up to what it cost without what it imported
+    self_seconds = Counter()
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, _, name = line.removeprefix('import time:').split('|')
+        self_seconds[name.strip().split('.')[0]] += int(self_us) / 1e6
+
+    child = json.loads(process.stdout.splitlines()[-1])
+    return seconds, {**child, 'self_seconds': self_seconds}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the entry point startup')
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        default=DEFAULT_BASELINE_PATH,
+        help='The baseline to compare with',
+    )
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='Replace the baseline with the results of this run',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='The relative change of startup time or memory that is a regression',
+    )
+    args = parser.parse_args()
+
+    results = []
+    for module in ENTRY_POINTS:
+        starts = [_start(module, credentials=i > 0) for i in range(REPEATS)]
+        settings = sorted({s for _, child in starts for s in child['settings']})
+        if settings:
+            raise SystemExit(f'Importing {module} created the settings {settings}')
+        seconds = statistics.median(seconds for seconds, _ in starts)
+        details = starts[-1][1]
+        heaviest = ', '.join(
+            f'{package} {package_seconds:.2f} s'
+            for package, package_seconds in details['self_seconds'].most_common(5)
+        )
+        print(
+            f'{module}: {seconds:.2f} s, heavy imports: '
+            f'{", ".join(details["heavy"]) or "none"}\n  {heaviest}'
+        )
+        results.append(
+            BenchmarkResult(
+                'startup',
+                module,
+                1,
+                seconds,
+                max(child['max_rss_kb'] for _, child in starts) / 1024,
+            )
+        )
+
+    print()
+    sys.exit(report(results, args.baseline, args.update_baseline, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
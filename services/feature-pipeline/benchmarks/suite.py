@@ -0,0 +1,177 @@
+"""
+Benchmark suite of the feature pipeline stages at several data sizes.
+
+The extraction requests N stations x M years of synthetic weather from the Meteostat
+stub server in replay mode, into a cold raw cache. The transformation reads the
+same data from the raw cache and runs `transform_data` on it. Every stage and size
+runs in a fresh process, the time is the best of a few runs and the memory the peak
+RSS above the state before them.
+
+The results are compared with the baseline of this machine, throughput drops and
+memory growth beyond the tolerance are flagged and fail the run. The first run, or
+one with --update-baseline, records the baseline.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.suite [--update-baseline]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+# Dummy credentials, the stub server does not check them
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import polars as pl  # noqa: E402
+from config.config import meteostatSettingsConfig  # noqa: E402
+from etl import extract, transform  # noqa: E402
+from etl.raw_cache import RawDataCache  # noqa: E402
+from etl.table_config.raw_table_config import RawTableConfig  # noqa: E402
+from loguru import logger  # noqa: E402
+from pipeline_common.benchmarks.baseline import (  # noqa: E402
+    DEFAULT_TOLERANCE,
+    BenchmarkResult,
+    report,
+    run_isolated,
+    time_best_of,
+)
+from pipeline_common.benchmarks.memory import PeakRssSampler  # noqa: E402
+
+from benchmarks.meteostat_stub_server import MeteostatStubServer  # noqa: E402
+from benchmarks.synthetic_data import generate_station_rows  # noqa: E402
+
+# Stations x years
+SIZES = [(4, 1), (16, 2), (64, 5)]
+FIRST_YEAR = 2015
+REPEATS = 3
+DEFAULT_BASELINE_PATH = (
+    Path(__file__).parent.parent / 'etl' / 'data' / 'benchmarks' / 'baseline.json'
+)
+
+
+def _date_range(n_years: int) -> tuple[str, str]:
+    return (
+        date(FIRST_YEAR, 1, 1).isoformat(),
+        date(FIRST_YEAR + n_years - 1, 12, 31).isoformat(),
+    )
+
+
+def _station_ids(n_stations: int) -> list[str]:
+    return [str(10000 + i) for i in range(n_stations)]
+
+
+def _table_schema() -> dict[str, type]:
+    return RawTableConfig(meteostatSettingsConfig.yaml_config_file).get_schema(
+        meteostatSettingsConfig.table_name
+    )
+
+
+def _extract_case(n_stations: int, n_years: int) -> BenchmarkResult:
+    logger.remove()
+    start_date, end_date = _date_range(n_years)
+    station_ids = _station_ids(n_stations)
+
+    with (
+        MeteostatStubServer(replay=True) as server,
+        tempfile.TemporaryDirectory() as tmp_dir,
+    ):
+        meteostatSettingsConfig.meteostat_endpoint = server.url
+        rows = 0
+
+        def run():
+            nonlocal rows
+            # A cold raw cache every time, so every station is requested
+            meteostatSettingsConfig.raw_cache_dir = tempfile.mkdtemp(dir=tmp_dir)
+            rows = (
+                extract.extract_data_for_stations(
+                    station_ids, start_date=start_date, end_date=end_date
+                )
+                .collect()
+                .height
+            )
+
+        # Generates the responses the timed runs replay
+        run()
+        with PeakRssSampler() as memory:
+            seconds = time_best_of(run, REPEATS)
+
+    return BenchmarkResult(
+        'extract', f'{n_stations}x{n_years}', rows, seconds, memory.peak_increase_mb
+    )
+
+
+def _transform_case(n_stations: int, n_years: int) -> BenchmarkResult:
+    logger.remove()
+    start_date, end_date = _date_range(n_years)
+    station_ids = _station_ids(n_stations)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RawDataCache(cache_dir, _table_schema())
+        for station_id in station_ids:
+            cache.write(
+                station_id,
+                pl.DataFrame(
+                    generate_station_rows(station_id, start_date, end_date),
+                    schema=_table_schema(),
+                ),
+                start_date,
+                end_date,
+            )
+
+        def run():
+            scan = pl.concat(
+                [
+                    cache.scan(station_id, start_date, end_date)
+                    for station_id in station_ids
+                ]
+            )
+            return transform.transform_data(scan.collect())
+
+        rows = n_stations * (
+            (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days + 1
+        )
+        with PeakRssSampler() as memory:
+            seconds = time_best_of(run, REPEATS)
+
+    return BenchmarkResult(
+        'transform', f'{n_stations}x{n_years}', rows, seconds, memory.peak_increase_mb
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages')
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        default=DEFAULT_BASELINE_PATH,
+        help='The baseline to compare with',
+    )
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='Replace the baseline with the results of this run',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='The relative change of throughput or memory that is a regression',
+    )
+    args = parser.parse_args()
+
+    results = [
+        run_isolated(case, n_stations, n_years)
+        for case in (_extract_case, _transform_case)
+        for n_stations, n_years in SIZES
+    ]
+    sys.exit(report(results, args.baseline, args.update_baseline, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
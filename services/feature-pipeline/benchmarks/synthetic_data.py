@@ -0,0 +1,53 @@
+import math
+import random
+import zlib
+from datetime import date, timedelta
+
+
+def generate_station_rows(
+    station_id: str, start_date: str, end_date: str
+) -> list[dict]:
+    """
+    Generate deterministic daily weather rows in the shape of the Meteostat API.
+
+    The same station and day always produce the same values, so repeated runs (and
+    the stub server) return identical data.
+
+    Args:
+        station_id (str): The station id used to seed the generator
+        start_date (str): The first day to generate (YYYY-MM-DD)
+        end_date (str): The last day to generate (YYYY-MM-DD)
+
+    Returns:
+        list[dict]: One record per day matching the `WeatherData` raw schema
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    station_seed = zlib.crc32(station_id.encode())
+
+    rows = []
+    for offset in range((end - start).days + 1):
+        day = start + timedelta(days=offset)
+        rng = random.Random(station_seed ^ day.toordinal())
+
+        # Simple yearly seasonality for temperature and sunshine
+        season = math.sin(2 * math.pi * (day.timetuple().tm_yday - 80) / 365.25)
+        tavg = 10 + 9 * season + rng.gauss(0, 2.5)
+
+        rows.append(
+            {
+                'date': day.isoformat(),
+                'tavg': round(tavg, 1),
+                'tmin': round(tavg - rng.uniform(2, 7), 1),
+                'tmax': round(tavg + rng.uniform(2, 7), 1),
+                'prcp': round(max(0.0, rng.gauss(1.5, 3.0)), 1),
+                'snow': 0.0 if tavg > 0 else round(rng.uniform(0, 50), 1),
+                'wdir': round(rng.uniform(0, 360), 1),
+                'wspd': round(rng.uniform(2, 30), 1),
+                'wpgt': round(rng.uniform(10, 80), 1),
+                'pres': round(rng.gauss(1015, 8), 1),
+                'tsun': int(max(0, min(960, 330 + 300 * season + rng.gauss(0, 120)))),
+            }
+        )
+
+    return rows
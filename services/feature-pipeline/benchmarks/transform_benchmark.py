@@ -0,0 +1,154 @@
+"""
+Benchmark of the transform against the transform before the date format detection.
+
+The raw data of N stations x M years is generated into a temporary raw cache. Every
+variant runs in a fresh process and the peak RSS is sampled around its own work.
+Both variants transform a DataFrame, like in the pipeline, where the DagRunner
+collects the extracted data before the transform stage.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.transform_benchmark
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import date
+
+# Dummy credentials, the benchmark never talks to an API
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import polars as pl  # noqa: E402
+from config.config import meteostatSettingsConfig  # noqa: E402
+from etl import transform  # noqa: E402
+from etl.raw_cache import RawDataCache  # noqa: E402
+from etl.table_config.raw_table_config import RawTableConfig  # noqa: E402
+from loguru import logger  # noqa: E402
+from pipeline_common.benchmarks.memory import PeakRssSampler  # noqa: E402
+
+from benchmarks.synthetic_data import generate_station_rows  # noqa: E402
+
+N_STATIONS = 50
+N_YEARS = 10
+START_DATE = date(2014, 1, 1).isoformat()
+END_DATE = date(2014 + N_YEARS - 1, 12, 31).isoformat()
+
+
+def _legacy_transform_data(df: pl.DataFrame) -> pl.DataFrame:
+    """The transform as it was before the date format detection, for comparison"""
+    converted = df.select(
+        pl.coalesce(
+            pl.col('date').str.strptime(pl.Date, '%F', strict=False),
+            pl.col('date').str.strptime(pl.Date, '%F %T', strict=False),
+            pl.col('date').str.strptime(pl.Date, '%D', strict=False),
+            pl.col('date').str.strptime(pl.Date, '%c', strict=False),
+        ).alias('date')
+    )
+    df = df.with_columns(converted.get_column('date'))
+
+    numeric_cols = [
+        col for col in df.columns if df.schema[col] in [pl.Float32, pl.Float64]
+    ]
+    df = df.with_columns([pl.col(col).round(0) for col in numeric_cols])
+
+    feature_cols = df.columns
+    df = df.with_columns(
+        pl.col('tsun').shift(-1).over('station_id', order_by='date').alias('tsun_label')
+    )
+    return df.drop_nulls(subset=feature_cols).sort('station_id', 'date')
+
+
+def _scan_cache(cache: RawDataCache) -> pl.LazyFrame:
+    return pl.concat(
+        [
+            cache.scan(str(station_id), START_DATE, END_DATE)
+            for station_id in range(N_STATIONS)
+        ]
+    )
+
+
+def _transform(variant: str, data: pl.LazyFrame) -> pl.DataFrame:
+    if variant == 'legacy':
+        return _legacy_transform_data(data.collect())
+    return transform.transform_data(data.collect())
+
+
+def _run_variant(variant: str, cache_dir: str, queue: multiprocessing.Queue) -> None:
+    logger.remove()
+    cache = RawDataCache(cache_dir, _table_schema())
+
+    # End to end: from the raw cache to the transformed frame
+    with PeakRssSampler() as memory:
+        start = time.perf_counter()
+        df = _transform(variant, _scan_cache(cache))
+        elapsed = time.perf_counter() - start
+
+    # Transformation only, on raw data that is already in memory
+    raw = _scan_cache(cache).collect()
+    start = time.perf_counter()
+    _transform(variant, raw.lazy())
+    elapsed_in_memory = time.perf_counter() - start
+
+    queue.put(
+        (
+            elapsed,
+            elapsed_in_memory,
+            memory.peak_increase_mb,
+            df.height,
+            df.hash_rows().sum(),
+        )
+    )
+
+
+def _table_schema() -> dict[str, type]:
+    return RawTableConfig(meteostatSettingsConfig.yaml_config_file).get_schema(
+        meteostatSettingsConfig.table_name
+    )
+
+
+def main() -> None:
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        print(f'Generating {N_STATIONS} stations x {N_YEARS} years of raw data')
+        cache = RawDataCache(cache_dir, _table_schema())
+        for station_id in range(N_STATIONS):
+            df = pl.DataFrame(
+                generate_station_rows(str(station_id), START_DATE, END_DATE),
+                schema=_table_schema(),
+            )
+            cache.write(str(station_id), df, START_DATE, END_DATE)
+
+        context = multiprocessing.get_context('spawn')
+        results = {}
+        for variant in ('legacy', 'current'):
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_variant, args=(variant, cache_dir, queue)
+            )
+            process.start()
+            results[variant] = queue.get()
+            process.join()
+
+            elapsed, elapsed_in_memory, peak_mb, rows, _ = results[variant]
+            print(
+                f'{variant:<7} {elapsed * 1000:8.1f} ms end to end  '
+                f'{elapsed_in_memory * 1000:8.1f} ms in memory  '
+                f'peak RSS +{peak_mb:7.1f} MB  {rows} rows'
+            )
+
+        if results['legacy'][3:] != results['current'][3:]:
+            raise SystemExit('The transform returned different data.')
+
+        for index, name in ((0, 'end to end'), (1, 'in memory')):
+            print(
+                f'speedup {name}: {results["legacy"][index] / results["current"][index]:.2f}x'
+            )
+
+
+if __name__ == '__main__':
+    main()
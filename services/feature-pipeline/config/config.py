@@ -1,5 +1,7 @@
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Literal, Optional
 
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -18,9 +20,6 @@ class MeteostatCredentialsConfig(BaseSettings):
     api_host: str
 
 
-meteostatCredentialsConfig = MeteostatCredentialsConfig()
-
-
 class MeteostatSettingsConfig(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=str(CONFIG_DIR / 'meteostat_settings.env'),
@@ -28,10 +27,25 @@ class MeteostatSettingsConfig(BaseSettings):
     )
 
     meteostat_endpoint: str
-    station_id: int
+    station_id: str
     table_name: str
     yaml_config_file: str
-    output_path: str
+    raw_cache_dir: str
+
+    # Multi-station extraction (falls back to `station_id` when empty)
+    station_ids: list[str] = []
+    max_concurrent_requests: int = 8
+    max_retries: int = 5
+    backoff_factor: float = 0.5
+    request_timeout: float = 30.0
+
+    # Incremental extraction: only request days after the last loaded date per station
+    incremental: bool = False
+    incremental_overlap_days: int = 3
+    watermark_path: str = 'data/watermarks.json'
+
+    # Label columns: the sunshine total this many days after the row's date
+    label_horizons: list[int] = [1]
 
     # Add computed fields instead of hard coding values in the settings file
     @computed_field
@@ -43,9 +57,6 @@ class MeteostatSettingsConfig(BaseSettings):
         return datetime.now().strftime('%Y-%m-%d')
 
 
-meteostatSettingsConfig = MeteostatSettingsConfig()
-
-
 class HopsworksSettingsConfig(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=str(CONFIG_DIR / 'hopsworks_settings.env'),
@@ -58,9 +69,48 @@ class HopsworksSettingsConfig(BaseSettings):
     feature_group_description: str
     feature_group_event_time: str
     feature_view_name: str
+    # Must be the FEATURE_VIEW_BASIC_FEATURES_VERSION the training pipeline reads
+    feature_view_version: int
+
+    # Hand off Arrow-backed columns to the feature group instead of NumPy copies
+    arrow_backed_insert: bool = True
+
+    # Feature store backend: Hopsworks, or partitioned Parquet files on the local disk
+    # (relative to the service directory) to run offline
+    feature_store_backend: Literal['hopsworks', 'local'] = 'hopsworks'
+    local_feature_store_dir: str = 'etl/data/feature_store'
+
 
+class PipelineSettingsConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=str(CONFIG_DIR / 'pipeline_settings.env'),
+        env_file_encoding='utf-8',
+    )
+
+    # Stage cache: stages whose inputs, settings and code are unchanged are skipped
+    # (relative to the service directory)
+    stage_cache: bool = True
+    stage_cache_dir: str = 'etl/data/stage_cache'
+    stage_cache_keep: int = 3
+
+    # Run report: a JSON report and a Prometheus textfile per run, and optionally a
+    # cProfile dump per stage (relative to the service directory)
+    metrics_dir: str = 'etl/data/metrics'
+    profile_stages: bool = False
+
+
+class BackfillSettingsConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=str(CONFIG_DIR / 'backfill_settings.env'),
+        env_file_encoding='utf-8',
+    )
 
-hopsworksSettingsConfig = HopsworksSettingsConfig()
+    backfill_start_date: str
+    backfill_end_date: Optional[str] = None
+    chunk_months: int = 3
+    max_concurrent_inserts: int = 4
+    job_poll_interval: float = 10.0
+    checkpoint_path: str = 'data/backfill_checkpoint.json'
 
 
 class HopsworksCredentialsConfig(BaseSettings):
@@ -73,4 +123,23 @@ class HopsworksCredentialsConfig(BaseSettings):
     project_name: str
 
 
-hopsworksCredentialsConfig = HopsworksCredentialsConfig()
+# The settings are created on first access, not on import, so a run only reads the
+# .env files (and needs the variables) of the settings its stages use
+_SETTINGS = {
+    'meteostatCredentialsConfig': MeteostatCredentialsConfig,
+    'meteostatSettingsConfig': MeteostatSettingsConfig,
+    'hopsworksSettingsConfig': HopsworksSettingsConfig,
+    'pipelineSettingsConfig': PipelineSettingsConfig,
+    'backfillSettingsConfig': BackfillSettingsConfig,
+    'hopsworksCredentialsConfig': HopsworksCredentialsConfig,
+}
+_settings_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> BaseSettings:
+    if name not in _SETTINGS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    with _settings_lock:
+        if name not in globals():
+            globals()[name] = _SETTINGS[name]()
+        return globals()[name]
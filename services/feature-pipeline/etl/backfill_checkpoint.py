@@ -0,0 +1,65 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+
+class BackfillCheckpoint:
+    """
+    A local record of which backfill chunks have been committed to the feature group.
+
+    A chunk is `submitted` once its data has been handed to the feature group and
+    `committed` once its materialization job has finished. On resume only committed
+    chunks are skipped; submitted chunks are sent again, which is safe because
+    inserts are upserts on the primary key. The file is rewritten atomically after
+    every change, so a crash never leaves a half written checkpoint behind.
+    """
+
+    def __init__(self, checkpoint_path: str):
+        """
+        Load the checkpoint (or start an empty one)
+
+        Args:
+            checkpoint_path (str): The checkpoint file, relative to the etl directory
+        """
+        self._file_path = Path(Path(__file__).parent / checkpoint_path)
+        self._lock = threading.Lock()
+
+        if self._file_path.exists():
+            with self._file_path.open('r') as f:
+                self._chunks: dict[str, dict] = json.load(f)
+            logger.info(
+                f'Resuming from checkpoint {self._file_path}: {len(self.committed_chunk_ids)} chunks committed.'
+            )
+        else:
+            self._chunks = {}
+
+    @property
+    def committed_chunk_ids(self) -> set[str]:
+        return {
+            chunk_id
+            for chunk_id, chunk in self._chunks.items()
+            if chunk['state'] == 'committed'
+        }
+
+    def is_committed(self, chunk_id: str) -> bool:
+        return self._chunks.get(chunk_id, {}).get('state') == 'committed'
+
+    def mark_submitted(self, chunk_id: str, rows: int, job_name: Optional[str]) -> None:
+        self._update(chunk_id, {'state': 'submitted', 'rows': rows, 'job': job_name})
+
+    def mark_committed(self, chunk_id: str, rows: int) -> None:
+        self._update(chunk_id, {'state': 'committed', 'rows': rows})
+
+    def _update(self, chunk_id: str, chunk: dict) -> None:
+        with self._lock:
+            self._chunks[chunk_id] = chunk
+
+            self._file_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._file_path.with_suffix('.tmp')
+            with tmp_path.open('w') as f:
+                json.dump(self._chunks, f, indent=4, sort_keys=True)
+            os.replace(tmp_path, self._file_path)
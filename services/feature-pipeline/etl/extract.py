@@ -1,90 +1,210 @@
-import json
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional
 
 import polars as pl
 import requests
-from config.config import meteostatCredentialsConfig, meteostatSettingsConfig
+from config import config
 from loguru import logger
+from pipeline_common import instrumentation
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from etl.raw_cache import RawDataCache
 from etl.table_config.raw_table_config import RawTableConfig
 
 
-def extract_data_from_api() -> Optional[pl.DataFrame]:
+def _create_session(pool_size: int) -> requests.Session:
     """
-    Helper function to extract data from the Meteostat API.
+    Create an HTTP session with a shared connection pool that retries failed requests.
+
+    Rate limited (429) and server side errors are retried with an exponential backoff,
+    honouring the `Retry-After` header sent by the API.
+
+    Args:
+        pool_size (int): The maximum number of pooled connections to the API host
 
     Returns:
-        None
+        requests.Session: The configured session
     """
+    retry = Retry(
+        total=config.meteostatSettingsConfig.max_retries,
+        backoff_factor=config.meteostatSettingsConfig.backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(
+        {
+            'x-rapidapi-key': config.meteostatCredentialsConfig.api_key,
+            'x-rapidapi-host': config.meteostatCredentialsConfig.api_host,
+        }
+    )
+    return session
+
+
+def _fetch_station(
+    session: requests.Session,
+    cache: RawDataCache,
+    station_id: str,
+    table_schema: dict[str, type],
+    start_date: str,
+    end_date: str,
+) -> None:
+    """
+    Request the daily data of a single station and write it into the raw cache.
 
-    # Get the config directory
-    CONFIG_DIR = Path(__file__).parent
-
-    # Set file path and create directories if they don't exist
-    file_path = Path(CONFIG_DIR / meteostatSettingsConfig.output_path)
-    file_path.parent.mkdir(parents=True, exist_ok=True)  # Create parent directories
+    The response is parsed exactly once, straight into a Polars DataFrame with the
+    raw table schema.
 
-    logger.info('Extracting data.')
+    Args:
+        session (requests.Session): The pooled session used for the request
+        cache (RawDataCache): The raw data cache the response is written to
+        station_id (str): The Meteostat station id
+        table_schema (dict[str, type]): The Polars schema of the raw table
+        start_date (str): The first day to request (YYYY-MM-DD)
+        end_date (str): The last day to request (YYYY-MM-DD)
 
-    # Config for the Meteostat API
-    url = meteostatSettingsConfig.meteostat_endpoint
-    headers = {
-        'x-rapidapi-key': meteostatCredentialsConfig.api_key,
-        'x-rapidapi-host': meteostatCredentialsConfig.api_host,
-    }
-    querystring = {
-        'station': meteostatSettingsConfig.station_id,
-        'start': meteostatSettingsConfig.start_date,
-        'end': meteostatSettingsConfig.end_date,
-    }
-
-    if not file_path.exists():
-        # Getting the response
-        try:
-            logger.info(f'Requesting data from API from the following URL: {url}.')
-            response = requests.request('GET', url, headers=headers, params=querystring)
-        except requests.exceptions.HTTPError as err:
-            logger.error(f'HTTP error occurred: {err}.')
-            return None
+    Raises:
+        ValueError: If the API does not answer with status 200 after all retries
+    """
+    logger.info(f'Requesting station {station_id} from {start_date} to {end_date}.')
+    with instrumentation.measure('meteostat_request', station_id=station_id) as call:
+        response = session.get(
+            config.meteostatSettingsConfig.meteostat_endpoint,
+            params={'station': station_id, 'start': start_date, 'end': end_date},
+            timeout=config.meteostatSettingsConfig.request_timeout,
+        )
+        call.bytes_transferred = len(response.content)
 
         if response.status_code != 200:
             raise ValueError(
-                f'Response status = {response.status_code}. Could not download the data from Meteostat API.'
+                f'Response status = {response.status_code}. Could not download the data for station {station_id} from Meteostat API.'
             )
 
-        logger.info('Data successfully downloaded.')
-
-        # Converting response object to Polars DataFrame
-        try:
-            logger.info('Store the data in a file.')
-            # Write JSON response data
-            with file_path.open('w') as f:
-                data = json.loads(response.text)
-
-                # Ensure 'data' is written as a JSON string
-                json.dump(data['data'], f, indent=4)
-
-            logger.info('Converting response to Polars DataFrame.')
-            data = json.loads(response.text)
-
-            # Get polars schema
-            table_schema = RawTableConfig(
-                meteostatSettingsConfig.yaml_config_file
-            ).get_schema(meteostatSettingsConfig.table_name)
-            df = pl.DataFrame(data['data'], schema=table_schema)
-            return df
-        except Exception as e:
-            logger.error(
-                f'Error occurred while converting response to Polars DataFrame: {e}.'
+        df = pl.DataFrame(response.json()['data'], schema=table_schema)
+        call.rows_out = df.height
+    cache.write(station_id, df, start_date=start_date, end_date=end_date)
+
+
+def extract_data_for_stations(
+    station_ids: list[str],
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    max_concurrent_requests: Optional[int] = None,
+    start_dates: Optional[dict[str, str]] = None,
+) -> pl.LazyFrame:
+    """
+    Extract data for several stations, reading from the raw cache where possible.
+
+    Only the months that are missing from the raw cache are requested from the
+    Meteostat API. The requests share one connection pool and at most
+    `max_concurrent_requests` of them are in flight at once. Stations that still fail
+    after all retries are logged and skipped. When everything is cached, no request
+    is made at all. The cached data is returned as a lazy scan, nothing is read
+    until the caller collects it.
+
+    Args:
+        station_ids (list[str]): The Meteostat station ids to extract
+        start_date (Optional[str]): The first day to request, defaults to the settings
+        end_date (Optional[str]): The last day to request, defaults to the settings
+        max_concurrent_requests (Optional[int]): The maximum number of parallel
+            requests, defaults to the settings
+        start_dates (Optional[dict[str, str]]): Per station first day to request,
+            overrides `start_date` for the stations it contains
+
+    Returns:
+        pl.LazyFrame: The data of all stations with a `station_id` column
+
+    Raises:
+        ValueError: If the data could not be extracted for any of the stations
+    """
+    start_date = start_date or config.meteostatSettingsConfig.start_date
+    end_date = end_date or config.meteostatSettingsConfig.end_date
+    max_concurrent_requests = (
+        max_concurrent_requests
+        or config.meteostatSettingsConfig.max_concurrent_requests
+    )
+    start_dates = {
+        station_id: (start_dates or {}).get(station_id, start_date)
+        for station_id in station_ids
+    }
+
+    table_schema = RawTableConfig(
+        config.meteostatSettingsConfig.yaml_config_file
+    ).get_schema(config.meteostatSettingsConfig.table_name)
+    cache = RawDataCache(
+        config.meteostatSettingsConfig.raw_cache_dir,
+        table_schema,
+        overlap_days=config.meteostatSettingsConfig.incremental_overlap_days,
+    )
+
+    missing_ranges = {
+        station_id: missing_range
+        for station_id in station_ids
+        if (
+            missing_range := cache.missing_range(
+                station_id, start_dates[station_id], end_date
             )
-            return None
-    else:
-        logger.info(f'File already exists at {file_path}.')
-        logger.info(f'Reading the data from the file output path: {file_path}.')
-        # Get polars schema
-        table_schema = RawTableConfig(
-            meteostatSettingsConfig.yaml_config_file
-        ).get_schema(meteostatSettingsConfig.table_name)
-        df = pl.read_json(file_path, schema=table_schema)
-        return df
+        )
+    }
+    logger.info(
+        f'{len(station_ids) - len(missing_ranges)} of {len(station_ids)} stations are fully cached.'
+    )
+
+    failed_station_ids = []
+    if missing_ranges:
+        logger.info(
+            f'Extracting data for {len(missing_ranges)} stations with up to {max_concurrent_requests} concurrent requests.'
+        )
+        with (
+            _create_session(pool_size=max_concurrent_requests) as session,
+            ThreadPoolExecutor(max_workers=max_concurrent_requests) as executor,
+        ):
+            futures = {
+                executor.submit(
+                    _fetch_station,
+                    session,
+                    cache,
+                    station_id,
+                    table_schema,
+                    *missing_range,
+                ): station_id
+                for station_id, missing_range in missing_ranges.items()
+            }
+            for future in as_completed(futures):
+                station_id = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(
+                        f'Failed to extract data for station {station_id}: {e}.'
+                    )
+                    failed_station_ids.append(station_id)
+
+    extracted_station_ids = [
+        station_id for station_id in station_ids if station_id not in failed_station_ids
+    ]
+    if not extracted_station_ids:
+        raise ValueError('Could not extract data for any of the requested stations.')
+
+    logger.info(
+        f'Successfully extracted data for {len(extracted_station_ids)} of {len(station_ids)} stations.'
+    )
+    if failed_station_ids:
+        logger.warning(f'Skipped stations: {failed_station_ids}.')
+
+    return pl.concat(
+        [
+            cache.scan(station_id, start_dates[station_id], end_date)
+            for station_id in extracted_station_ids
+        ],
+        how='vertical',
+    )
@@ -1,12 +1,11 @@
 import polars as pl
-from config.config import (
-    hopsworksCredentialsConfig,
-    hopsworksSettingsConfig,
-    meteostatSettingsConfig,
-)
+from config import config
+from feature_store_connection import get_connection
 from hopsworks_utils import HopsworksFeatureGroupManager, HopsworksFeatureViewManager
 from loguru import logger
 
+from etl import watermarks
+
 
 def load_data_into_feature_group(
     data: pl.DataFrame,
@@ -14,6 +13,9 @@ def load_data_into_feature_group(
     """
     Load data into a feature group in the Hopsworks Feature Store
 
+    In incremental mode only the rows after the overlap window of each station are
+    upserted and the station watermarks are moved forward afterwards.
+
     Args:
         api_key (str): The API key for the Hopsworks project
         project_name (str): The name of the Hopsworks project
@@ -29,33 +31,53 @@ def load_data_into_feature_group(
         Exception: If the data fails to be loaded into the feature group
     """
 
+    if config.meteostatSettingsConfig.incremental:
+        data = watermarks.filter_new_rows(data)
+        logger.info(f'Upserting {data.height} new or corrected rows.')
+        if data.is_empty():
+            logger.info('No new rows to load, the feature group is up to date.')
+            return
+
+    # Both managers share one connection, so Hopsworks is logged in to only once
+    connection = get_connection(
+        config.hopsworksCredentialsConfig.project_name,
+        config.hopsworksCredentialsConfig.api_key,
+    )
+
     logger.info(
-        f'Creating HopsworksFeatureGroupManager for feature group {hopsworksSettingsConfig.feature_group_name} version {hopsworksSettingsConfig.feature_group_version}.'
+        f'Creating HopsworksFeatureGroupManager for feature group {config.hopsworksSettingsConfig.feature_group_name} version {config.hopsworksSettingsConfig.feature_group_version}.'
     )
     feature_group_manager = HopsworksFeatureGroupManager(
-        api_key=hopsworksCredentialsConfig.api_key,
-        project_name=hopsworksCredentialsConfig.project_name,
-        feature_group_name=hopsworksSettingsConfig.feature_group_name,
-        feature_group_version=hopsworksSettingsConfig.feature_group_version,
-        feature_group_primary_keys=hopsworksSettingsConfig.feature_group_primary_keys,
-        feature_group_description=hopsworksSettingsConfig.feature_group_description,
-        feature_group_event_time=hopsworksSettingsConfig.feature_group_event_time,
+        api_key=config.hopsworksCredentialsConfig.api_key,
+        project_name=config.hopsworksCredentialsConfig.project_name,
+        feature_group_name=config.hopsworksSettingsConfig.feature_group_name,
+        feature_group_version=config.hopsworksSettingsConfig.feature_group_version,
+        feature_group_primary_keys=config.hopsworksSettingsConfig.feature_group_primary_keys,
+        feature_group_description=config.hopsworksSettingsConfig.feature_group_description,
+        feature_group_event_time=config.hopsworksSettingsConfig.feature_group_event_time,
+        arrow_backed_insert=config.hopsworksSettingsConfig.arrow_backed_insert,
+        connection=connection,
     )
 
     logger.info(
-        f'Inserting data into feature group {hopsworksSettingsConfig.feature_group_name} version {hopsworksSettingsConfig.feature_group_version}.'
+        f'Inserting data into feature group {config.hopsworksSettingsConfig.feature_group_name} version {config.hopsworksSettingsConfig.feature_group_version}.'
     )
     feature_group_manager.insert_data_into_feature_group(data=data)
 
+    if config.meteostatSettingsConfig.incremental:
+        watermarks.update_watermarks(data)
+
     # NOTE: Later during training and inference we will create more sophisticated features.
     feature_view_manager = HopsworksFeatureViewManager(
-        api_key=hopsworksCredentialsConfig.api_key,
-        project_name=hopsworksCredentialsConfig.project_name,
-        feature_view_name=hopsworksSettingsConfig.feature_view_name,
-        feature_group_name=hopsworksSettingsConfig.feature_group_name,
-        feature_group_version=hopsworksSettingsConfig.feature_group_version,
-        start_datetime=meteostatSettingsConfig.start_date,
-        end_datetime=meteostatSettingsConfig.end_date,
+        api_key=config.hopsworksCredentialsConfig.api_key,
+        project_name=config.hopsworksCredentialsConfig.project_name,
+        feature_view_name=config.hopsworksSettingsConfig.feature_view_name,
+        feature_view_version=config.hopsworksSettingsConfig.feature_view_version,
+        feature_group_name=config.hopsworksSettingsConfig.feature_group_name,
+        feature_group_version=config.hopsworksSettingsConfig.feature_group_version,
+        start_datetime=config.meteostatSettingsConfig.start_date,
+        end_datetime=config.meteostatSettingsConfig.end_date,
+        connection=connection,
     )
 
     logger.info('Creating a feature view with basic features.')
@@ -0,0 +1,208 @@
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+import polars as pl
+from loguru import logger
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _month_end(day: date) -> date:
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def _months(start: date, end: date) -> list[date]:
+    """Get the first day of every month between start and end (inclusive)"""
+    months = []
+    month = _month_start(start)
+    while month <= end:
+        months.append(month)
+        month = _month_end(month) + timedelta(days=1)
+    return months
+
+
+class RawDataCache:
+    """
+    A lasting on-disk cache of the raw Meteostat data, partitioned by station and month.
+
+    Every partition is a Parquet file written with the raw table schema. A small
+    coverage file per station records up to which day each month has been returned
+    by the API, so partially fetched months are requested again once a later end
+    date is needed, while complete months are never requested twice. The current
+    month and the last `overlap_days` days are always requested again, the API
+    still publishes and corrects data for them.
+
+    Layout:
+        <cache_dir>/station_id=<id>/month=<YYYY-MM>.parquet
+        <cache_dir>/station_id=<id>/_coverage.json
+    """
+
+    def __init__(
+        self, cache_dir: str, table_schema: dict[str, type], overlap_days: int = 0
+    ):
+        """
+        Set up the cache
+
+        Args:
+            cache_dir (str): The cache directory, relative to the etl directory
+            table_schema (dict[str, type]): The Polars schema of the raw table
+            overlap_days (int): The number of days before today that are always
+                requested again
+        """
+        self._cache_dir = Path(Path(__file__).parent / cache_dir)
+        self._table_schema = table_schema
+        self._overlap_days = overlap_days
+
+    def _refresh_start(self) -> date:
+        # The first month that is always requested again, it contains the overlap
+        # window and ends with the current month
+        today = date.today()
+        return _month_start(
+            min(_month_start(today), today - timedelta(days=self._overlap_days))
+        )
+
+    def _station_dir(self, station_id: str) -> Path:
+        return self._cache_dir / f'station_id={station_id}'
+
+    def _partition_path(self, station_id: str, month: date) -> Path:
+        return self._station_dir(station_id) / f'month={month:%Y-%m}.parquet'
+
+    def _load_coverage(self, station_id: str) -> dict[str, str]:
+        coverage_path = self._station_dir(station_id) / '_coverage.json'
+        if not coverage_path.exists():
+            return {}
+
+        with coverage_path.open('r') as f:
+            return json.load(f)
+
+    def _save_coverage(self, station_id: str, coverage: dict[str, str]) -> None:
+        coverage_path = self._station_dir(station_id) / '_coverage.json'
+        tmp_path = coverage_path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(coverage, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, coverage_path)
+
+    def missing_range(
+        self, station_id: str, start_date: str, end_date: str
+    ) -> Optional[tuple[str, str]]:
+        """
+        Get the date range that has to be requested to cover start_date..end_date.
+
+        The range always starts on the first day of a month, so that every partition
+        written afterwards holds a complete month. Months in the refresh window (the
+        current month and the overlap window before today) are never fully cached.
+
+        Args:
+            station_id (str): The Meteostat station id
+            start_date (str): The first requested day (YYYY-MM-DD)
+            end_date (str): The last requested day (YYYY-MM-DD)
+
+        Returns:
+            Optional[tuple[str, str]]: The range to request, None if fully cached
+        """
+        end = date.fromisoformat(end_date)
+        coverage = self._load_coverage(station_id)
+        refresh_start = self._refresh_start()
+
+        for month in _months(date.fromisoformat(start_date), end):
+            if month >= refresh_start:
+                return month.isoformat(), end_date
+
+            covered_until = coverage.get(f'{month:%Y-%m}')
+            if covered_until is None or date.fromisoformat(covered_until) < min(
+                _month_end(month), end
+            ):
+                return month.isoformat(), end_date
+
+        return None
+
+    def write(
+        self, station_id: str, df: pl.DataFrame, start_date: str, end_date: str
+    ) -> None:
+        """
+        Write the data fetched for start_date..end_date into monthly partitions.
+
+        The coverage only extends to the last day the API returned, the days after
+        it are requested again by the next run instead of being taken as empty.
+
+        Args:
+            station_id (str): The Meteostat station id
+            df (pl.DataFrame): The raw data, as returned by the API
+            start_date (str): The first requested day, the first day of a month
+            end_date (str): The last requested day
+        """
+        station_dir = self._station_dir(station_id)
+        station_dir.mkdir(parents=True, exist_ok=True)
+
+        end = date.fromisoformat(end_date)
+        if df.is_empty():
+            logger.warning(
+                f'No data returned for station {station_id} ({start_date} to {end_date}).'
+            )
+            return
+
+        returned_until = date.fromisoformat(
+            df.get_column('date').str.slice(0, 10).max()
+        )
+        coverage = self._load_coverage(station_id)
+        partitions = df.with_columns(
+            pl.col('date').str.slice(0, 7).alias('month')
+        ).partition_by('month', as_dict=True, include_key=False)
+
+        for month in _months(date.fromisoformat(start_date), min(end, returned_until)):
+            partition = partitions.get((f'{month:%Y-%m}',))
+            partition_path = self._partition_path(station_id, month)
+
+            if partition is not None:
+                # Write to a temporary file first, so readers never see half a file
+                tmp_path = partition_path.with_suffix('.tmp')
+                partition.write_parquet(tmp_path)
+                os.replace(tmp_path, partition_path)
+
+            coverage[f'{month:%Y-%m}'] = min(
+                _month_end(month), end, returned_until
+            ).isoformat()
+
+        self._save_coverage(station_id, coverage)
+        logger.info(
+            f'Cached {df.height} rows for station {station_id} ({start_date} to {end_date}).'
+        )
+
+    def scan(self, station_id: str, start_date: str, end_date: str) -> pl.LazyFrame:
+        """
+        Lazily read the cached data of a station between start_date and end_date.
+
+        Args:
+            station_id (str): The Meteostat station id
+            start_date (str): The first day to read (YYYY-MM-DD)
+            end_date (str): The last day to read (YYYY-MM-DD)
+
+        Returns:
+            pl.LazyFrame: The raw data with an additional `station_id` column
+        """
+        partition_paths = [
+            path
+            for month in _months(
+                date.fromisoformat(start_date), date.fromisoformat(end_date)
+            )
+            if (path := self._partition_path(station_id, month)).exists()
+        ]
+
+        if not partition_paths:
+            return pl.LazyFrame(schema={**self._table_schema, 'station_id': pl.String})
+
+        return (
+            pl.scan_parquet(partition_paths)
+            .filter(
+                pl.col('date')
+                .str.slice(0, 10)
+                .is_between(pl.lit(start_date), pl.lit(end_date))
+            )
+            .with_columns(pl.lit(station_id).alias('station_id'))
+        )
@@ -45,6 +45,21 @@ class RawTableConfig:
         """Get column names for a table"""
         return list(self.config[table_name]['columns'])
 
+    def get_feature_descriptions(self, table_name: str) -> Dict[str, str]:
+        """Get the feature group descriptions of the features of a table"""
+        return {
+            name: feature['description']
+            for name, feature in self.config[table_name].get('features', {}).items()
+        }
+
+    def get_validation_rules(self, table_name: str) -> Dict[str, str]:
+        """Get the validation rules of the features of a table"""
+        return {
+            name: feature['validation_rules']
+            for name, feature in self.config[table_name].get('features', {}).items()
+            if 'validation_rules' in feature
+        }
+
 
 # Usage example:
 if __name__ == '__main__':
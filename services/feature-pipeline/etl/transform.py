@@ -1,49 +1,119 @@
-from typing import Optional
+from typing import Optional, Sequence
 
 import polars as pl
 from loguru import logger
 
+# Date formats the Meteostat API has been seen to return, tried in this order
+DATE_FORMATS = ['%F', '%F %T', '%D', '%c']
+
+
+def _detect_date_format(
+    df: pl.DataFrame, column_name: str = 'date', sample_size: int = 100
+) -> Optional[str]:
+    """
+    Detect the date format of a batch from a small sample of its values.
+
+    Args:
+        df (pl.DataFrame): The raw data
+        column_name (str): The name of the date column
+        sample_size (int): The number of non-null values to check
+
+    Returns:
+        Optional[str]: The first format that parses the whole sample, None otherwise
+    """
+    sample = df.get_column(column_name).drop_nulls().head(sample_size)
+    if sample.is_empty():
+        return None
+
+    for date_format in DATE_FORMATS:
+        if sample.str.strptime(pl.Date, date_format, strict=False).null_count() == 0:
+            return date_format
+
+    return None
+
 
 def _convert_date(
-    df: pl.DataFrame, column_name: Optional[str] = 'date'
-) -> pl.DataFrame:
-    return df.select(
-        pl.coalesce(
-            pl.col(column_name).str.strptime(pl.Date, '%F', strict=False),
-            pl.col(column_name).str.strptime(pl.Date, '%F %T', strict=False),
-            pl.col(column_name).str.strptime(pl.Date, '%D', strict=False),
-            pl.col(column_name).str.strptime(pl.Date, '%c', strict=False),
-        ).alias(column_name)
-    )
+    column_name: Optional[str] = 'date', date_format: Optional[str] = None
+) -> pl.Expr:
+    if date_format is not None:
+        return pl.col(column_name).str.strptime(pl.Date, date_format, strict=False)
+
+    # Mixed or unknown formats: try every format on every row
+    return pl.coalesce(
+        [
+            pl.col(column_name).str.strptime(pl.Date, date_format, strict=False)
+            for date_format in DATE_FORMATS
+        ]
+    ).alias(column_name)
 
 
-def _round_all_columns(df: pl.DataFrame, decimal_points: int = 2) -> pl.DataFrame:
-    numeric_cols = [
-        col for col in df.columns if df.schema[col] in [pl.Float32, pl.Float64]
+def _round_all_columns(schema: pl.Schema, decimal_points: int = 2) -> list[pl.Expr]:
+    return [
+        pl.col(col).round(decimal_points)
+        for col, dtype in schema.items()
+        if dtype in [pl.Float32, pl.Float64]
     ]
 
-    return df.with_columns([pl.col(col).round(decimal_points) for col in numeric_cols])
 
+def label_column_name(column_name: str, horizon: int) -> str:
+    """The name of the label `horizon` days ahead, the next day keeps the plain name"""
+    if horizon == 1:
+        return f'{column_name}_label'
+    return f'{column_name}_label_{horizon}d'
 
-def _add_label_column(
-    df: pl.DataFrame, column_name: str, shift: int = 1
-) -> pl.DataFrame:
-    return df.with_columns(
-        pl.col(column_name).shift(shift).alias(f'{column_name}_label')
-    )
 
+def _add_label_columns(
+    column_name: str, horizons: Sequence[int] = (1,), group_by: str = 'station_id'
+) -> list[pl.Expr]:
+    # Shift back within each station (the rows are sorted by date), so the label of
+    # a day is the value `horizon` days later and never leaks across stations
+    return [
+        pl.col(column_name)
+        .shift(-horizon)
+        .over(group_by, order_by='date')
+        .alias(label_column_name(column_name, horizon))
+        for horizon in horizons
+    ]
 
-def transform_data(df: pl.DataFrame) -> pl.DataFrame:
-    logger.info('Converting the date column to a date type.')
-    df = df.with_columns(_convert_date(df, 'date').get_column('date'))
 
-    logger.info('Rounding all the columns to a given decimal points.')
-    df = _round_all_columns(df, decimal_points=0)
+def transform_data(df: pl.DataFrame, horizons: Sequence[int] = (1,)) -> pl.DataFrame:
+    """
+    Convert the date, round the numeric columns and add the label columns.
+
+    The date format is detected once from a sample, so only data with mixed formats
+    is parsed with every format. The labels of the last days of a station are not
+    known yet: they stay null and are filled when a later run re-requests those days
+    (see `incremental_overlap_days`), instead of dropping the latest days.
+
+    Args:
+        df (pl.DataFrame): The raw data
+        horizons (Sequence[int]): The days ahead of every label column
 
+    Returns:
+        pl.DataFrame: The transformed data
+    """
+    labels = [label_column_name('tsun', horizon) for horizon in horizons]
+
+    date_format = _detect_date_format(df, 'date')
+    if date_format is None:
+        logger.warning('Could not detect a single date format, trying all formats.')
+    else:
+        logger.info(f"Converting the date column with format '{date_format}'.")
+
+    logger.info('Rounding all the columns to a given decimal points.')
     logger.info(
-        "Adding a label column. The label column is the value of 'tsun' the following day."
+        f"Adding label columns {labels}, the values of 'tsun' {list(horizons)} days later."
+    )
+    schema = df.schema
+    df = (
+        df.with_columns(
+            _convert_date('date', date_format),
+            *_round_all_columns(schema, decimal_points=0),
+        )
+        .with_columns(_add_label_columns(column_name='tsun', horizons=horizons))
+        .drop_nulls(subset=schema.names())
+        .sort('station_id', 'date')
     )
-    df = _add_label_column(df, column_name='tsun', shift=1).drop_nulls().sort('date')
 
     logger.info('Successfully transformed the data.')
 
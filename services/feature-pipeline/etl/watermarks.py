@@ -0,0 +1,124 @@
+import json
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import polars as pl
+from config import config
+from loguru import logger
+
+
+def _watermark_file() -> Path:
+    # Resolve the path relative to the etl directory, like the raw data output
+    return Path(Path(__file__).parent / config.meteostatSettingsConfig.watermark_path)
+
+
+def load_watermarks() -> dict[str, str]:
+    """
+    Load the high-water marks (last loaded date per station).
+
+    Returns:
+        dict[str, str]: The last loaded date (YYYY-MM-DD) per station id
+    """
+    file_path = _watermark_file()
+    if not file_path.exists():
+        logger.info(f'No watermarks found at {file_path}, running a full extraction.')
+        return {}
+
+    with file_path.open('r') as f:
+        return json.load(f)
+
+
+def _window_start(watermark: str) -> date:
+    # Re-request a few days before the watermark to pick up late corrections
+    return date.fromisoformat(watermark) - timedelta(
+        days=config.meteostatSettingsConfig.incremental_overlap_days
+    )
+
+
+def get_start_dates(station_ids: list[str], default_start_date: str) -> dict[str, str]:
+    """
+    Get the first day to request for every station in incremental mode.
+
+    Args:
+        station_ids (list[str]): The station ids to extract
+        default_start_date (str): The start date for stations without a watermark
+
+    Returns:
+        dict[str, str]: The first day to request (YYYY-MM-DD) per station id
+    """
+    watermarks = load_watermarks()
+
+    start_dates = {}
+    for station_id in station_ids:
+        if station_id in watermarks:
+            start_dates[station_id] = max(
+                _window_start(watermarks[station_id]),
+                date.fromisoformat(default_start_date),
+            ).isoformat()
+        else:
+            start_dates[station_id] = default_start_date
+
+    logger.info(f'Incremental start dates: {start_dates}.')
+    return start_dates
+
+
+def filter_new_rows(df: pl.DataFrame) -> pl.DataFrame:
+    """
+    Keep only the rows that are newer than the overlap window of their station.
+
+    Rows before the window were only requested as context for the label shift and
+    are already stored in the feature group.
+
+    Args:
+        df (pl.DataFrame): The transformed data with `station_id` and `date` columns
+
+    Returns:
+        pl.DataFrame: The rows that have to be upserted
+    """
+    watermarks = load_watermarks()
+    if not watermarks:
+        return df
+
+    window_starts = pl.DataFrame(
+        {
+            'station_id': list(watermarks.keys()),
+            'window_start': [_window_start(w) for w in watermarks.values()],
+        },
+        schema={'station_id': pl.String, 'window_start': pl.Date},
+    )
+
+    return (
+        df.join(window_starts, on='station_id', how='left')
+        .filter(
+            pl.col('window_start').is_null() | (pl.col('date') > pl.col('window_start'))
+        )
+        .drop('window_start')
+    )
+
+
+def update_watermarks(df: pl.DataFrame) -> None:
+    """
+    Move the high-water mark of every station in `df` to its latest loaded date.
+
+    Args:
+        df (pl.DataFrame): The data that was loaded into the feature group
+    """
+    watermarks = load_watermarks()
+
+    latest_dates = df.group_by('station_id').agg(pl.col('date').max())
+    for station_id, latest_date in latest_dates.iter_rows():
+        latest_date = latest_date.isoformat()
+        watermarks[station_id] = max(
+            watermarks.get(station_id, latest_date), latest_date
+        )
+
+    file_path = _watermark_file()
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file first, so a crash never leaves truncated watermarks
+    tmp_path = file_path.with_suffix('.tmp')
+    with tmp_path.open('w') as f:
+        json.dump(watermarks, f, indent=4, sort_keys=True)
+    os.replace(tmp_path, file_path)
+
+    logger.info(f'Updated watermarks for {latest_dates.height} stations.')
@@ -1,7 +1,49 @@
-import hopsworks
+import copy
+from typing import TYPE_CHECKING, Any, Optional
+
 import polars as pl
-from hsfs.feature_view import FeatureView
+from config import config
+from etl.table_config.raw_table_config import RawTableConfig
+from feature_store_connection import get_connection
 from loguru import logger
+from pipeline_common import instrumentation
+from pipeline_common.feature_store_connection import FeatureStoreConnection
+
+# Pandas is only needed to insert, and Hopsworks only when it is the backend
+if TYPE_CHECKING:
+    import pandas as pd
+    from hsfs.feature_view import FeatureView
+
+
+def to_insert_frame(
+    data: pl.DataFrame, date_column: str = 'date', arrow_backed: bool = True
+) -> 'pd.DataFrame':
+    """
+    Convert a Polars DataFrame into the Pandas DataFrame handed to the feature group.
+
+    The date column is cast to a date as one vectorized column operation in Polars.
+    With `arrow_backed` the Pandas columns are Arrow extension arrays that share the
+    Polars buffers, instead of NumPy copies and an object column of Python dates.
+
+    Args:
+        data (pl.DataFrame): The data to insert
+        date_column (str): The name of the column that has to be a date
+        arrow_backed (bool): Whether to hand off Arrow-backed columns
+
+    Returns:
+        pd.DataFrame: The data ready for insertion
+    """
+    data = data.with_columns(pl.col(date_column).cast(pl.Date))
+
+    if arrow_backed:
+        return data.to_pandas(use_pyarrow_extension_array=True)
+
+    import pandas as pd
+
+    # NumPy-backed frame, the date column stays an object column of Python dates
+    pandas_df = data.to_pandas()
+    pandas_df[date_column] = pd.to_datetime(pandas_df[date_column]).dt.date
+    return pandas_df
 
 
 class HopsworksFeatureGroupManager:
@@ -18,23 +60,28 @@ class HopsworksFeatureGroupManager:
         feature_group_primary_keys: list[str],
         feature_group_description: str,
         feature_group_event_time: str,
+        arrow_backed_insert: bool = True,
+        connection: Optional[FeatureStoreConnection] = None,
     ):
         """
         Establish a connection to the Hopsworks Feature Store and set up the feature group
+
+        Without a `connection`, the shared connection of the project is used, so the
+        login happens at most once per run.
         """
         self.feature_group_name = feature_group_name
         self.feature_group_version = feature_group_version
+        self.feature_group_event_time = feature_group_event_time
+        self.arrow_backed_insert = arrow_backed_insert
 
         # Establish a connection to the Hopsworks Feature Store
-        logger.info(f'Logging in to Hopsworks project {project_name}')
-        project = hopsworks.login(project=project_name, api_key_value=api_key)
-        self._feature_store = project.get_feature_store()
+        self._connection = connection or get_connection(project_name, api_key)
 
         # Get the feature group
         logger.info(
             f'Getting or creating feature group {feature_group_name} version {feature_group_version}'
         )
-        self._feature_group = self._feature_store.get_or_create_feature_group(
+        self._feature_group = self._connection.get_or_create_feature_group(
             name=feature_group_name,
             version=feature_group_version,
             description=feature_group_description,
@@ -52,141 +99,104 @@ class HopsworksFeatureGroupManager:
             f'Successfully connected to feature group {feature_group_name} version {feature_group_version}'
         )
 
-    def insert_data_into_feature_group(self, data: pl.DataFrame) -> None:
+    def insert_data_into_feature_group(
+        self,
+        data: pl.DataFrame,
+        wait_for_job: bool = True,
+        update_descriptions: bool = True,
+    ) -> Optional[Any]:
         """
         Insert data into a feature group
 
         Args:
             data (pl.DataFrame): The data to insert into the feature group
+            wait_for_job (bool): Whether to block until the materialization job is done
+            update_descriptions (bool): Whether to update the feature descriptions
 
         Returns:
-            None
+            Optional[Any]: The materialization job of the insert, if there is one
 
         Raises:
             Exception: If the data fails to be inserted into the feature group
 
         """
         try:
-            # Convert Polars DataFrame to Pandas DataFrame
-            pandas_df = data.to_pandas()
-
-            # Convert timestamp to date if needed
-            pandas_df['date'] = pandas_df['date'].dt.date
+            # Convert Polars DataFrame to Pandas DataFrame (Arrow-backed by default)
+            pandas_df = to_insert_frame(
+                data,
+                date_column=self.feature_group_event_time,
+                arrow_backed=self.arrow_backed_insert,
+            )
 
             # Insert data into the feature group
-            self._feature_group.insert(
-                pandas_df,
-                write_options={
-                    'wait_for_job': True,
-                    'overwrite': False,
-                },
-            )
+            with instrumentation.measure(
+                'feature_group_insert', feature_group=self.feature_group_name
+            ) as call:
+                call.rows_in = data.height
+                call.bytes_transferred = data.estimated_size()
+                job, _ = self._feature_group.insert(
+                    pandas_df,
+                    write_options={
+                        'wait_for_job': wait_for_job,
+                        'overwrite': False,
+                    },
+                )
             logger.info(
                 f'Successfully inserted data into feature group {self.feature_group_name}'
             )
+        except:
+            logger.error(
+                f'Failed to insert data into feature group {self.feature_group_name}'
+            )
+            raise
+
+        if update_descriptions:
+            self.update_feature_descriptions()
+
+        return job
+
+    def update_feature_descriptions(self) -> None:
+        """
+        Update the feature descriptions of the feature group
+
+        The descriptions come from the raw table config. Only the descriptions that
+        differ from the current metadata of the feature group are sent, in a single
+        batched update, so a run without changes makes no metadata calls at all.
+
+        Raises:
+            Exception: If the feature descriptions fail to be updated
+        """
+        try:
+            feature_descriptions = RawTableConfig(
+                config.meteostatSettingsConfig.yaml_config_file
+            ).get_feature_descriptions(config.meteostatSettingsConfig.table_name)
+
+            changed_features = []
+            for feature in self._feature_group.features:
+                description = feature_descriptions.get(feature.name)
+                if description is not None and feature.description != description:
+                    # Update a copy, so a failed update leaves the metadata intact
+                    changed_feature = copy.copy(feature)
+                    changed_feature.description = description
+                    changed_features.append(changed_feature)
+
+            if not changed_features:
+                logger.info(
+                    f'Feature descriptions of feature group {self.feature_group_name} are up to date'
+                )
+                return
 
-            # Add feature descriptions and statistics
             logger.info(
-                f'Updating feature descriptions and statistics for feature group {self.feature_group_name}'
+                f'Updating {len(changed_features)} feature descriptions for feature group {self.feature_group_name}'
             )
-            feature_descriptions = [
-                {
-                    'name': 'date',
-                    'description': """
-                                    The date of the data point.
-                                    """,
-                    'validation_rules': 'date',
-                },
-                {
-                    'name': 'tavg',
-                    'description': """
-                                    Average temperature in degrees Celsius.
-                                    """,
-                    'validation_rules': '>=-20 and <=40 (float)',
-                },
-                {
-                    'name': 'tmin',
-                    'description': """
-                                    Minimum temperature in degrees Celsius.
-                                    """,
-                    'validation_rules': '>=-20 and <=40 (float)',
-                },
-                {
-                    'name': 'tmax',
-                    'description': """
-                                    Maximum temperature in degrees Celsius.
-                                    """,
-                    'validation_rules': '>=-20 and <=40 (float)',
-                },
-                {
-                    'name': 'prcp',
-                    'description': """
-                                    The daily precipitation total in mm.
-                                    """,
-                    'validation_rules': '>=0 and <=1000 (float)',
-                },
-                {
-                    'name': 'snow',
-                    'description': """
-                                    The snow depth in mm.
-                                    """,
-                    'validation_rules': '>=0 and <=100 (float)',
-                },
-                {
-                    'name': 'wdir',
-                    'description': """
-                                    The average wind direction in degrees (°).
-                                    """,
-                    'validation_rules': '>=0 and <=360 (float)',
-                },
-                {
-                    'name': 'wspd',
-                    'description': """
-                                    The average wind speed in km/h.
-                                    """,
-                    'validation_rules': '>=0 and <=100 (float)',
-                },
-                {
-                    'name': 'wpgt',
-                    'description': """
-                                    The peak wind gust in km/h.
-                                    """,
-                    'validation_rules': '>=0 and <=100 (float)',
-                },
-                {
-                    'name': 'pres',
-                    'description': """
-                                    The average sea-level air pressure in hPa.
-                                    """,
-                    'validation_rules': '>=900 and <=1100 (float)',
-                },
-                {
-                    'name': 'tsun',
-                    'description': """
-                                    The daily sunshine total in minutes (m).
-                                    """,
-                    'validation_rules': '>=0 and <=1440 (float)',
-                },
-                {
-                    'name': 'tsun_label',
-                    'description': """
-                                    The daily sunshine total in minutes (m) as a label, shifted by 1 day.
-                                    """,
-                    'validation_rules': '>=0 and <=1440 (float)',
-                },
-            ]
-
-            for description in feature_descriptions:
-                self._feature_group.update_feature_description(
-                    description['name'], description['description']
-                )
+            self._feature_group.update_features(changed_features)
 
             logger.info(
                 f'Successfully updated feature descriptions for feature group {self.feature_group_name}'
             )
         except:
             logger.error(
-                f'Failed to insert data into feature group {self.feature_group_name}'
+                f'Failed to update feature descriptions for feature group {self.feature_group_name}'
             )
             raise
 
@@ -199,29 +209,34 @@ class HopsworksFeatureViewManager:
         feature_group_name: str,
         feature_group_version: int,
         feature_view_name: str,
+        feature_view_version: int,
         start_datetime: str,
         end_datetime: str,
+        connection: Optional[FeatureStoreConnection] = None,
     ):
         """
         Establish a connection to the Hopsworks Feature Store and set up the feature view
+
+        Without a `connection`, the shared connection of the project is used, so the
+        login happens at most once per run.
         """
         self._feature_group_name = feature_group_name
         self._feature_group_version = feature_group_version
         self._feature_view_name = feature_view_name
+        self._feature_view_version = feature_view_version
         self.start_datetime = start_datetime
         self.end_datetime = end_datetime
 
         # Establish a connection to the Hopsworks Feature Store
-        logger.info(f'Logging in to Hopsworks project {project_name}')
-        project = hopsworks.login(project=project_name, api_key_value=api_key)
-        self._feature_store = project.get_feature_store()
-        self._feature_group = self._feature_store.get_feature_group(
+        self._connection = connection or get_connection(project_name, api_key)
+        self._feature_group = self._connection.get_feature_group(
             self._feature_group_name, self._feature_group_version
         )
 
-    def create_feature_view(self, query: str = None) -> FeatureView:
+    def create_feature_view(self, query: str = None) -> 'FeatureView':
         """
-        Create a feature view in the Hopsworks Feature Store
+        Create the configured version of the feature view in the Hopsworks Feature
+        Store, or get it if it already exists
 
         Args:
             feature_view_name (str): The name of the feature view
@@ -239,19 +254,22 @@ class HopsworksFeatureViewManager:
             query = self._feature_group.select_all()
 
             # Create the feature view
-            feature_view = self._feature_store.create_feature_view(
+            feature_view = self._connection.get_or_create_feature_view(
                 name=self._feature_view_name,
+                version=self._feature_view_version,
                 description=f'Feature view for {self._feature_group_name}',
                 query=query,
             )
-            logger.info(f'Successfully created feature view {self._feature_view_name}')
+            logger.info(
+                f'Successfully created feature view {self._feature_view_name} version {self._feature_view_version}'
+            )
 
             return feature_view
         except:
             logger.error(f'Failed to create feature view {self._feature_view_name}')
             raise
 
-    def get_feature_view(self) -> FeatureView:
+    def get_feature_view(self) -> 'FeatureView':
         """
         Get a feature view from the Hopsworks Feature Store
 
@@ -267,7 +285,9 @@ class HopsworksFeatureViewManager:
         """
         try:
             # Get the feature view
-            feature_view = self._feature_store.get_feature_view(self._feature_view_name)
+            feature_view = self._connection.get_feature_view(
+                self._feature_view_name, self._feature_view_version
+            )
             logger.info(
                 f'Successfully retrieved feature view {self._feature_view_name}'
             )
@@ -1,26 +1,96 @@
-from config.config import meteostatSettingsConfig
-from etl import extract, load, transform
-from etl.utils import delete_file
+from pathlib import Path
+
+from config import config
+from etl import extract, load, transform, watermarks
 from loguru import logger
+from pipeline_common import instrumentation
+from pipeline_common.dag import DagRunner, Stage
 
 
 def pipeline() -> None:
     """
     The main function that orchestrates the feature pipeline.
+
+    The stages run on a DagRunner: the extraction always runs (the raw cache keeps it
+    cheap), the transformation is skipped when the extracted data, its settings and
+    its code did not change since a previous run. The load writes to the feature
+    store, so it always runs.
     """
 
     logger.info('Starting the feature pipeline.')
-    logger.info('Extracting data from the Meteostat API.')
-    extarcted_data = extract.extract_data_from_api()
+    metrics_dir = Path(__file__).parent / config.pipelineSettingsConfig.metrics_dir
+    instrumentation.configure(
+        'feature-pipeline',
+        profile_dir=metrics_dir / 'profiles'
+        if config.pipelineSettingsConfig.profile_stages
+        else None,
+    )
+    station_ids = config.meteostatSettingsConfig.station_ids or [
+        config.meteostatSettingsConfig.station_id
+    ]
+
+    def extract_stage():
+        logger.info('Extracting data from the Meteostat API.')
+        return extract.extract_data_for_stations(
+            station_ids=station_ids,
+            start_dates=watermarks.get_start_dates(
+                station_ids,
+                default_start_date=config.meteostatSettingsConfig.start_date,
+            )
+            if config.meteostatSettingsConfig.incremental
+            else None,
+        )
 
-    logger.info('Transforming the extracted data.')
-    transformed_data = transform.transform_data(df=extarcted_data)
+    def transform_stage(extract):
+        logger.info('Transforming the extracted data.')
+        transformed_data = transform.transform_data(
+            df=extract, horizons=config.meteostatSettingsConfig.label_horizons
+        )
+        logger.info(f'Transformed data: {transformed_data.shape}')
+        return transformed_data
 
-    logger.info('Loading the transformed data into the Feature Store.')
-    load.load_data_into_feature_group(data=transformed_data)
+    def load_stage(transform):
+        logger.info('Loading the transformed data into the Feature Store.')
+        load.load_data_into_feature_group(data=transform)
 
-    logger.info('Deleting the extracted data file.')
-    delete_file(file_path=meteostatSettingsConfig.output_path)
+    runner = DagRunner(
+        [
+            # The API is an external source, its data is addressed by its content
+            Stage('extract', extract_stage, cache=False),
+            Stage(
+                'transform',
+                transform_stage,
+                inputs=('extract',),
+                config={
+                    'label_horizons': config.meteostatSettingsConfig.label_horizons
+                },
+                code=(transform,),
+            ),
+            Stage(
+                'load',
+                load_stage,
+                inputs=('transform',),
+                config={
+                    'feature_group': config.hopsworksSettingsConfig,
+                    'incremental': config.meteostatSettingsConfig.incremental,
+                    # The incremental load only upserts the rows after the watermarks
+                    'watermarks': watermarks.load_watermarks()
+                    if config.meteostatSettingsConfig.incremental
+                    else None,
+                },
+                code=(load,),
+                sink=True,
+            ),
+        ],
+        cache_dir=Path(__file__).parent / config.pipelineSettingsConfig.stage_cache_dir
+        if config.pipelineSettingsConfig.stage_cache
+        else None,
+        keep=config.pipelineSettingsConfig.stage_cache_keep,
+    )
+    try:
+        runner.run(['load'])
+    finally:
+        instrumentation.write_report(metrics_dir)
 
     logger.info('Successfully completed the feature pipeline.')
 
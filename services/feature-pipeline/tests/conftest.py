@@ -0,0 +1,6 @@
+import os
+
+# Dummy credentials, the tests never talk to Meteostat or Hopsworks
+os.environ.setdefault('API_KEY', 'test')
+os.environ.setdefault('API_HOST', 'localhost')
+os.environ.setdefault('PROJECT_NAME', 'test')
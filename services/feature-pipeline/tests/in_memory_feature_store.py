@@ -0,0 +1,151 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import pandas as pd
+import polars as pl
+from loguru import logger
+
+
+@dataclass
+class InMemoryFeature:
+    name: str
+    description: str = ''
+
+
+class InMemoryJob:
+    """A materialization job that finishes `duration` seconds after it was created"""
+
+    def __init__(self, name: str, duration: float = 0.0):
+        self.name = name
+        self._finished_at = time.monotonic() + duration
+
+    def get_state(self) -> str:
+        return 'FINISHED' if time.monotonic() >= self._finished_at else 'RUNNING'
+
+    def get_final_state(self) -> str:
+        return 'FINISHED' if time.monotonic() >= self._finished_at else 'UNDEFINED'
+
+
+class InMemoryFeatureGroup:
+    """
+    An in-memory stand-in for a Hopsworks feature group.
+
+    Inserts are upserts on the primary key, like inserts into an offline feature
+    group. Every insert returns a job that takes `job_duration` seconds to finish.
+    `fail_after` makes every insert after the given number of successful ones raise,
+    to simulate a crash in the middle of a backfill.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        version: int,
+        primary_key: list[str],
+        event_time: Optional[str] = None,
+        job_duration: float = 0.0,
+        fail_after: Optional[int] = None,
+    ):
+        self.name = name
+        self.version = version
+        self.primary_key = primary_key
+        self.event_time = event_time
+        self.job_duration = job_duration
+        self.fail_after = fail_after
+
+        self.insert_count = 0
+        self.inserted_rows = 0
+        self.metadata_update_count = 0
+        self._data: Optional[pl.DataFrame] = None
+        self._descriptions: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def features(self) -> list[InMemoryFeature]:
+        if self._data is None:
+            return []
+        return [
+            InMemoryFeature(name=name, description=self._descriptions.get(name, ''))
+            for name in self._data.columns
+        ]
+
+    def insert(
+        self, features: pd.DataFrame, write_options: Optional[dict] = None
+    ) -> tuple[InMemoryJob, None]:
+        with self._lock:
+            if self.fail_after is not None and self.insert_count >= self.fail_after:
+                raise RuntimeError(
+                    f'Simulated failure after {self.fail_after} inserts into {self.name}'
+                )
+
+            data = pl.from_pandas(features)
+            if self._data is None:
+                self._data = data
+            else:
+                # Upsert: the new rows replace existing rows with the same primary key
+                self._data = pl.concat(
+                    [self._data.join(data, on=self.primary_key, how='anti'), data],
+                    how='vertical_relaxed',
+                )
+
+            self.insert_count += 1
+            self.inserted_rows += data.height
+
+            job = InMemoryJob(
+                f'{self.name}_{self.version}_{self.insert_count}',
+                duration=self.job_duration,
+            )
+            return job, None
+
+    def update_feature_description(self, name: str, description: str) -> None:
+        self.metadata_update_count += 1
+        self._descriptions[name] = description
+
+    def update_features(self, features: list[InMemoryFeature]) -> None:
+        self.metadata_update_count += 1
+        for feature in features:
+            self._descriptions[feature.name] = feature.description
+
+    def read(self) -> pl.DataFrame:
+        if self._data is None:
+            return pl.DataFrame()
+        return self._data.sort(self.primary_key)
+
+
+class InMemoryFeatureStore:
+    """An in-memory stand-in for the Hopsworks feature store, for offline runs"""
+
+    def __init__(self, job_duration: float = 0.0, fail_after: Optional[int] = None):
+        """
+        Args:
+            job_duration (float): Passed on to every feature group created
+            fail_after (Optional[int]): Passed on to every feature group created
+        """
+        self.job_duration = job_duration
+        self.fail_after = fail_after
+        self._feature_groups: dict[tuple[str, int], InMemoryFeatureGroup] = {}
+
+    def get_or_create_feature_group(
+        self,
+        name: str,
+        version: int,
+        primary_key: list[str],
+        event_time: Optional[str] = None,
+        **kwargs: Any,
+    ) -> InMemoryFeatureGroup:
+        if (name, version) not in self._feature_groups:
+            logger.info(f'Creating in-memory feature group {name} version {version}')
+            self._feature_groups[(name, version)] = InMemoryFeatureGroup(
+                name=name,
+                version=version,
+                primary_key=primary_key,
+                event_time=event_time,
+                job_duration=self.job_duration,
+                fail_after=self.fail_after,
+            )
+
+        return self._feature_groups[(name, version)]
+
+    def get_feature_group(self, name: str, version: int) -> InMemoryFeatureGroup:
+        return self._feature_groups[(name, version)]
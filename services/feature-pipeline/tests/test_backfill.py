@@ -0,0 +1,97 @@
+from datetime import date
+
+import backfill
+import polars as pl
+import pytest
+from benchmarks.meteostat_stub_server import MeteostatStubServer
+from config.config import (
+    backfillSettingsConfig,
+    hopsworksSettingsConfig,
+    meteostatSettingsConfig,
+)
+from pipeline_common.feature_store_connection import FeatureStoreConnection
+
+from tests.in_memory_feature_store import InMemoryFeatureStore
+
+STATION_IDS = ['10000', '10001']
+START_DATE = '2021-01-15'
+END_DATE = '2021-12-31'
+# 2021-01-15 to 2021-03-31, then three more quarters, per station
+N_CHUNKS = 2 * 4
+N_DAYS = 351
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    with MeteostatStubServer() as server:
+        monkeypatch.setattr(meteostatSettingsConfig, 'meteostat_endpoint', server.url)
+        monkeypatch.setattr(meteostatSettingsConfig, 'station_ids', STATION_IDS)
+        monkeypatch.setattr(
+            meteostatSettingsConfig, 'raw_cache_dir', str(tmp_path / 'raw')
+        )
+        monkeypatch.setattr(
+            meteostatSettingsConfig,
+            'watermark_path',
+            str(tmp_path / 'watermarks.json'),
+        )
+        monkeypatch.setattr(backfillSettingsConfig, 'backfill_start_date', START_DATE)
+        monkeypatch.setattr(backfillSettingsConfig, 'backfill_end_date', END_DATE)
+        monkeypatch.setattr(backfillSettingsConfig, 'chunk_months', 3)
+        monkeypatch.setattr(backfillSettingsConfig, 'max_concurrent_inserts', 1)
+        monkeypatch.setattr(backfillSettingsConfig, 'job_poll_interval', 0.01)
+        monkeypatch.setattr(
+            backfillSettingsConfig,
+            'checkpoint_path',
+            str(tmp_path / 'checkpoint.json'),
+        )
+        yield server
+
+
+def _backfill(feature_store: InMemoryFeatureStore):
+    backfill.backfill(FeatureStoreConnection('test', feature_store=feature_store))
+    return feature_store.get_feature_group(
+        hopsworksSettingsConfig.feature_group_name,
+        hopsworksSettingsConfig.feature_group_version,
+    )
+
+
+def test_chunks_are_split_by_station_and_months():
+    chunks = backfill._plan_chunks(
+        STATION_IDS, date(2021, 1, 15), date(2021, 7, 10), chunk_months=3
+    )
+
+    assert [chunk.chunk_id for chunk in chunks] == [
+        '10000/2021-01-15/2021-03-31',
+        '10001/2021-01-15/2021-03-31',
+        '10000/2021-04-01/2021-06-30',
+        '10001/2021-04-01/2021-06-30',
+        '10000/2021-07-01/2021-07-10',
+        '10001/2021-07-01/2021-07-10',
+    ]
+
+
+def test_every_chunk_is_inserted_once(server):
+    feature_group = _backfill(InMemoryFeatureStore())
+
+    data = feature_group.read()
+    assert feature_group.insert_count == N_CHUNKS
+    assert feature_group.inserted_rows == data.height == len(STATION_IDS) * N_DAYS
+    assert data.get_column('date').min() == date.fromisoformat(START_DATE)
+    assert data.get_column('date').max() == date.fromisoformat(END_DATE)
+
+
+def test_resume_skips_the_committed_chunks(server):
+    with pytest.raises(RuntimeError, match='run the backfill again to resume'):
+        _backfill(InMemoryFeatureStore(fail_after=3))
+    requests_before_resume = server.total_requests
+
+    feature_group = _backfill(InMemoryFeatureStore())
+
+    # Only the chunks after the failure are sent again, from the raw cache; one
+    # insert at a time, so the first three chunks were committed
+    assert feature_group.insert_count == N_CHUNKS - 3
+    assert server.total_requests == requests_before_resume
+    first_dates = dict(
+        feature_group.read().group_by('station_id').agg(pl.col('date').min()).rows()
+    )
+    assert first_dates == {'10000': date(2021, 7, 1), '10001': date(2021, 4, 1)}
@@ -0,0 +1,111 @@
+import time
+
+import pytest
+from benchmarks.meteostat_stub_server import MeteostatStubServer
+from config.config import meteostatSettingsConfig
+from etl import extract
+
+# A past range, so the raw cache never refreshes it
+START_DATE = '2020-01-01'
+END_DATE = '2020-03-31'
+N_DAYS = 91
+STATION_IDS = [str(10000 + i) for i in range(8)]
+
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(meteostatSettingsConfig, 'raw_cache_dir', str(tmp_path))
+    monkeypatch.setattr(meteostatSettingsConfig, 'max_retries', 3)
+    monkeypatch.setattr(meteostatSettingsConfig, 'backoff_factor', 0.0)
+    return meteostatSettingsConfig
+
+
+def _serve(settings, monkeypatch, **kwargs) -> MeteostatStubServer:
+    server = MeteostatStubServer(**kwargs).start()
+    monkeypatch.setattr(settings, 'meteostat_endpoint', server.url)
+    return server
+
+
+def _extract(station_ids=STATION_IDS, **kwargs):
+    return extract.extract_data_for_stations(
+        station_ids, start_date=START_DATE, end_date=END_DATE, **kwargs
+    ).collect()
+
+
+def test_requests_are_concurrent_up_to_the_limit(settings, monkeypatch):
+    server = _serve(settings, monkeypatch, latency=0.2)
+    try:
+        start = time.perf_counter()
+        df = _extract(max_concurrent_requests=4)
+        seconds = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert df.height == len(STATION_IDS) * N_DAYS
+    assert server.requests_per_station == dict.fromkeys(STATION_IDS, 1)
+    assert server.max_in_flight == 4
+    # Two waves of requests instead of eight sequential ones
+    assert seconds < 8 * 0.2
+
+
+def test_rate_limited_requests_wait_for_retry_after(settings, monkeypatch):
+    server = _serve(settings, monkeypatch, failures_per_station=1, retry_after=1)
+    try:
+        start = time.perf_counter()
+        df = _extract(STATION_IDS[:2])
+        seconds = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert df.height == 2 * N_DAYS
+    assert server.requests_per_station == {STATION_IDS[0]: 2, STATION_IDS[1]: 2}
+    assert seconds >= 1
+
+
+def test_failed_requests_back_off(settings, monkeypatch):
+    # Without a Retry-After header the backoff applies, urllib3 retries the first
+    # failure at once and waits backoff_factor * 2 seconds before the second retry
+    monkeypatch.setattr(settings, 'backoff_factor', 0.25)
+    server = _serve(
+        settings,
+        monkeypatch,
+        failures_per_station=2,
+        failure_status=503,
+        retry_after=None,
+    )
+    try:
+        start = time.perf_counter()
+        df = _extract(STATION_IDS[:1])
+        seconds = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    assert df.height == N_DAYS
+    assert server.requests_per_station == {STATION_IDS[0]: 3}
+    assert seconds >= 0.5
+
+
+def test_stations_failing_after_all_retries_are_skipped(settings, monkeypatch):
+    server = _serve(settings, monkeypatch, failures_per_station=4)
+    try:
+        with pytest.raises(ValueError, match='any of the requested stations'):
+            _extract(STATION_IDS[:2])
+    finally:
+        server.stop()
+
+    # The first request and max_retries retries
+    assert server.requests_per_station == {STATION_IDS[0]: 4, STATION_IDS[1]: 4}
+
+
+def test_warm_cache_makes_no_requests(settings, monkeypatch):
+    server = _serve(settings, monkeypatch)
+    try:
+        cold = _extract()
+        requests_after_cold_run = server.total_requests
+        warm = _extract()
+    finally:
+        server.stop()
+
+    assert requests_after_cold_run == len(STATION_IDS)
+    assert server.total_requests == requests_after_cold_run
+    assert warm.sort('station_id', 'date').equals(cold.sort('station_id', 'date'))
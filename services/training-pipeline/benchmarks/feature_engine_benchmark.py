@@ -0,0 +1,84 @@
+"""
+Benchmark of the time series feature engine on a wide feature set.
+
+Computes lags, rolling statistics over several windows and exponentially weighted
+statistics of every weather column, per station, on multi-year synthetic data:
+once feature by feature (an eager `with_columns` per feature) and once as the
+single lazy pass of `TimeSeriesFeaturesGenerator`.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.feature_engine_benchmark
+"""
+
+import os
+import time
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+from config.config import TimeSeriesFeatureSpec  # noqa: E402
+from loguru import logger  # noqa: E402
+from utils.time_series_features import TimeSeriesFeaturesGenerator  # noqa: E402
+
+from benchmarks.synthetic_data import generate_feature_view_data  # noqa: E402
+
+N_STATIONS = 100
+N_DAYS = 10 * 365
+SPECS = [
+    TimeSeriesFeatureSpec(
+        columns=[
+            'tavg',
+            'tmin',
+            'tmax',
+            'prcp',
+            'snow',
+            'wdir',
+            'wspd',
+            'wpgt',
+            'pres',
+            'tsun',
+        ],
+        lags=[1, 2, 3, 7, 14],
+        rolling_windows=[3, 7, 14, 30, 90],
+        rolling_stats=['mean', 'std', 'min', 'max'],
+        ewm_spans=[3, 7, 30],
+        ewm_stats=['mean', 'std'],
+    )
+]
+
+
+def main() -> None:
+    logger.remove()
+
+    data = generate_feature_view_data(N_STATIONS, N_DAYS)
+    engine = TimeSeriesFeaturesGenerator(
+        SPECS, calendar_features=['day_of_year', 'solar_declination']
+    )
+    expressions = engine.expressions()
+    print(f'{data.height} rows, {len(expressions)} features')
+
+    start = time.perf_counter()
+    eager = data.sort('station_id', 'date')
+    for expression in expressions:
+        eager = eager.with_columns(expression)
+    eager = eager.sort('date', 'station_id')
+    eager_seconds = time.perf_counter() - start
+    print(f'{"feature by feature":<20} {eager_seconds:6.2f} s')
+
+    start = time.perf_counter()
+    lazy = engine.create_time_features(data)
+    lazy_seconds = time.perf_counter() - start
+    print(
+        f'{"one lazy pass":<20} {lazy_seconds:6.2f} s  '
+        f'({eager_seconds / lazy_seconds:.1f}x, '
+        f'{data.height / lazy_seconds / 1e6:.2f} M rows/s, '
+        f'{lazy.estimated_size("mb"):.0f} MB)'
+    )
+
+    assert lazy.equals(eager.select(lazy.columns)), 'Both paths must agree'
+
+
+if __name__ == '__main__':
+    main()
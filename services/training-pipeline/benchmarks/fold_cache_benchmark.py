@@ -0,0 +1,109 @@
+"""
+Benchmark of a single tuning trial: per-trial fold slicing vs. cached folds.
+
+The legacy objective slices the folds and fits a new `XGBRegressor` on every fold
+of every trial. The cached objective quantizes every fold once into a
+`QuantileDMatrix` and trains with `xgb.train` and early stopping. Both run the same
+fixed set of hyperparameters.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.fold_cache_benchmark
+"""
+
+import random
+import time
+
+import numpy as np
+from loguru import logger
+from models.xgboost_model import (
+    _build_folds,
+    _objective,
+    to_feature_matrix,
+    to_label_vector,
+)
+from optuna.trial import FixedTrial
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import TimeSeriesSplit
+from xgboost import XGBRegressor
+
+from benchmarks.synthetic_data import generate_training_data
+
+N_STATIONS = 10
+N_DAYS = 3 * 365
+N_TRIALS = 6
+N_SPLITS = 3
+N_JOBS = 1
+
+
+def _legacy_objective(trial, X_train, y_train, n_splits: int) -> float:
+    """The objective as it was before the fold cache, kept for comparison"""
+    params = {
+        'n_estimators': trial.suggest_int('n_estimators', 100, 1000),
+        'max_depth': trial.suggest_int('max_depth', 3, 10),
+        'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3),
+        'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
+    }
+
+    mae_scores = []
+    for train_index, val_index in TimeSeriesSplit(n_splits=n_splits).split(X_train):
+        model = XGBRegressor(**params, n_jobs=N_JOBS)
+        model.fit(X_train.iloc[train_index], y_train.iloc[train_index])
+        y_pred = model.predict(X_train.iloc[val_index])
+        mae_scores.append(mean_absolute_error(y_train.iloc[val_index], y_pred))
+
+    return np.mean(mae_scores)
+
+
+def _trial_params() -> list[dict]:
+    rng = random.Random(0)
+    return [
+        {
+            'n_estimators': rng.randint(100, 1000),
+            'max_depth': rng.randint(3, 10),
+            'learning_rate': rng.uniform(0.01, 0.3),
+            'subsample': rng.uniform(0.5, 1.0),
+            'colsample_bytree': rng.uniform(0.5, 1.0),
+        }
+        for _ in range(N_TRIALS)
+    ]
+
+
+def main() -> None:
+    logger.remove()
+
+    X, y = generate_training_data(N_STATIONS, N_DAYS)
+    trial_params = _trial_params()
+    print(f'{len(X)} rows, {N_TRIALS} trials, {N_SPLITS} folds')
+
+    start = time.perf_counter()
+    X_pandas, y_pandas = X.to_pandas(), y.to_pandas()
+    legacy_maes = [
+        _legacy_objective(FixedTrial(params), X_pandas, y_pandas, N_SPLITS)
+        for params in trial_params
+    ]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    folds = _build_folds(to_feature_matrix(X), to_label_vector(y), N_SPLITS, N_JOBS)
+    build_time = time.perf_counter() - start
+    cached_maes = [
+        _objective(FixedTrial(params), folds, N_JOBS) for params in trial_params
+    ]
+    cached_time = time.perf_counter() - start
+
+    print(
+        f'legacy  {legacy_time / N_TRIALS * 1000:8.1f} ms per trial  '
+        f'mean MAE {np.mean(legacy_maes):.2f}'
+    )
+    print(
+        f'cached  {cached_time / N_TRIALS * 1000:8.1f} ms per trial  '
+        f'mean MAE {np.mean(cached_maes):.2f}  '
+        f'(fold quantization {build_time * 1000:.1f} ms once)'
+    )
+    print(f'speedup {legacy_time / cached_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Memory benchmark of building the tuning folds from the training data.
+
+The legacy path converts the feature view output to Pandas and slices every fold
+with `.iloc`, which copies the rows of every fold before XGBoost quantizes them. The
+Arrow path converts the Polars features into one float32 matrix and slices the
+folds as row ranges (views). Every variant runs in a fresh process and the peak RSS
+is sampled around its own work.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.fold_memory_benchmark
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+
+import polars as pl
+import xgboost as xgb
+from loguru import logger
+from models.xgboost_model import _build_folds, to_feature_matrix, to_label_vector
+from pipeline_common.benchmarks.memory import PeakRssSampler
+from sklearn.model_selection import TimeSeriesSplit
+
+from benchmarks.synthetic_data import generate_training_data
+
+N_STATIONS = 200
+N_DAYS = 10 * 365
+N_SPLITS = 3
+
+
+def _legacy_folds(X: pl.DataFrame, y: pl.Series) -> list:
+    """The fold construction as it was before the Arrow path, kept for comparison"""
+    X_train, y_train = X.to_pandas(), y.to_pandas()
+    folds = []
+    for train_index, val_index in TimeSeriesSplit(n_splits=N_SPLITS).split(X_train):
+        dtrain = xgb.QuantileDMatrix(
+            X_train.iloc[train_index], y_train.iloc[train_index]
+        )
+        dval = xgb.QuantileDMatrix(
+            X_train.iloc[val_index], y_train.iloc[val_index], ref=dtrain
+        )
+        folds.append((dtrain, dval, y_train.iloc[val_index].to_numpy()))
+    return folds
+
+
+def _run_variant(variant: str, data_path: str, queue: multiprocessing.Queue) -> None:
+    logger.remove()
+    data = pl.read_ipc(data_path, memory_map=False)
+    X, y = data.drop('tsun_label'), data.get_column('tsun_label')
+
+    with PeakRssSampler() as memory:
+        start = time.perf_counter()
+        if variant == 'legacy':
+            folds = _legacy_folds(X, y)
+        else:
+            folds = _build_folds(
+                to_feature_matrix(X),
+                to_label_vector(y),
+                N_SPLITS,
+                n_jobs=os.cpu_count() or 1,
+                feature_names=X.columns,
+            )
+        elapsed = time.perf_counter() - start
+
+    queue.put((elapsed, memory.peak_increase_mb, len(folds)))
+
+
+def main() -> None:
+    logger.remove()
+
+    X, y = generate_training_data(N_STATIONS, N_DAYS)
+    data = X.with_columns(y)
+    print(f'{data.height} rows, {data.estimated_size("mb"):.1f} MB in Polars')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, 'data.arrow')
+        data.write_ipc(data_path)
+
+        context = multiprocessing.get_context('spawn')
+        for variant in ('legacy', 'arrow'):
+            queue = context.Queue()
+            process = context.Process(
+                target=_run_variant, args=(variant, data_path, queue)
+            )
+            process.start()
+            elapsed, peak_mb, n_folds = queue.get()
+            process.join()
+
+            print(
+                f'{variant:<7} {n_folds} folds in {elapsed:6.2f} s  '
+                f'peak RSS +{peak_mb:7.1f} MB'
+            )
+
+
+if __name__ == '__main__':
+    main()
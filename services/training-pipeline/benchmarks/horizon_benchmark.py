@@ -0,0 +1,85 @@
+"""
+Benchmark of training several forecast horizons at once against once per horizon.
+
+Once per horizon repeats what a pipeline run per horizon would: the time series
+features, the feature matrix and the training matrix are built again for every
+horizon. The multi-horizon model builds them once and only swaps the labels.
+
+Tuning is left out: its trials sample other hyperparameters on every run, so their
+training time would drown the difference. The tuning folds are shared the same way.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.horizon_benchmark
+"""
+
+import os
+import time
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import polars as pl  # noqa: E402
+import polars.selectors as cs  # noqa: E402
+from config.config import training_config  # noqa: E402
+from loguru import logger  # noqa: E402
+from models.xgboost_model import MultiHorizonXGBoostModel, XGBoostModel  # noqa: E402
+from utils.time_series_features import TimeSeriesFeaturesGenerator  # noqa: E402
+
+from benchmarks.synthetic_data import generate_feature_view_data  # noqa: E402
+
+N_STATIONS = 30
+N_DAYS = 3 * 365
+HORIZONS = [1, 2, 3]
+LABELS = {horizon: f'tsun_label_{horizon}d' for horizon in HORIZONS}
+
+
+def _features(data: pl.DataFrame) -> tuple[pl.DataFrame, pl.DataFrame]:
+    featured = TimeSeriesFeaturesGenerator(
+        training_config.time_series_features,
+        calendar_features=training_config.calendar_features,
+    ).create_time_features(data)
+    return featured.drop('date', 'station_id', cs.starts_with('tsun_label')), featured
+
+
+def main() -> None:
+    logger.remove()
+
+    data = (
+        generate_feature_view_data(N_STATIONS, N_DAYS)
+        .drop('tsun_label')
+        .with_columns(
+            pl.col('tsun')
+            .shift(-horizon)
+            .over('station_id', order_by='date')
+            .alias(label)
+            for horizon, label in LABELS.items()
+        )
+        .drop_nulls()
+    )
+    print(f'{data.height} rows, horizons {HORIZONS}, {os.cpu_count()} cores')
+
+    start = time.perf_counter()
+    for label in LABELS.values():
+        X, featured = _features(data)
+        XGBoostModel(training_config.get_training_profile()).fit(
+            X, featured.get_column(label)
+        )
+    per_horizon_seconds = time.perf_counter() - start
+    print(f'{"once per horizon":<18} {per_horizon_seconds:6.1f} s')
+
+    start = time.perf_counter()
+    X, featured = _features(data)
+    MultiHorizonXGBoostModel(HORIZONS, training_config.get_training_profile()).fit(
+        X, featured.select(list(LABELS.values()))
+    )
+    shared_seconds = time.perf_counter() - start
+    print(
+        f'{"multi-horizon":<18} {shared_seconds:6.1f} s  '
+        f'({per_horizon_seconds / shared_seconds:.2f}x)'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark of the incremental time series features against the full recompute.
+
+The state is built from a multi-year history, then the following days arrive one
+at a time. Every day, the features of the new day are computed from the persisted
+state and from the whole history, and must be exactly equal. The values are
+rounded to whole numbers first, like the feature pipeline stores them.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.incremental_features_benchmark
+"""
+
+import os
+import tempfile
+import time
+from pathlib import Path
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import polars as pl  # noqa: E402
+from config.config import training_config  # noqa: E402
+from loguru import logger  # noqa: E402
+from utils.time_series_features import TimeSeriesFeaturesGenerator  # noqa: E402
+
+from benchmarks.synthetic_data import generate_feature_view_data  # noqa: E402
+
+N_STATIONS = 100
+N_HISTORY_DAYS = 5 * 365
+N_NEW_DAYS = 5
+
+
+def main() -> None:
+    logger.remove()
+
+    data = generate_feature_view_data(N_STATIONS, N_HISTORY_DAYS + N_NEW_DAYS)
+    data = data.with_columns(pl.col(pl.Float32).round(0))
+    dates = data.get_column('date').unique().sort()
+    history = data.filter(pl.col('date') < dates[N_HISTORY_DAYS])
+
+    engine = TimeSeriesFeaturesGenerator(
+        training_config.time_series_features,
+        calendar_features=training_config.calendar_features,
+    )
+    print(f'{history.height} history rows, {len(engine.expressions())} features')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_dir = Path(tmp_dir)
+
+        start = time.perf_counter()
+        engine.create_time_features(history, state_dir=state_dir)
+        print(f'{"state from history":<20} {time.perf_counter() - start:6.2f} s')
+
+        full_seconds, incremental_seconds = 0.0, 0.0
+        for day in dates[N_HISTORY_DAYS:]:
+            start = time.perf_counter()
+            full = engine.create_time_features(
+                data.filter(pl.col('date') <= day)
+            ).filter(pl.col('date') == day)
+            full_seconds += time.perf_counter() - start
+
+            start = time.perf_counter()
+            incremental = engine.update_time_features(
+                data.filter(pl.col('date') == day), state_dir
+            )
+            incremental_seconds += time.perf_counter() - start
+
+            assert incremental.equals(full), f'Features of {day} differ'
+
+    print(f'{"full recompute":<20} {full_seconds / N_NEW_DAYS:6.3f} s per day')
+    print(
+        f'{"incremental":<20} {incremental_seconds / N_NEW_DAYS:6.3f} s per day  '
+        f'({full_seconds / incremental_seconds:.0f}x, exact match on {N_NEW_DAYS} days)'
+    )
+
+
+if __name__ == '__main__':
+    main()
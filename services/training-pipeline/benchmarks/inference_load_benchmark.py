@@ -0,0 +1,122 @@
+"""
+Load test of the inference entry point on CPU.
+
+Trains a model on synthetic data, then measures the batch scoring throughput and
+the latency of the local HTTP server under concurrent single-row requests, with
+and without micro-batching. Latencies are measured per request by the clients.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.inference_load_benchmark
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import numpy as np  # noqa: E402
+from inference import Predictor, create_server  # noqa: E402
+from loguru import logger  # noqa: E402
+from models.xgboost_model import XGBoostModel  # noqa: E402
+
+from benchmarks.synthetic_data import generate_training_data  # noqa: E402
+
+N_ESTIMATORS = 300
+N_BATCH_ROWS = 100_000
+N_CLIENTS = 16
+N_REQUESTS_PER_CLIENT = 100
+
+
+def _client(url: str, bodies: list[bytes], latencies: list[float]) -> None:
+    for body in bodies:
+        request = urllib.request.Request(
+            url, data=body, headers={'Content-Type': 'application/json'}
+        )
+        start = time.perf_counter()
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+def _load_test(predictor: Predictor, rows: list[dict], max_batch_size: int) -> None:
+    server = create_server(
+        predictor, '127.0.0.1', 0, max_batch_size=max_batch_size, max_wait_ms=2.0
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}/predict'
+
+    latencies: list[list[float]] = [[] for _ in range(N_CLIENTS)]
+    clients = [
+        threading.Thread(
+            target=_client,
+            args=(
+                url,
+                [
+                    json.dumps(
+                        {'instances': [rows[(i * 7919 + j) % len(rows)]]}
+                    ).encode()
+                    for j in range(N_REQUESTS_PER_CLIENT)
+                ],
+                latencies[i],
+            ),
+        )
+        for i in range(N_CLIENTS)
+    ]
+
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    all_latencies = np.array([latency for client in latencies for latency in client])
+    p50, p99 = np.percentile(all_latencies, [50, 99]) * 1000
+    print(
+        f'{"no batching" if max_batch_size == 1 else f"batches of {max_batch_size}":<16} p50 {p50:6.2f} ms  '
+        f'p99 {p99:6.2f} ms  {len(all_latencies) / elapsed:7.0f} requests/s'
+    )
+
+
+def main() -> None:
+    logger.remove()
+
+    X, y = generate_training_data(20, 2 * 365)
+    model = XGBoostModel(profile={'n_estimators': N_ESTIMATORS, 'max_depth': 6})
+    model.fit(X, y)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = Path(tmp_dir) / 'xgboost.json'
+        model.save(str(model_path))
+        predictor = Predictor({1: model_path})
+
+    print(
+        f'{N_ESTIMATORS} trees, {len(predictor.feature_names)} features, {os.cpu_count()} cores'
+    )
+
+    batch_X, _ = generate_training_data(N_BATCH_ROWS // 365 + 1, 365, seed=7)
+    start = time.perf_counter()
+    predictor.predict(batch_X)
+    elapsed = time.perf_counter() - start
+    print(
+        f'{"batch":<16} {batch_X.height} rows in {elapsed:.2f} s  '
+        f'{batch_X.height / elapsed:9.0f} rows/s'
+    )
+
+    rows = X.head(1000).to_dicts()
+    for max_batch_size in (1, 64):
+        _load_test(predictor, rows, max_batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark of the training profiles: fit time and MAE of every preset.
+
+Every profile fits the same number of trees on the first 80% of a synthetic
+training set (in time order) and is evaluated on the last 20%, so the fastest
+profile that is accurate enough can be picked.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.profile_benchmark
+"""
+
+import os
+import time
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+from config.config import training_config  # noqa: E402
+from loguru import logger  # noqa: E402
+from models.xgboost_model import XGBoostModel  # noqa: E402
+from sklearn.metrics import mean_absolute_error  # noqa: E402
+
+from benchmarks.synthetic_data import generate_training_data  # noqa: E402
+
+N_STATIONS = 20
+N_DAYS = 3 * 365
+N_ESTIMATORS = 300
+
+
+def main() -> None:
+    logger.remove()
+
+    X, y = generate_training_data(N_STATIONS, N_DAYS)
+    split = int(len(X) * 0.8)
+    print(f'{split} training rows, {len(X) - split} evaluation rows')
+
+    for name, profile in training_config.training_profiles.items():
+        model = XGBoostModel(
+            profile={**profile.model_dump(), 'n_estimators': N_ESTIMATORS}
+        )
+
+        start = time.perf_counter()
+        model.fit(X[:split], y[:split])
+        elapsed = time.perf_counter() - start
+
+        mae = mean_absolute_error(y[split:], model.predict(X[split:]))
+        print(
+            f'{name:<10} {profile.tree_method:<6} max_bin={profile.max_bin:<5} '
+            f'n_jobs={profile.n_jobs:<3} fit {elapsed:6.2f} s  MAE {mae:7.2f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
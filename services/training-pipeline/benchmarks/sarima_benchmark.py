@@ -0,0 +1,140 @@
+"""
+Benchmark of the SARIMA models against XGBoostModel as the number of stations grows.
+
+For every station count, the SARIMA models are fitted in one process per core
+(the pool start-up included), a week of new days is filtered through the fitted
+state, and every station is forecasted. XGBoostModel is fitted untuned on the
+time series features of the same data and predicts the latest day of every
+station. All times are per station.
+
+Once, the SARIMA fit of one station is also compared against statsmodels doing
+the differencing itself, in the state space.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.sarima_benchmark
+"""
+
+import os
+import time
+import warnings
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import polars as pl  # noqa: E402
+import polars.selectors as cs  # noqa: E402
+from config.config import training_config  # noqa: E402
+from loguru import logger  # noqa: E402
+from models.sarima_model import SarimaModel  # noqa: E402
+from models.xgboost_model import XGBoostModel  # noqa: E402
+from statsmodels.tsa.statespace.sarimax import SARIMAX  # noqa: E402
+from utils.time_series_features import TimeSeriesFeaturesGenerator  # noqa: E402
+
+from benchmarks.synthetic_data import generate_feature_view_data  # noqa: E402
+
+STATION_COUNTS = [1, 4, 16, 64]
+N_DAYS = 365
+N_NEW_DAYS = 7
+HORIZONS = [1, 2, 3]
+
+
+def _sarima_model() -> SarimaModel:
+    return SarimaModel(
+        'tsun',
+        order=training_config.sarima_order,
+        seasonal_order=training_config.sarima_seasonal_order,
+        n_workers=os.cpu_count() or 1,
+    )
+
+
+def _compare_differencing(data: pl.DataFrame) -> None:
+    values = data.filter(pl.col('station_id') == 0).get_column('tsun').to_numpy()
+
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        SARIMAX(
+            values.astype('float64'),
+            order=training_config.sarima_order,
+            seasonal_order=training_config.sarima_seasonal_order,
+        ).fit(disp=False)
+    state_space_seconds = time.perf_counter() - start
+
+    model = _sarima_model()
+    model.n_workers = 1
+    start = time.perf_counter()
+    model.fit(data.filter(pl.col('station_id') == 0))
+    cached_seconds = time.perf_counter() - start
+
+    print(
+        f'One station: differencing in the state space {state_space_seconds:.2f} s, '
+        f'up front {cached_seconds:.2f} s ({state_space_seconds / cached_seconds:.1f}x)'
+    )
+
+
+def main() -> None:
+    logger.remove()
+    print(
+        f'SARIMA{training_config.sarima_order}x{training_config.sarima_seasonal_order}, '
+        f'{N_DAYS} days, {os.cpu_count()} cores, milliseconds per station'
+    )
+
+    data = generate_feature_view_data(max(STATION_COUNTS), N_DAYS + N_NEW_DAYS)
+    dates = data.get_column('date').unique().sort()
+    _compare_differencing(data.filter(pl.col('date') < dates[N_DAYS]))
+
+    print(
+        f'{"stations":>8} {"sarima fit":>11} {"re-filter":>10} {"forecast":>9} '
+        f'{"xgb fit":>8} {"xgb predict":>12}'
+    )
+    for n_stations in STATION_COUNTS:
+        stations = data.filter(pl.col('station_id') < n_stations)
+        history = stations.filter(pl.col('date') < dates[N_DAYS])
+
+        model = _sarima_model()
+        start = time.perf_counter()
+        model.fit(history)
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model.update(stations)
+        refilter_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model.predict(HORIZONS)
+        forecast_seconds = time.perf_counter() - start
+
+        featured = TimeSeriesFeaturesGenerator(
+            training_config.time_series_features,
+            calendar_features=training_config.calendar_features,
+        ).create_time_features(stations)
+        X = featured.drop('date', 'station_id', cs.starts_with('tsun_label'))
+        xgboost_model = XGBoostModel(training_config.get_training_profile())
+        start = time.perf_counter()
+        xgboost_model.fit(X, featured.get_column('tsun_label'))
+        xgboost_fit_seconds = time.perf_counter() - start
+
+        latest = X.tail(n_stations)
+        start = time.perf_counter()
+        xgboost_model.predict(latest)
+        xgboost_predict_seconds = time.perf_counter() - start
+
+        print(
+            f'{n_stations:>8} '
+            + ' '.join(
+                f'{1000 * seconds / n_stations:>{width}.1f}'
+                for seconds, width in [
+                    (fit_seconds, 11),
+                    (refilter_seconds, 10),
+                    (forecast_seconds, 9),
+                    (xgboost_fit_seconds, 8),
+                    (xgboost_predict_seconds, 12),
+                ]
+            )
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark suite of the training stages at several data sizes.
+
+On N stations x M years of synthetic feature view data, the suite times the time
+series feature generation, an untuned `XGBoostModel.fit` on the features, and a
+short seeded hyperparameter search with a tree budget. Every stage and size runs in
+a fresh process, the time is the best of a few runs and the memory the peak RSS
+above the state before them.
+
+The results are compared with the baseline of this machine, throughput drops and
+memory growth beyond the tolerance are flagged and fail the run. The first run, or
+one with --update-baseline, records the baseline.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.suite [--update-baseline]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Dummy credentials, the benchmark never talks to Hopsworks
+os.environ.setdefault('API_KEY', 'benchmark')
+os.environ.setdefault('PROJECT_NAME', 'benchmark')
+
+import optuna  # noqa: E402
+import polars as pl  # noqa: E402
+import polars.selectors as cs  # noqa: E402
+from config.config import training_config  # noqa: E402
+from loguru import logger  # noqa: E402
+from models.xgboost_model import (  # noqa: E402
+    XGBoostModel,
+    to_feature_matrix,
+    to_label_vector,
+)
+from pipeline_common.benchmarks.baseline import (  # noqa: E402
+    DEFAULT_TOLERANCE,
+    BenchmarkResult,
+    report,
+    run_isolated,
+    time_best_of,
+)
+from pipeline_common.benchmarks.memory import PeakRssSampler  # noqa: E402
+from utils.time_series_features import TimeSeriesFeaturesGenerator  # noqa: E402
+
+from benchmarks.synthetic_data import generate_feature_view_data  # noqa: E402
+
+# Stage, stations and years, the search is only run on the smaller sizes
+CASES = [
+    ('features', 4, 1),
+    ('features', 16, 2),
+    ('features', 64, 5),
+    ('fit', 4, 1),
+    ('fit', 16, 2),
+    ('fit', 64, 5),
+    ('tune', 4, 1),
+    ('tune', 16, 2),
+]
+REPEATS = 3
+N_TRIALS = 4
+N_SPLITS = 3
+MAX_N_ESTIMATORS = 200
+DEFAULT_BASELINE_PATH = (
+    Path(__file__).parent.parent / 'data' / 'benchmarks' / 'baseline.json'
+)
+
+
+def _create_features(data: pl.DataFrame) -> pl.DataFrame:
+    return TimeSeriesFeaturesGenerator(
+        training_config.time_series_features,
+        calendar_features=training_config.calendar_features,
+    ).create_time_features(data)
+
+
+def _run_case(stage: str, n_stations: int, n_years: int) -> BenchmarkResult:
+    logger.remove()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    data = generate_feature_view_data(n_stations, n_years * 365)
+    if stage == 'features':
+        repeats = REPEATS
+
+        def run():
+            _create_features(data)
+
+    else:
+        featured = _create_features(data)
+        X = featured.drop('date', 'station_id', cs.starts_with('tsun_label'))
+        y = featured.get_column('tsun_label')
+        if stage == 'fit':
+            repeats = REPEATS
+
+            def run():
+                XGBoostModel(training_config.get_training_profile()).fit(X, y)
+
+        else:
+            # A search takes long enough to not be noisy, and is seeded
+            repeats = 1
+            X_train, y_train = to_feature_matrix(X), to_label_vector(y)
+
+            def run():
+                XGBoostModel()._find_best_hyperparams(
+                    X_train,
+                    y_train,
+                    N_TRIALS,
+                    N_SPLITS,
+                    seed=0,
+                    max_n_estimators=MAX_N_ESTIMATORS,
+                )
+
+    with PeakRssSampler() as memory:
+        seconds = time_best_of(run, repeats)
+
+    return BenchmarkResult(
+        stage, f'{n_stations}x{n_years}', data.height, seconds, memory.peak_increase_mb
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the training stages')
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        default=DEFAULT_BASELINE_PATH,
+        help='The baseline to compare with',
+    )
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='Replace the baseline with the results of this run',
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help='The relative change of throughput or memory that is a regression',
+    )
+    args = parser.parse_args()
+
+    results = [run_isolated(_run_case, *case) for case in CASES]
+    sys.exit(report(results, args.baseline, args.update_baseline, args.tolerance))
+
+
+if __name__ == '__main__':
+    main()
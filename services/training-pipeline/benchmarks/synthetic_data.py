@@ -0,0 +1,68 @@
+import numpy as np
+import polars as pl
+
+
+def generate_feature_view_data(
+    n_stations: int, n_days: int, seed: int = 42
+) -> pl.DataFrame:
+    """
+    Generate a deterministic dataset in the shape of the basic feature view.
+
+    Every station gets `n_days` daily rows of weather features with a yearly
+    seasonality, and the label is the next day's sunshine total in minutes.
+
+    Args:
+        n_stations (int): The number of stations
+        n_days (int): The number of days per station
+        seed (int): The seed of the random generator
+
+    Returns:
+        pl.DataFrame: The station, the date, the features and the label, ordered by
+            date and station like the feature view
+    """
+    rng = np.random.default_rng(seed)
+    day_index = np.tile(np.arange(n_days), n_stations)
+    season = np.sin(2 * np.pi * (day_index % 365 - 80) / 365.25)
+    n_rows = n_stations * n_days
+
+    tsun = np.clip(300 + 250 * season + rng.normal(0, 120, n_rows), 0, 960)
+    data = pl.DataFrame(
+        {
+            'station_id': np.repeat(np.arange(n_stations), n_days),
+            'date': np.datetime64('2000-01-01') + day_index.astype('timedelta64[D]'),
+            'tavg': 10 + 9 * season + rng.normal(0, 2.5, n_rows),
+            'tmin': 5 + 8 * season + rng.normal(0, 2.5, n_rows),
+            'tmax': 15 + 10 * season + rng.normal(0, 2.5, n_rows),
+            'prcp': rng.exponential(2.0, n_rows),
+            'snow': np.zeros(n_rows),
+            'wdir': rng.uniform(0, 360, n_rows),
+            'wspd': rng.gamma(2.0, 6.0, n_rows),
+            'wpgt': rng.gamma(2.0, 12.0, n_rows),
+            'pres': 1015 + rng.normal(0, 8, n_rows),
+            'tsun': tsun,
+            'tsun_label': np.roll(tsun, -1) + rng.normal(0, 60, n_rows),
+        }
+    ).with_columns(pl.col('date').cast(pl.Date), pl.col(pl.Float64).cast(pl.Float32))
+
+    # Interleave the stations day by day, so the time-based splits cut across dates
+    order = np.argsort(day_index, kind='stable')
+    return data[order]
+
+
+def generate_training_data(
+    n_stations: int, n_days: int, seed: int = 42
+) -> tuple[pl.DataFrame, pl.Series]:
+    """
+    Generate a deterministic training set from `generate_feature_view_data`.
+
+    Args:
+        n_stations (int): The number of stations
+        n_days (int): The number of days per station
+        seed (int): The seed of the random generator
+
+    Returns:
+        tuple[pl.DataFrame, pl.Series]: X (numeric features) and y (label), ordered
+            by date and station like the feature view
+    """
+    data = generate_feature_view_data(n_stations, n_days, seed)
+    return data.drop('station_id', 'date', 'tsun_label'), data.get_column('tsun_label')
@@ -0,0 +1,64 @@
+"""
+Benchmark of the hyperparameter search: sequential vs. pruned vs. parallel trials,
+and a fixed tree budget with early stopping instead of searching `n_estimators`.
+
+Every variant runs the same number of trials, with the same sampler seed, on the
+same synthetic training set.
+The parallel variant runs the trials in one process per core; with a single core it
+can not be faster than the pruned variant.
+
+Run from the service directory:
+
+    uv run python -m benchmarks.tuning_benchmark
+"""
+
+import os
+import time
+
+import optuna
+from loguru import logger
+from models.xgboost_model import XGBoostModel, to_feature_matrix, to_label_vector
+
+from benchmarks.synthetic_data import generate_training_data
+
+N_STATIONS = 10
+N_DAYS = 2 * 365
+N_TRIALS = 12
+N_SPLITS = 3
+MAX_N_ESTIMATORS = 2000
+
+
+def main() -> None:
+    logger.remove()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    X, y = generate_training_data(N_STATIONS, N_DAYS)
+    print(f'{len(X)} rows, {N_TRIALS} trials, {N_SPLITS} folds, {os.cpu_count()} cores')
+
+    n_workers = os.cpu_count() or 1
+    for name, workers, pruner, max_n_estimators in (
+        ('sequential', 1, 'none', None),
+        ('pruned', 1, 'median', None),
+        ('pruned + tree budget', 1, 'median', MAX_N_ESTIMATORS),
+        (f'parallel x{n_workers} + pruned', n_workers, 'median', None),
+    ):
+        start = time.perf_counter()
+        best_params = XGBoostModel()._find_best_hyperparams(
+            to_feature_matrix(X),
+            to_label_vector(y),
+            N_TRIALS,
+            N_SPLITS,
+            n_workers=workers,
+            pruner=pruner,
+            seed=0,
+            max_n_estimators=max_n_estimators,
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f'{name:<24} {elapsed:7.2f} s  {elapsed / N_TRIALS * 1000:7.1f} ms per trial  '
+            f'best n_estimators={best_params["n_estimators"]}'
+        )
+
+
+if __name__ == '__main__':
+    main()
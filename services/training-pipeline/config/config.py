@@ -1,14 +1,58 @@
+import os
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Literal, Optional
 
-from pydantic import Field, computed_field
+from pydantic import BaseModel, Field, computed_field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Get the config directory
 CONFIG_DIR = Path(__file__).parent
 
 
+class TrainingProfile(BaseModel):
+    """XGBoost settings used by both the tuned and the untuned fit"""
+
+    tree_method: Literal['hist', 'approx'] = Field(
+        default='hist', description='The tree construction algorithm'
+    )
+    n_jobs: int = Field(
+        default_factory=lambda: os.cpu_count() or 1,
+        description='The number of threads, split between parallel tuning workers',
+    )
+    max_bin: int = Field(
+        default=256, description='The number of quantile bins per feature'
+    )
+    objective: str = Field(
+        default='reg:absoluteerror', description='The training objective'
+    )
+    eval_metric: str = Field(
+        default='mae', description='The metric used for early stopping'
+    )
+
+
+class TimeSeriesFeatureSpec(BaseModel):
+    """Time series features computed per station for a group of columns"""
+
+    columns: list[str] = Field(description='The columns to compute the features of')
+    lags: list[int] = Field(
+        default=[], description='The lags, in observations of the same station'
+    )
+    rolling_windows: list[int] = Field(
+        default=[], description='The rolling window sizes, in days'
+    )
+    rolling_stats: list[Literal['mean', 'std', 'min', 'max']] = Field(
+        default=['mean'], description='The statistics computed over every window'
+    )
+    ewm_spans: list[int] = Field(
+        default=[], description='The spans of the exponentially weighted statistics'
+    )
+    ewm_stats: list[Literal['mean', 'std']] = Field(
+        default=['mean'], description='The exponentially weighted statistics'
+    )
+
+
 class TrainingConfig(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=str(CONFIG_DIR / 'training_settings.env'),
@@ -29,8 +73,30 @@ class TrainingConfig(BaseSettings):
         description='Whether to add time based features',
     )
 
+    time_series_features: list[TimeSeriesFeatureSpec] = Field(
+        default=[
+            TimeSeriesFeatureSpec(
+                columns=['tavg', 'tmin', 'tmax', 'prcp', 'wspd', 'pres', 'tsun'],
+                lags=[1, 2, 7],
+                rolling_windows=[7, 30],
+                rolling_stats=['mean', 'std', 'min', 'max'],
+                ewm_spans=[7],
+                ewm_stats=['mean'],
+            ),
+        ],
+        description='The time series features per group of columns',
+    )
+    calendar_features: list[Literal['day_of_year', 'solar_declination']] = Field(
+        default=['day_of_year', 'solar_declination'],
+        description='The cyclical calendar encodings of the date',
+    )
+
     # Label
     label: str = Field(description='Label feature')
+    label_horizons: list[int] = Field(
+        default=[1],
+        description='The forecast horizons in days, one label column and model each',
+    )
 
     # Hyperparameter tuning
     hyperparameter_tuning: bool = Field(
@@ -46,6 +112,64 @@ class TrainingConfig(BaseSettings):
         default=3,
         description='The number of splits to perform for hyperparameter tuning',
     )
+    hyperparameter_tuning_n_workers: int = Field(
+        default=1,
+        description='The number of processes to run hyperparameter tuning trials in',
+    )
+    hyperparameter_tuning_pruner: Literal['median', 'hyperband', 'none'] = Field(
+        default='median',
+        description='The pruner that stops unpromising trials after a fold',
+    )
+    hyperparameter_tuning_n_estimators_mode: Literal['search', 'early_stopping'] = (
+        Field(
+            default='search',
+            description='Search n_estimators, or use early stopping within a tree budget',
+        )
+    )
+    hyperparameter_tuning_max_n_estimators: int = Field(
+        default=2000,
+        description='The tree budget of every trial in the early stopping mode',
+    )
+
+    # Training profiles: named XGBoost presets, pick one with `training_profile`
+    training_profiles: dict[str, TrainingProfile] = Field(
+        default={
+            'fast': TrainingProfile(max_bin=64),
+            'balanced': TrainingProfile(max_bin=256),
+            'accurate': TrainingProfile(max_bin=1024),
+        },
+        description='The training profiles by name',
+    )
+    training_profile: str = Field(
+        default='balanced',
+        description='The name of the training profile to use',
+    )
+
+    # Incremental training
+    model_dir: str = Field(
+        default='data/models',
+        description='The directory models are saved to, relative to the service directory',
+    )
+    incremental_training: bool = Field(
+        default=False,
+        description='Whether to update the previous model with new data only',
+    )
+    incremental_update_mode: Literal['continue', 'refresh'] = Field(
+        default='continue',
+        description='Add trees fitted on the new data, or refresh the leaf values',
+    )
+    incremental_n_estimators: int = Field(
+        default=10,
+        description='The number of trees added per update in the continue mode',
+    )
+    full_fit_every_days: int = Field(
+        default=30,
+        description='The number of days after which a full fit is done instead',
+    )
+    drift_tolerance: float = Field(
+        default=0.25,
+        description='How much worse than the recent MAEs the MAE on new data may be',
+    )
 
     # Model registry
     model_status: Literal['Development', 'Staging', 'Production'] = Field(
@@ -58,6 +182,92 @@ class TrainingConfig(BaseSettings):
         description='The name of the model'
     )
 
+    # SARIMA
+    sarima_column: str = Field(
+        default='tsun',
+        description='The column whose daily series is forecasted, the label is its value days later',
+    )
+    sarima_order: tuple[int, int, int] = Field(
+        default=(1, 0, 1), description='The (p, d, q) order of the SARIMA models'
+    )
+    sarima_seasonal_order: tuple[int, int, int, int] = Field(
+        default=(1, 1, 1, 7),
+        description='The (P, D, Q, s) seasonal order of the SARIMA models',
+    )
+    sarima_n_workers: int = Field(
+        default=1, description='The number of processes to fit the stations in'
+    )
+
+    # Feature store backend
+    feature_store_backend: Literal['hopsworks', 'local'] = Field(
+        default='hopsworks',
+        description='Read from Hopsworks, or from the local Parquet feature store',
+    )
+    local_feature_store_dir: str = Field(
+        default='../feature-pipeline/etl/data/feature_store',
+        description='The local feature store directory, relative to the service directory',
+    )
+
+    # Local training data cache
+    training_data_cache: bool = Field(
+        default=True,
+        description='Whether to cache the training data locally',
+    )
+    training_data_cache_dir: str = Field(
+        default='data/training_data_cache',
+        description='The training data cache directory, relative to the service directory',
+    )
+    training_data_cache_max_size_mb: float = Field(
+        default=2048,
+        description='The size the training data cache is evicted down to',
+    )
+    training_data_cache_max_age_hours: float = Field(
+        default=24,
+        description='How long cached training data is used without commit information',
+    )
+
+    # Stage cache
+    stage_cache: bool = Field(
+        default=True,
+        description='Whether to skip the stages whose inputs, settings and code did not change',
+    )
+    stage_cache_dir: str = Field(
+        default='data/stage_cache',
+        description='The stage cache directory, relative to the service directory',
+    )
+    stage_cache_keep: int = Field(
+        default=3, description='The number of outputs kept per stage'
+    )
+
+    # Run report
+    metrics_dir: str = Field(
+        default='data/metrics',
+        description='The directory of the run reports and the Prometheus textfile, relative to the service directory',
+    )
+    profile_stages: bool = Field(
+        default=False,
+        description='Whether to write a cProfile dump per stage into the profiles directory of the metrics directory',
+    )
+
+    @model_validator(mode='after')
+    def check_training_profile(self) -> 'TrainingConfig':
+        if self.training_profile not in self.training_profiles:
+            raise ValueError(
+                f'Unknown training profile {self.training_profile}, options: {list(self.training_profiles)}'
+            )
+        return self
+
+    def get_label_columns(self) -> dict[int, str]:
+        """Get the label column of every horizon, the next day keeps the plain name"""
+        return {
+            horizon: self.label if horizon == 1 else f'{self.label}_{horizon}d'
+            for horizon in self.label_horizons
+        }
+
+    def get_training_profile(self) -> dict:
+        """Get the XGBRegressor settings of the selected training profile"""
+        return self.training_profiles[self.training_profile].model_dump()
+
     # Add computed fields instead of hard coding values in the settings file
     @computed_field
     def start_date(self) -> str:
@@ -68,7 +278,33 @@ class TrainingConfig(BaseSettings):
         return datetime.now().strftime('%Y-%m-%d')
 
 
-training_config = TrainingConfig()
+class InferenceConfig(BaseSettings):
+    model_config = SettingsConfigDict(
+        env_file=str(CONFIG_DIR / 'inference_settings.env'),
+        env_file_encoding='utf-8',
+    )
+
+    # Batch scoring
+    lookback_days: int = Field(
+        default=90,
+        description='The days of history read to compute the time series features',
+    )
+    predictions_dir: str = Field(
+        default='data/predictions',
+        description='The directory predictions are written to, relative to the service directory',
+    )
+
+    # Local HTTP server
+    host: str = Field(default='127.0.0.1', description='The host the server binds to')
+    port: int = Field(default=8080, description='The port the server listens on')
+    max_batch_size: int = Field(
+        default=64,
+        description='The most rows of concurrent requests predicted together',
+    )
+    max_batch_wait_ms: float = Field(
+        default=2.0,
+        description='How long the first request of a batch waits for more requests',
+    )
 
 
 class HopsworksCredentialsConfig(BaseSettings):
@@ -81,4 +317,20 @@ class HopsworksCredentialsConfig(BaseSettings):
     project_name: str
 
 
-hopsworksCredentialsConfig = HopsworksCredentialsConfig()
+# The settings are created on first access, not on import, so a run only reads the
+# .env files (and needs the variables) of the settings its stages use
+_SETTINGS = {
+    'training_config': TrainingConfig,
+    'inference_config': InferenceConfig,
+    'hopsworksCredentialsConfig': HopsworksCredentialsConfig,
+}
+_settings_lock = threading.Lock()
+
+
+def __getattr__(name: str) -> BaseSettings:
+    if name not in _SETTINGS:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    with _settings_lock:
+        if name not in globals():
+            globals()[name] = _SETTINGS[name]()
+        return globals()[name]
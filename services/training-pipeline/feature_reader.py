@@ -1,9 +1,14 @@
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, Union
 
-import hopsworks
-import pandas as pd
-from hsfs.feature_view import FeatureView
+import polars as pl
+from feature_store_connection import get_connection
 from loguru import logger
+from pipeline_common import instrumentation
+from pipeline_common.feature_store_connection import FeatureStoreConnection
+from training_data_cache import TrainingDataCache, TrainingDataKey
+
+if TYPE_CHECKING:
+    from hsfs.feature_view import FeatureView
 
 
 class BasicFeatureViewManager:
@@ -13,9 +18,11 @@ class BasicFeatureViewManager:
         project_name: str,
         feature_view_name: str,
         feature_view_version: int,
-        label: str,
+        label: Union[str, list[str]],
         start_datetime: Optional[str] = None,
         end_datetime: Optional[str] = None,
+        connection: Optional[FeatureStoreConnection] = None,
+        cache: Optional[TrainingDataCache] = None,
     ):
         """
         Initialize the basic feature view manager
@@ -25,22 +32,26 @@ class BasicFeatureViewManager:
             project_name (str): Name of the Hopsworks project
             feature_view_name (str): Name of the basic feature view
             feature_view_version (int): Version of the feature view
-            label (str): Name of the label column
+            label (Union[str, list[str]]): Name of the label column, or of the label
+                columns of every horizon
             start_datetime (Optional[str]): Start date for training data
             end_datetime (Optional[str]): End date for training data
+            connection (Optional[FeatureStoreConnection]): The feature store
+                connection to use, the shared one of the project when None
+            cache (Optional[TrainingDataCache]): The local training data cache, the
+                training data is always read from the feature view when None
         """
         self._feature_view_name = feature_view_name
         self._feature_view_version = feature_view_version
-        self._label = label
+        self._labels = [label] if isinstance(label, str) else list(label)
         self.start_datetime = start_datetime
         self.end_datetime = end_datetime
 
-        # Connect to Hopsworks
-        logger.info(f'Logging in to Hopsworks project {project_name}')
-        project = hopsworks.login(project=project_name, api_key_value=api_key)
-        self._feature_store = project.get_feature_store()
+        # Share the (lazily created) connection instead of logging in again
+        self._connection = connection or get_connection(project_name, api_key)
+        self._cache = cache
 
-    def _get_feature_view(self) -> FeatureView:
+    def _get_feature_view(self) -> 'FeatureView':
         """
         Get the basic feature view
 
@@ -51,8 +62,8 @@ class BasicFeatureViewManager:
             Exception: If feature view cannot be retrieved
         """
         try:
-            feature_view = self._feature_store.get_feature_view(
-                name=self._feature_view_name, version=self._feature_view_version
+            feature_view = self._connection.get_feature_view(
+                self._feature_view_name, self._feature_view_version
             )
             logger.info(f'Retrieved feature view {self._feature_view_name}')
             return feature_view
@@ -63,12 +74,36 @@ class BasicFeatureViewManager:
             )
             raise
 
-    def get_training_data(self) -> pd.DataFrame:
+    def _get_latest_commit(self, feature_view: 'FeatureView') -> Optional[str]:
+        """
+        Get the latest commit of the feature groups behind the feature view
+
+        Returns:
+            Optional[str]: The latest commits, None if the feature groups have none
+        """
+        try:
+            commits = []
+            for feature_group in feature_view.query.featuregroups:
+                commit_ids = feature_group.commit_details(limit=1).keys()
+                commits.append(
+                    f'{feature_group.name}_{feature_group.version}:{max(commit_ids, default=None)}'
+                )
+            return ','.join(sorted(commits))
+
+        except Exception as e:
+            logger.warning(f'Could not get the latest feature group commit: {str(e)}')
+            return None
+
+    def get_training_data(self) -> tuple[pl.DataFrame, pl.DataFrame]:
         """
         Get training data from the feature view
 
+        With a cache, the training data is only read from the feature view if it is
+        not cached yet or the feature group has new commits since. The data stays in
+        Polars (Arrow memory) from the feature view to the model.
+
         Returns:
-            Tuple[pd.DataFrame, pd.DataFrame]: X (features) and y (labels)
+            tuple[pl.DataFrame, pl.DataFrame]: X (features) and y (labels)
 
         Raises:
             Exception: If training data cannot be retrieved
@@ -76,14 +111,73 @@ class BasicFeatureViewManager:
         try:
             feature_view = self._get_feature_view()
 
-            training_data, _ = feature_view.training_data(
-                start_time=self.start_datetime,
-                end_time=self.end_datetime,
-                label=self._label,
+            key = TrainingDataKey(
+                feature_view_name=self._feature_view_name,
+                feature_view_version=self._feature_view_version,
+                start_datetime=self.start_datetime,
+                end_datetime=self.end_datetime,
+                label=','.join(self._labels),
+            )
+            latest_commit = (
+                self._get_latest_commit(feature_view) if self._cache else None
             )
+            training_data = self._cache.get(key, latest_commit) if self._cache else None
 
-            return training_data
+            if training_data is None:
+                with instrumentation.measure(
+                    'training_data', feature_view=self._feature_view_name
+                ) as call:
+                    X, y = feature_view.training_data(
+                        start_time=self.start_datetime,
+                        end_time=self.end_datetime,
+                        label=self._labels,
+                        primary_key=True,
+                        event_time=True,
+                        dataframe_type='polars',
+                    )
+                    # Without labels on the feature view, the labels are among the features
+                    training_data = (
+                        X if y is None else pl.concat([X, y], how='horizontal')
+                    )
+                    call.rows_out = training_data.height
+                    call.bytes_transferred = training_data.estimated_size()
+                if self._cache:
+                    self._cache.put(key, training_data, latest_commit)
+
+            return training_data.drop(self._labels), training_data.select(self._labels)
 
         except Exception as e:
             logger.error(f'Error getting training data: {str(e)}')
             raise
+
+    def get_batch_data(
+        self, start_datetime: Optional[str] = None, end_datetime: Optional[str] = None
+    ) -> pl.DataFrame:
+        """
+        Get the features to score from the feature view, without the labels
+
+        Args:
+            start_datetime (Optional[str]): The first date to read
+            end_datetime (Optional[str]): The last date to read
+
+        Returns:
+            pl.DataFrame: The features, with the station and the date
+
+        Raises:
+            Exception: If the batch data cannot be retrieved
+        """
+        try:
+            feature_view = self._get_feature_view()
+            batch_data = feature_view.get_batch_data(
+                start_time=start_datetime,
+                end_time=end_datetime,
+                primary_key=True,
+                event_time=True,
+                dataframe_type='polars',
+            )
+            # Without labels on the feature view, the labels are among the features
+            return batch_data.drop(self._labels, strict=False)
+
+        except Exception as e:
+            logger.error(f'Error getting batch data: {str(e)}')
+            raise
@@ -0,0 +1,25 @@
+from pathlib import Path
+
+from config import config
+from pipeline_common import feature_store_connection
+from pipeline_common.feature_store_connection import FeatureStoreConnection
+
+
+def get_connection(project_name: str, api_key: str) -> FeatureStoreConnection:
+    """
+    Get the shared connection of a project, on the backend of the training settings.
+
+    Args:
+        project_name (str): The name of the Hopsworks project
+        api_key (str): The API key for the Hopsworks project
+
+    Returns:
+        FeatureStoreConnection: The connection shared by all callers in this process
+    """
+    return feature_store_connection.get_connection(
+        project_name,
+        api_key,
+        backend=config.training_config.feature_store_backend,
+        local_store_dir=Path(__file__).parent
+        / config.training_config.local_feature_store_dir,
+    )
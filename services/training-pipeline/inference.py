@@ -0,0 +1,341 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import polars as pl
+import xgboost as xgb
+from config import config
+from feature_reader import BasicFeatureViewManager
+from loguru import logger
+from models.xgboost_model import MultiHorizonXGBoostModel, to_feature_matrix
+from utils.time_series_features import TimeSeriesFeaturesGenerator
+
+
+class Predictor:
+    """
+    The trained boosters, one per forecast horizon, loaded once.
+
+    All boosters are trained on the same features, so a batch of rows is converted
+    into one DMatrix and every booster predicts on it.
+    """
+
+    def __init__(self, model_paths: dict[int, Path], n_jobs: Optional[int] = None):
+        """
+        Load the boosters
+
+        Args:
+            model_paths (dict[int, Path]): The saved model of every horizon, in days
+            n_jobs (Optional[int]): The number of threads per prediction, all cores
+                when None
+        """
+        self.boosters = {
+            horizon: xgb.Booster(model_file=str(model_path))
+            for horizon, model_path in sorted(model_paths.items())
+        }
+        self.n_jobs = n_jobs
+        self.feature_names = next(iter(self.boosters.values())).feature_names
+        for horizon, booster in self.boosters.items():
+            if booster.feature_names != self.feature_names:
+                raise ValueError(
+                    f'The booster of horizon {horizon} was trained on other features'
+                )
+        logger.info(
+            f'Loaded boosters for horizons {list(self.boosters)} on {len(self.feature_names)} features'
+        )
+
+    def predict_matrix(self, features: np.ndarray) -> dict[int, np.ndarray]:
+        """
+        Predict every horizon for a float32 matrix in the order of `feature_names`
+
+        Returns:
+            dict[int, np.ndarray]: The predictions of every horizon, one per row
+        """
+        dmatrix = xgb.DMatrix(
+            features, feature_names=self.feature_names, nthread=self.n_jobs or -1
+        )
+        return {
+            horizon: booster.predict(dmatrix)
+            for horizon, booster in self.boosters.items()
+        }
+
+    def predict(self, X: pl.DataFrame) -> dict[int, np.ndarray]:
+        """Predict every horizon for the rows of a DataFrame with the features"""
+        return self.predict_matrix(to_feature_matrix(X.select(self.feature_names)))
+
+
+class MicroBatcher:
+    """
+    Groups the rows of concurrent requests into one prediction.
+
+    A background thread takes the first waiting request and then collects more for
+    up to `max_wait_ms`, or until `max_batch_size` rows are waiting, and predicts
+    them all with one DMatrix. Under load, the per-call overhead of XGBoost is paid
+    once per batch instead of once per request.
+    """
+
+    def __init__(
+        self, predictor: Predictor, max_batch_size: int = 64, max_wait_ms: float = 2.0
+    ):
+        self._predictor = predictor
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_ms / 1000
+        self._requests: queue.Queue[tuple[np.ndarray, Future]] = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, features: np.ndarray) -> Future:
+        """
+        Queue rows for prediction
+
+        Args:
+            features (np.ndarray): The float32 rows, in the order of the features
+
+        Returns:
+            Future: Resolves to the predictions of every horizon for these rows
+        """
+        future: Future = Future()
+        self._requests.put((features, future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._requests.get()]
+            n_rows = len(batch[0][0])
+            deadline = time.perf_counter() + self._max_wait_seconds
+            while n_rows < self._max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+                n_rows += len(batch[-1][0])
+
+            try:
+                predictions = self._predictor.predict_matrix(
+                    np.concatenate([features for features, _ in batch])
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            start = 0
+            for features, future in batch:
+                end = start + len(features)
+                future.set_result(
+                    {
+                        horizon: values[start:end]
+                        for horizon, values in predictions.items()
+                    }
+                )
+                start = end
+
+
+def create_server(
+    predictor: Predictor,
+    host: str,
+    port: int,
+    max_batch_size: int = 64,
+    max_wait_ms: float = 2.0,
+) -> ThreadingHTTPServer:
+    """
+    Create the local HTTP server, without starting it
+
+    Endpoints:
+        GET /health: 200 once the boosters are loaded
+        POST /predict: {"instances": [{"<feature>": <value>, ...}, ...]} returns
+            {"predictions": [{"<horizon>": <value>, ...}, ...]}
+
+    Args:
+        predictor (Predictor): The loaded boosters
+        host (str): The host to bind to
+        port (int): The port to listen on, 0 for any free port
+        max_batch_size (int): The most rows predicted together
+        max_wait_ms (float): How long the first request of a batch waits for more
+
+    Returns:
+        ThreadingHTTPServer: The server, one thread per connection
+    """
+    batcher = MicroBatcher(predictor, max_batch_size, max_wait_ms)
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, body: dict) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self) -> None:
+            if self.path == '/health':
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': f'Unknown path {self.path}'})
+
+        def do_POST(self) -> None:
+            if self.path != '/predict':
+                self._send_json(404, {'error': f'Unknown path {self.path}'})
+                return
+
+            try:
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                features = np.array(
+                    [
+                        [instance[name] for name in predictor.feature_names]
+                        for instance in body['instances']
+                    ],
+                    dtype=np.float32,
+                ).reshape(-1, len(predictor.feature_names))
+            except (KeyError, TypeError, ValueError) as e:
+                self._send_json(400, {'error': f'Invalid request: {str(e)}'})
+                return
+
+            predictions = batcher.submit(features).result()
+            self._send_json(
+                200,
+                {
+                    'predictions': [
+                        {
+                            str(horizon): float(values[i])
+                            for horizon, values in predictions.items()
+                        }
+                        for i in range(len(features))
+                    ]
+                },
+            )
+
+        def log_message(self, format: str, *args) -> None:
+            # One log line per request would dominate the latency
+            pass
+
+    class Server(ThreadingHTTPServer):
+        # The default backlog of 5 connections drops bursts of concurrent clients
+        request_queue_size = 128
+        daemon_threads = True
+
+    return Server((host, port), Handler)
+
+
+def load_predictor() -> Predictor:
+    """Load the boosters of every horizon saved by the training pipeline"""
+    model_dir = Path(__file__).parent / config.training_config.model_dir
+    return Predictor(
+        {
+            horizon: MultiHorizonXGBoostModel.model_path(model_dir, horizon)
+            for horizon in config.training_config.label_horizons
+        },
+        n_jobs=config.training_config.get_training_profile()['n_jobs'],
+    )
+
+
+def score_batch(predictor: Optional[Predictor] = None) -> pl.DataFrame:
+    """
+    Score all stations on their latest day, for every horizon of the boosters
+
+    The features of the last `lookback_days` are read from the feature view, the time
+    series features are computed like in training, and the latest row of every
+    station is predicted in one DMatrix.
+
+    Args:
+        predictor (Optional[Predictor]): The loaded boosters, the saved model if None
+
+    Returns:
+        pl.DataFrame: One row per station and horizon with the target date
+    """
+    predictor = predictor or load_predictor()
+    end_date = datetime.now()
+    feature_view_manager = BasicFeatureViewManager(
+        api_key=config.hopsworksCredentialsConfig.api_key,
+        project_name=config.hopsworksCredentialsConfig.project_name,
+        feature_view_name=config.training_config.feature_view_basic_features_name,
+        feature_view_version=config.training_config.feature_view_basic_features_version,
+        label=list(config.training_config.get_label_columns().values()),
+    )
+    batch_data = feature_view_manager.get_batch_data(
+        start_datetime=(
+            end_date - timedelta(days=config.inference_config.lookback_days)
+        ).strftime('%Y-%m-%d'),
+        end_datetime=end_date.strftime('%Y-%m-%d'),
+    )
+    if batch_data.is_empty():
+        raise ValueError(
+            f'No features in the last {config.inference_config.lookback_days} days to score'
+        )
+
+    if config.training_config.add_time_based_features:
+        batch_data = TimeSeriesFeaturesGenerator(
+            config.training_config.time_series_features,
+            calendar_features=config.training_config.calendar_features,
+        ).create_time_features(batch_data)
+
+    latest = (
+        batch_data.with_columns(pl.col('date').cast(pl.Date))
+        .sort('station_id', 'date')
+        .group_by('station_id', maintain_order=True)
+        .last()
+    )
+    predictions = predictor.predict(latest)
+
+    return pl.concat(
+        [
+            latest.select(
+                'station_id',
+                'date',
+                pl.lit(horizon).alias('horizon'),
+                (pl.col('date') + pl.duration(days=horizon)).alias('target_date'),
+                pl.Series('prediction', values),
+            )
+            for horizon, values in predictions.items()
+        ]
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Score stations with the model')
+    parser.add_argument(
+        'mode',
+        choices=['batch', 'serve'],
+        help='Score all stations once, or serve predictions over HTTP',
+    )
+    args = parser.parse_args()
+
+    predictor = load_predictor()
+
+    if args.mode == 'batch':
+        predictions = score_batch(predictor)
+        predictions_path = (
+            Path(__file__).parent
+            / config.inference_config.predictions_dir
+            / f'predictions_{datetime.now():%Y-%m-%d}.parquet'
+        )
+        predictions_path.parent.mkdir(parents=True, exist_ok=True)
+        predictions.write_parquet(predictions_path)
+        logger.info(f'Wrote {predictions.height} predictions to {predictions_path}')
+
+    else:
+        server = create_server(
+            predictor,
+            config.inference_config.host,
+            config.inference_config.port,
+            max_batch_size=config.inference_config.max_batch_size,
+            max_wait_ms=config.inference_config.max_batch_wait_ms,
+        )
+        logger.info(
+            f'Serving predictions on http://{config.inference_config.host}:{config.inference_config.port}'
+        )
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
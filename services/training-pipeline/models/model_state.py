@@ -0,0 +1,55 @@
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+# The number of recent out-of-sample MAEs kept to detect drift
+RECENT_MAE_WINDOW = 30
+
+
+@dataclass
+class ModelState:
+    """
+    What the saved model was trained on, kept next to it to decide how to update it.
+
+    `recent_maes` holds the MAE of the model on every batch of new data, measured
+    before the model was updated with it, so they are all out-of-sample.
+    """
+
+    trained_until: str
+    last_full_fit: str
+    n_updates: int = 0
+    recent_maes: list[float] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, state_path: Path) -> Optional['ModelState']:
+        if not state_path.exists():
+            return None
+        with state_path.open('r') as f:
+            return cls(**json.load(f))
+
+    def save(self, state_path: Path) -> None:
+        state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = state_path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(asdict(self), f, indent=4)
+        os.replace(tmp_path, state_path)
+
+    def is_full_fit_due(self, today: date, full_fit_every_days: int) -> bool:
+        return (today - date.fromisoformat(self.last_full_fit)).days >= (
+            full_fit_every_days
+        )
+
+    def is_drifting(self, mae: float, drift_tolerance: float) -> bool:
+        """Whether the MAE on new data is worse than the recent ones by the tolerance"""
+        if not self.recent_maes:
+            return False
+        baseline = sum(self.recent_maes) / len(self.recent_maes)
+        return mae > baseline * (1 + drift_tolerance)
+
+    def record_update(self, trained_until: str, mae: float) -> None:
+        self.trained_until = trained_until
+        self.n_updates += 1
+        self.recent_maes = [*self.recent_maes, mae][-RECENT_MAE_WINDOW:]
@@ -0,0 +1,380 @@
+import json
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+import polars as pl
+from loguru import logger
+from statsmodels.tools.sm_exceptions import ConvergenceWarning
+from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+
+@dataclass
+class _StationState:
+    """
+    Everything needed to continue the series of one station without refitting.
+
+    `tail` holds the last raw observations the differencing looks back at, so new
+    observations are differenced, and forecasts integrated, without the history.
+    `state` and `state_cov` are the Kalman filter's prediction for the day after
+    `last_date`, so new observations are filtered from there with fixed `params`.
+    """
+
+    last_date: str
+    params: list[float]
+    tail: list[float]
+    state: list[float]
+    state_cov: list[list[float]]
+
+
+def differencing_polynomial(d: int, D: int, seasonal_period: int) -> np.ndarray:
+    """
+    The coefficients of (1 - B)^d (1 - B^s)^D in the backshift operator B.
+
+    Returns:
+        np.ndarray: The coefficient of B^k at index k, starting with 1
+    """
+    polynomial = np.array([1.0])
+    for _ in range(d):
+        polynomial = np.convolve(polynomial, [1.0, -1.0])
+    for _ in range(D):
+        seasonal = np.zeros(seasonal_period + 1)
+        seasonal[[0, -1]] = [1.0, -1.0]
+        polynomial = np.convolve(polynomial, seasonal)
+    return polynomial
+
+
+def _difference(values: np.ndarray, polynomial: np.ndarray) -> np.ndarray:
+    # The first len(polynomial) - 1 values only serve as history
+    return np.convolve(values, polynomial, mode='valid')
+
+
+def _integrate(
+    differenced: np.ndarray, tail: np.ndarray, polynomial: np.ndarray
+) -> np.ndarray:
+    # y_t = w_t - sum_k c_k y_{t-k}, continuing after the raw tail
+    values = list(tail)
+    for value in differenced:
+        values.append(value - np.dot(polynomial[1:], values[: -len(polynomial) : -1]))
+    return np.array(values[len(tail) :])
+
+
+class SarimaModel:
+    """
+    One SARIMA model per station, forecasting the daily series of one column.
+
+    The differencing, regular and seasonal, is applied once up front and only the
+    ARMA part is left to statsmodels. Its state space then holds the seasonal AR and
+    MA lags only, instead of all `d + D * s` lags the differencing looks back at, and
+    the differenced series and the last raw observations are what is cached.
+
+    The stations are fitted in a process pool. After a fit, every station keeps its
+    parameters and the Kalman filter state at its last day, so `update` runs only
+    the new observations through the filter instead of refitting, and forecasts are
+    filtered from the same state over missing observations.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        order: tuple[int, int, int] = (1, 0, 1),
+        seasonal_order: tuple[int, int, int, int] = (1, 1, 1, 7),
+        n_workers: int = 1,
+    ):
+        """
+        Args:
+            column (str): The column whose series is forecasted
+            order (tuple[int, int, int]): The (p, d, q) order
+            seasonal_order (tuple[int, int, int, int]): The (P, D, Q, s) order
+            n_workers (int): The number of processes to fit the stations in
+        """
+        self.column = column
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.n_workers = n_workers
+        self.stations: dict[Any, _StationState] = {}
+        self._polynomial = differencing_polynomial(
+            self.order[1], self.seasonal_order[1], self.seasonal_order[3]
+        )
+
+    @staticmethod
+    def model_path(model_dir: Path) -> Path:
+        return model_dir / 'sarima.json'
+
+    def _min_observations(self) -> int:
+        # Enough differenced observations to estimate the seasonal terms at all
+        p, _, q = self.order
+        P, _, Q, s = self.seasonal_order
+        return len(self._polynomial) - 1 + 2 * max(s, 1) + p + q + P + Q
+
+    def _daily_series(self, data: pl.DataFrame) -> dict[Any, tuple[date, np.ndarray]]:
+        """
+        The daily series of every station, with missing days interpolated.
+
+        Args:
+            data (pl.DataFrame): The station, the date and the column
+
+        Returns:
+            dict[Any, tuple[date, np.ndarray]]: The first day and the float64 values
+                of every station
+        """
+        series = (
+            data.select(
+                'station_id',
+                pl.col('date').cast(pl.Date),
+                pl.col(self.column).cast(pl.Float64),
+            )
+            .sort('station_id', 'date')
+            .unique(['station_id', 'date'], keep='last', maintain_order=True)
+            .upsample('date', every='1d', group_by='station_id', maintain_order=True)
+            .with_columns(
+                pl.col('station_id').forward_fill(),
+                pl.col(self.column)
+                .interpolate()
+                .forward_fill()
+                .backward_fill()
+                .over('station_id'),
+            )
+        )
+        return {
+            station_id: (
+                station.get_column('date')[0],
+                station.get_column(self.column).to_numpy(),
+            )
+            for (station_id,), station in series.group_by(
+                'station_id', maintain_order=True
+            )
+        }
+
+    def fit(self, data: pl.DataFrame):
+        """
+        Fits the model of every station, in `n_workers` processes.
+
+        Stations with too few days to estimate the seasonal terms are left out.
+
+        Args:
+            data (pl.DataFrame): The station, the date and the column
+        """
+        series = self._daily_series(data)
+        min_observations = self._min_observations()
+        too_short = [
+            station_id
+            for station_id, (_, values) in series.items()
+            if len(values) < min_observations
+        ]
+        if too_short:
+            logger.warning(
+                f'Leaving out {len(too_short)} stations with less than {min_observations} days'
+            )
+        series = {
+            station_id: station
+            for station_id, station in series.items()
+            if station_id not in too_short
+        }
+
+        n_workers = max(1, min(self.n_workers, len(series)))
+        logger.info(
+            f'Fitting SARIMA{self.order}x{self.seasonal_order} for {len(series)} stations in {n_workers} processes'
+        )
+        tasks = [
+            (self.order, self.seasonal_order, first_day, values)
+            for first_day, values in series.values()
+        ]
+        if n_workers == 1:
+            states = [_fit_station(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            ) as executor:
+                # A few large chunks per worker, a fit takes milliseconds to seconds
+                states = list(
+                    executor.map(
+                        _fit_station,
+                        *zip(*tasks, strict=True),
+                        chunksize=max(1, len(tasks) // (4 * n_workers)),
+                    )
+                )
+        self.stations = dict(zip(series, states, strict=True))
+
+    def update(self, data: pl.DataFrame) -> Optional[float]:
+        """
+        Runs the observations after the last day of every station through its
+        cached filter state, with the fitted parameters.
+
+        The one-step-ahead forecast errors of the filter are out-of-sample, since
+        every observation is predicted before it is filtered. Stations without a
+        fitted model are left out until the next fit.
+
+        Args:
+            data (pl.DataFrame): The station, the date and the column, may include
+                days the model has seen already
+
+        Returns:
+            Optional[float]: The MAE of the one-step-ahead forecasts of the new
+                observations, None if there are none
+        """
+        errors = []
+        for station_id, (first_day, values) in self._daily_series(data).items():
+            station = self.stations.get(station_id)
+            if station is None:
+                continue
+            start = (date.fromisoformat(station.last_date) - first_day).days + 1
+            new_values = values[max(start, 0) :]
+            if start < 0 or not len(new_values):
+                # Nothing new, or a gap after the last day the filter cannot bridge
+                continue
+
+            history = np.concatenate([station.tail, new_values])
+            model = _arma_model(
+                _difference(history, self._polynomial), self.order, self.seasonal_order
+            )
+            model.initialize_known(np.array(station.state), np.array(station.state_cov))
+            filtered = model.filter(np.array(station.params))
+            errors.append(filtered.forecasts_error[0])
+
+            self.stations[station_id] = _StationState(
+                last_date=(first_day + timedelta(days=len(values) - 1)).isoformat(),
+                params=station.params,
+                tail=history[len(history) - len(station.tail) :].tolist(),
+                state=filtered.predicted_state[:, -1].tolist(),
+                state_cov=filtered.predicted_state_cov[:, :, -1].tolist(),
+            )
+
+        if not errors:
+            return None
+        return float(np.mean(np.abs(np.concatenate(errors))))
+
+    def predict(self, horizons: list[int]) -> pl.DataFrame:
+        """
+        Forecasts every station from its last day.
+
+        Args:
+            horizons (list[int]): The forecast horizons in days
+
+        Returns:
+            pl.DataFrame: One row per station and horizon with the target date
+        """
+        n_steps = max(horizons)
+        rows = []
+        for station_id, station in self.stations.items():
+            # Filtering missing observations from the cached state forecasts them
+            model = _arma_model(
+                np.full(n_steps, np.nan), self.order, self.seasonal_order
+            )
+            model.initialize_known(np.array(station.state), np.array(station.state_cov))
+            forecasts = _integrate(
+                model.filter(np.array(station.params)).forecasts[0],
+                np.array(station.tail),
+                self._polynomial,
+            )
+            last_date = date.fromisoformat(station.last_date)
+            rows.extend(
+                {
+                    'station_id': station_id,
+                    'date': last_date,
+                    'horizon': horizon,
+                    'target_date': last_date + timedelta(days=horizon),
+                    'prediction': float(forecasts[horizon - 1]),
+                }
+                for horizon in horizons
+            )
+        return pl.DataFrame(
+            rows,
+            schema_overrides={
+                'date': pl.Date,
+                'horizon': pl.Int64,
+                'target_date': pl.Date,
+                'prediction': pl.Float64,
+            },
+        )
+
+    def save(self, model_dir: Path):
+        model_path = self.model_path(model_dir)
+        model_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = model_path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(
+                {
+                    'column': self.column,
+                    'order': self.order,
+                    'seasonal_order': self.seasonal_order,
+                    # A list, the station ids are not necessarily strings
+                    'stations': [
+                        {'station_id': station_id, **asdict(station)}
+                        for station_id, station in self.stations.items()
+                    ],
+                },
+                f,
+            )
+        os.replace(tmp_path, model_path)
+
+    def load(self, model_dir: Path):
+        with self.model_path(model_dir).open('r') as f:
+            saved = json.load(f)
+        if (
+            saved['column'] != self.column
+            or tuple(saved['order']) != self.order
+            or tuple(saved['seasonal_order']) != self.seasonal_order
+        ):
+            raise ValueError(
+                f'The saved SARIMA model of {saved["column"]} with orders {saved["order"]}x{saved["seasonal_order"]} does not match the configuration'
+            )
+        self.stations = {
+            station.pop('station_id'): _StationState(**station)
+            for station in saved['stations']
+        }
+
+    def exists(self, model_dir: Path) -> bool:
+        return self.model_path(model_dir).exists()
+
+
+def _arma_model(
+    differenced: np.ndarray,
+    order: tuple[int, int, int],
+    seasonal_order: tuple[int, int, int, int],
+) -> SARIMAX:
+    p, d, q = order
+    P, D, Q, s = seasonal_order
+    return SARIMAX(
+        differenced,
+        order=(p, 0, q),
+        seasonal_order=(P, 0, Q, s if P or Q else 0),
+        # Without differencing the series keeps its mean
+        trend='n' if d or D else 'c',
+    )
+
+
+def _fit_station(
+    order: tuple[int, int, int],
+    seasonal_order: tuple[int, int, int, int],
+    first_day: date,
+    values: np.ndarray,
+) -> _StationState:
+    """
+    Fits the ARMA part on the differenced series of one station.
+
+    Runs in a worker process, so it only gets the orders and the series.
+    """
+    polynomial = differencing_polynomial(order[1], seasonal_order[1], seasonal_order[3])
+    arma_model = _arma_model(_difference(values, polynomial), order, seasonal_order)
+    with warnings.catch_warnings():
+        # Short or flat series do not always converge, the last estimate is kept
+        warnings.simplefilter('ignore', ConvergenceWarning)
+        warnings.simplefilter('ignore', UserWarning)
+        fitted = arma_model.fit(disp=False)
+
+    n_history = len(polynomial) - 1
+    return _StationState(
+        last_date=(first_day + timedelta(days=len(values) - 1)).isoformat(),
+        params=fitted.params.tolist(),
+        tail=values[len(values) - n_history :].tolist(),
+        state=fitted.predicted_state[:, -1].tolist(),
+        state_cov=fitted.predicted_state_cov[:, :, -1].tolist(),
+    )
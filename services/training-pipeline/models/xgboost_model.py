@@ -1,13 +1,59 @@
-from typing import Optional
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Optional
 
 import numpy as np
-import optuna
 import polars as pl
+import xgboost as xgb
 from loguru import logger
-from sklearn.metrics import mean_absolute_error
-from sklearn.model_selection import TimeSeriesSplit
+from pipeline_common import instrumentation
 from xgboost import XGBRegressor
 
+# Optuna and scikit-learn are imported by the tuning functions, so fitting, updating
+# and predicting do not pay for them
+if TYPE_CHECKING:
+    import optuna
+
+# Boosting rounds without improvement on the early stopping rows before a trial stops
+EARLY_STOPPING_ROUNDS = 50
+# The booster attribute that keeps the training parameters in the saved model, the
+# model file itself only has the trees
+TRAINING_PARAMS_ATTRIBUTE = 'training_params'
+# The share of the latest training rows of a fold held out for early stopping, so
+# the validation fold that is scored never decides when to stop
+EARLY_STOPPING_FRACTION = 0.2
+
+
+def to_feature_matrix(X: pl.DataFrame) -> np.ndarray:
+    """
+    Convert the features into one C-contiguous float32 matrix.
+
+    This is the only copy of the features made for training: XGBoost reads the matrix
+    without converting it again, and folds are row ranges (views) of it.
+
+    Args:
+        X (pl.DataFrame): The features
+
+    Returns:
+        np.ndarray: The features as a float32 matrix, one row per sample
+    """
+    return X.select(pl.all().cast(pl.Float32)).to_numpy(order='c')
+
+
+def to_label_vector(y: pl.Series) -> np.ndarray:
+    """Convert the label into a float32 vector, without a copy if it is float32"""
+    return y.cast(pl.Float32).to_numpy()
+
+
+def to_label_matrix(Y: pl.DataFrame) -> np.ndarray:
+    """Convert the labels into a column-major float32 matrix, one label per column"""
+    return Y.select(pl.all().cast(pl.Float32)).to_numpy(order='fortran')
+
 
 class XGBoostModel:
     """
@@ -15,11 +61,17 @@ class XGBoostModel:
     settings using an XGBRegressor.
     """
 
-    def __init__(self):
-        self.model = XGBRegressor(
-            objective='reg:absoluteerror',
-            eval_metric=['mae'],
-        )
+    def __init__(self, profile: Optional[dict] = None):
+        """
+        Args:
+            profile (Optional[dict]): The XGBRegressor settings of the training profile
+                (tree method, threads, bins, objective), used by every fit
+        """
+        self.profile = profile or {
+            'objective': 'reg:absoluteerror',
+            'eval_metric': 'mae',
+        }
+        self.model = XGBRegressor(**self.profile)
 
     def get_model_object(self):
         """
@@ -34,6 +86,10 @@ class XGBoostModel:
         n_search_trials: Optional[int] = 0,
         n_splits: Optional[int] = 3,
         hyperparameter_tuning: bool = False,
+        n_workers: int = 1,
+        pruner: Literal['median', 'hyperband', 'none'] = 'median',
+        n_estimators_mode: Literal['search', 'early_stopping'] = 'search',
+        max_n_estimators: int = 2000,
     ):
         """
         Fits the an XGBoostRegressor model to the training data, either with or without
@@ -43,10 +99,18 @@ class XGBoostModel:
             X (pl.DataFrame): The training data (independent features)
             y (pl.Series): The target variable (label)
             hyperparameter_tuning (bool): Whether to perform hyperparameter tuning or not
+            n_workers (int): The number of processes to run tuning trials in
+            pruner (str): The pruner that stops unpromising tuning trials early
+            n_estimators_mode (str): Whether to search the tree budget `n_estimators`
+                of every trial, or to give every trial `max_n_estimators` trees; the
+                trials stop early and the refit uses the best iteration found
+            max_n_estimators (int): The tree budget in the early stopping mode
         """
-        if not hyperparameter_tuning:
+        features, labels = to_feature_matrix(X), to_label_vector(y)
+
+        if not hyperparameter_tuning or not n_search_trials:
             logger.info('Fitting XGBoost model without hyperparameter tuning')
-            self.model = XGBRegressor()
+            self.model = XGBRegressor(**self.profile)
 
         else:
             logger.info('Fitting XGBoost model with hyperparameter tuning')
@@ -54,95 +118,777 @@ class XGBoostModel:
             # Perform hyperparameter tuning with n_search_trials and n_splits
             # and we search for the best hyperparameters using Bayesian optimization
             best_hyperparams = self._find_best_hyperparams(
-                X, y, n_search_trials=n_search_trials, n_splits=n_splits
+                features,
+                labels,
+                n_search_trials=n_search_trials,
+                n_splits=n_splits,
+                n_workers=n_workers,
+                pruner=pruner,
+                max_n_estimators=max_n_estimators
+                if n_estimators_mode == 'early_stopping'
+                else None,
+                feature_names=X.columns,
             )
             logger.info(f'Best hyperparameters: {best_hyperparams}')
 
             # Train model with the best set of hyperparameters
-            self.model = XGBRegressor(**best_hyperparams)
+            self.model = XGBRegressor(**{**self.profile, **best_hyperparams})
 
         # Train the model
-        self.model.fit(X, y)
+        self.model.fit(features, labels)
+        self.model.get_booster().feature_names = X.columns
+
+    def predict(self, X: pl.DataFrame) -> np.ndarray:
+        # Simple predict method (comes with XGBRegressor), on the columns in training order
+        feature_names = self.model.get_booster().feature_names or X.columns
+        return self.model.predict(to_feature_matrix(X.select(feature_names)))
+
+    def update(
+        self,
+        X: pl.DataFrame,
+        y: pl.Series,
+        mode: Literal['continue', 'refresh'] = 'continue',
+        n_estimators: int = 10,
+    ):
+        """
+        Updates the fitted model with new data only, instead of training from scratch.
+
+        Args:
+            X (pl.DataFrame): The new data (independent features)
+            y (pl.Series): The new target variable (label)
+            mode (str): `continue` adds `n_estimators` trees fitted on the new data,
+                `refresh` keeps the trees and refits their leaf values on the new data
+            n_estimators (int): The number of trees added in the `continue` mode
+        """
+        booster = self.model.get_booster()
+        feature_names = booster.feature_names or X.columns
+        # The updates run on the native API with a named DMatrix, since the booster
+        # checks the feature names of the new data (the refresh updater also needs a
+        # plain DMatrix)
+        dnew = xgb.DMatrix(
+            to_feature_matrix(X.select(feature_names)),
+            to_label_vector(y),
+            feature_names=feature_names,
+        )
+
+        # Both modes train with the parameters of the model (learning rate,
+        # regularization, objective), not the defaults
+        params = self._training_params()
+
+        if mode == 'continue':
+            logger.info(f'Continuing boosting with {n_estimators} trees on new data')
+            updated_booster = xgb.train(
+                params,
+                dnew,
+                num_boost_round=n_estimators,
+                xgb_model=booster,
+            )
+
+        else:
+            logger.info('Refreshing the leaf values on new data')
+            updated_booster = xgb.train(
+                {
+                    **params,
+                    'process_type': 'update',
+                    'updater': 'refresh',
+                    'refresh_leaf': True,
+                },
+                dnew,
+                num_boost_round=booster.num_boosted_rounds(),
+                xgb_model=booster,
+            )
+
+        updated_booster.set_attr(**{TRAINING_PARAMS_ATTRIBUTE: json.dumps(params)})
+        model = XGBRegressor(**self.model.get_params())
+        model.load_model(updated_booster.save_raw())
+
+        model.get_booster().feature_names = booster.feature_names
+        self.model = model
+
+    def fit_matrix(
+        self,
+        dtrain: xgb.DMatrix,
+        hyperparams: Optional[dict] = None,
+    ):
+        """
+        Fits the model to an already built (and possibly shared) training matrix.
+
+        Args:
+            dtrain (xgb.DMatrix): The training data with the labels set
+            hyperparams (Optional[dict]): The tuned hyperparameters, on top of the
+                training profile
+        """
+        model = XGBRegressor(**{**self.profile, **(hyperparams or {})})
+        booster = xgb.train(
+            model.get_xgb_params(),
+            dtrain,
+            num_boost_round=model.get_num_boosting_rounds(),
+        )
+        model.load_model(booster.save_raw())
+        model.get_booster().feature_names = dtrain.feature_names
+        self.model = model
+
+    def save(self, model_path: str):
+        """
+        Saves the fitted model.
+
+        Args:
+            model_path (str): The file to save the model to (JSON)
+        """
+        Path(model_path).parent.mkdir(parents=True, exist_ok=True)
+        self.model.get_booster().set_attr(
+            **{TRAINING_PARAMS_ATTRIBUTE: json.dumps(self._training_params())}
+        )
+        self.model.save_model(model_path)
 
-    def predict(self, X: pl.DataFrame) -> pl.Series:
-        # Simple predict method (comes with XGBRegressor)
-        return self.model.predict(X)
+    def load(self, model_path: str):
+        """
+        Loads a model saved with `save`.
+
+        Args:
+            model_path (str): The file the model was saved to
+        """
+        self.model = XGBRegressor(**self.profile)
+        self.model.load_model(model_path)
+
+    def _training_params(self) -> dict:
+        """
+        The native parameters the model was trained with.
+
+        A loaded model only knows them from the booster attribute written by `save`,
+        models saved before it fall back to the parameters of the training profile.
+        """
+        stored_params = self.model.get_booster().attr(TRAINING_PARAMS_ATTRIBUTE)
+        if stored_params is not None:
+            return json.loads(stored_params)
+
+        # The base score is part of the trees, not a training parameter
+        return {
+            name: value
+            for name, value in self.model.get_xgb_params().items()
+            if value is not None and name != 'base_score'
+        }
 
     def _find_best_hyperparams(
         self,
-        X_train: pl.DataFrame,
-        y_train: pl.Series,
+        X_train: np.ndarray,
+        y_train: np.ndarray,
         n_search_trials: int,
         n_splits: int,
+        n_workers: int = 1,
+        pruner: Literal['median', 'hyperband', 'none'] = 'median',
+        seed: Optional[int] = None,
+        max_n_estimators: Optional[int] = None,
+        feature_names: Optional[list[str]] = None,
     ) -> dict:
         """
         Finds the best hyperparameters for the model using Bayesian optimization.
 
+        The trials run in `n_workers` processes that share one study through a journal
+        file. Every process trains XGBoost with its share of the CPU cores, so the
+        workers do not oversubscribe the CPU. The MAE is reported after every fold,
+        so the pruner can stop unpromising trials early.
+
+        With `max_n_estimators`, `n_estimators` is not searched: every trial trains up
+        to that many trees with early stopping. Otherwise the searched `n_estimators`
+        is the budget of a trial. Either way the mean best iteration of the folds of
+        the best trial is returned as `n_estimators`, the number of trees that was
+        scored.
+
         Args:
-            X_train: pl.DataFrame, the training data
-            y_train: pl.Series, the target variable
+            X_train: np.ndarray, the training data as a float32 matrix
+            y_train: np.ndarray, the target variable as a float32 vector
             n_search_trials: int, the number of trials to run
             n_splits: int, the number of splits to use for time-based cross-validation
+            n_workers: int, the number of processes to run trials in
+            pruner: str, the pruner that stops unpromising trials
+            seed: Optional[int], the seed of the sampler of the first worker
+            max_n_estimators: Optional[int], the tree budget of every trial, None to
+                search `n_estimators`
+            feature_names: Optional[list[str]], the names of the feature columns
 
         Returns:
             dict, the best hyperparameters
         """
+        return self._find_best_hyperparams_per_label(
+            X_train,
+            y_train[:, np.newaxis],
+            n_search_trials,
+            n_splits,
+            n_workers=n_workers,
+            pruner=pruner,
+            seed=seed,
+            max_n_estimators=max_n_estimators,
+            feature_names=feature_names,
+        )[0]
+
+    def _find_best_hyperparams_per_label(
+        self,
+        X_train: np.ndarray,
+        Y_train: np.ndarray,
+        n_search_trials: int,
+        n_splits: int,
+        n_workers: int = 1,
+        pruner: Literal['median', 'hyperband', 'none'] = 'median',
+        seed: Optional[int] = None,
+        max_n_estimators: Optional[int] = None,
+        feature_names: Optional[list[str]] = None,
+    ) -> list[dict]:
+        """
+        Finds the best hyperparameters for every label column, see
+        `_find_best_hyperparams`.
+
+        Every label gets its own study, but the folds are quantized once per worker
+        and shared by all labels: only the labels of the fold matrices are swapped.
+
+        Args:
+            X_train: np.ndarray, the training data as a float32 matrix
+            Y_train: np.ndarray, the labels as a float32 matrix, one column per label
+            (the other arguments as in `_find_best_hyperparams`)
+
+        Returns:
+            list[dict], the best hyperparameters of every label column
+        """
+        import optuna
+        from optuna.trial import TrialState
+
+        n_workers = max(1, min(n_workers, n_search_trials))
+        n_jobs = max(1, self.profile.get('n_jobs', os.cpu_count() or 1) // n_workers)
 
-        def objective(trial: optuna.Trial) -> float:
-            """
-            Objective function for Optuna that returns the mean absolute error we
-            want to minimize.
-
-            Args:
-                trial: optuna.Trial, the trial object
-
-            Returns:
-                float, the mean absolute error
-            """
-            # Use Optuna to search for the best hyperparameters
-            params = {
-                'n_estimators': trial.suggest_int('n_estimators', 100, 1000),
-                'max_depth': trial.suggest_int('max_depth', 3, 10),
-                'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3),
-                'subsample': trial.suggest_float('subsample', 0.5, 1.0),
-                'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
-                # NOTE: there is totally room for improving the search space
-                # Find the complete list of hyperparameters here:
-                # https://xgboost.readthedocs.io/en/stable/parameter.html
-            }
-
-            # Time-based cross-validation, since we are dealing with time series data (BE CAREFUL: POTENIAL DATA LEAKAGE)
-            tscv = TimeSeriesSplit(n_splits=n_splits)
-            mae_scores = []
-            for train_index, val_index in tscv.split(X_train):
-                # split the data into training and validation sets
-                X_train_fold, X_val_fold = (
-                    X_train.iloc[train_index],
-                    X_train.iloc[val_index],
+        with tempfile.TemporaryDirectory() as storage_dir:
+            storage_path = os.path.join(storage_dir, 'study.log')
+
+            # Create a study object per label that minimizes the objective function
+            studies = [
+                optuna.create_study(
+                    study_name=_study_name(label_index),
+                    storage=_journal_storage(storage_path),
+                    direction='minimize',
+                )
+                for label_index in range(Y_train.shape[1])
+            ]
+
+            # Run trials = optimize the objective function
+            logger.info(
+                f'Running {n_search_trials} trials in {n_workers} processes with {n_jobs} threads each'
+            )
+            worker_args = (
+                storage_path,
+                X_train,
+                Y_train,
+                n_search_trials,
+                n_splits,
+                n_jobs,
+                pruner,
+                self.profile,
+                max_n_estimators,
+                feature_names,
+            )
+            # Every worker samples with its own seed, so they do not repeat each other
+            worker_seeds = [
+                None if seed is None else seed + worker for worker in range(n_workers)
+            ]
+            if n_workers == 1:
+                _optimize(*worker_args, seed=worker_seeds[0])
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                ) as executor:
+                    for future in [
+                        executor.submit(
+                            _optimize_in_worker, *worker_args, seed=worker_seed
+                        )
+                        for worker_seed in worker_seeds
+                    ]:
+                        instrumentation.add_records(future.result())
+
+            best_hyperparams_per_label = []
+            for study in studies:
+                pruned_trials = study.get_trials(states=(TrialState.PRUNED,))
+                boosting_rounds = sum(
+                    trial.user_attrs.get('boosting_rounds', 0) for trial in study.trials
                 )
-                y_train_fold, y_val_fold = (
-                    y_train.iloc[train_index],
-                    y_train.iloc[val_index],
+                logger.info(
+                    f'Finished {len(study.trials)} trials of {study.study_name}, {len(pruned_trials)} pruned, {boosting_rounds} boosting rounds'
+                )
+
+                # Return best set of hyperparameters
+                best_hyperparams = dict(study.best_trial.params)
+                best_hyperparams['n_estimators'] = round(
+                    np.mean(study.best_trial.user_attrs['best_iterations'])
+                )
+                best_hyperparams_per_label.append(best_hyperparams)
+            return best_hyperparams_per_label
+
+
+class MultiHorizonXGBoostModel:
+    """
+    One XGBoost model per forecast horizon, trained on the same features.
+
+    The features are converted into one matrix, quantized once and shared by all
+    horizons, in the tuning folds as well as in the final fits: only the labels are
+    swapped between horizons.
+    """
+
+    def __init__(self, horizons: list[int], profile: Optional[dict] = None):
+        """
+        Args:
+            horizons (list[int]): The forecast horizons in days
+            profile (Optional[dict]): The XGBRegressor settings of the training profile
+        """
+        self.models = {horizon: XGBoostModel(profile) for horizon in horizons}
+        self.profile = next(iter(self.models.values())).profile
+
+    @staticmethod
+    def model_path(model_dir: Path, horizon: int) -> Path:
+        return model_dir / f'xgboost_h{horizon}.json'
+
+    def tune(
+        self,
+        X: pl.DataFrame,
+        Y: pl.DataFrame,
+        n_search_trials: int,
+        n_splits: int = 3,
+        n_workers: int = 1,
+        pruner: Literal['median', 'hyperband', 'none'] = 'median',
+        n_estimators_mode: Literal['search', 'early_stopping'] = 'search',
+        max_n_estimators: int = 2000,
+    ) -> list[dict]:
+        """
+        Finds the best hyperparameters of every horizon, with one study per horizon
+        on shared folds.
+
+        Args:
+            X (pl.DataFrame): The training data (independent features)
+            Y (pl.DataFrame): The labels, one column per horizon in horizon order
+            (the other arguments as in `XGBoostModel.fit`)
+
+        Returns:
+            list[dict]: The best hyperparameters of every horizon, in horizon order
+        """
+        return self._tune(
+            to_feature_matrix(X),
+            to_label_matrix(Y),
+            feature_names=X.columns,
+            n_search_trials=n_search_trials,
+            n_splits=n_splits,
+            n_workers=n_workers,
+            pruner=pruner,
+            n_estimators_mode=n_estimators_mode,
+            max_n_estimators=max_n_estimators,
+        )
+
+    def _tune(
+        self,
+        features: np.ndarray,
+        labels: np.ndarray,
+        feature_names: list[str],
+        n_search_trials: int,
+        n_splits: int,
+        n_workers: int,
+        pruner: Literal['median', 'hyperband', 'none'],
+        n_estimators_mode: Literal['search', 'early_stopping'],
+        max_n_estimators: int,
+    ) -> list[dict]:
+        logger.info(f'Tuning XGBoost models for horizons {list(self.models)}')
+        return next(iter(self.models.values()))._find_best_hyperparams_per_label(
+            features,
+            labels,
+            n_search_trials=n_search_trials,
+            n_splits=n_splits,
+            n_workers=n_workers,
+            pruner=pruner,
+            max_n_estimators=max_n_estimators
+            if n_estimators_mode == 'early_stopping'
+            else None,
+            feature_names=feature_names,
+        )
+
+    def fit(
+        self,
+        X: pl.DataFrame,
+        Y: pl.DataFrame,
+        n_search_trials: Optional[int] = 0,
+        n_splits: Optional[int] = 3,
+        hyperparameter_tuning: bool = False,
+        n_workers: int = 1,
+        pruner: Literal['median', 'hyperband', 'none'] = 'median',
+        n_estimators_mode: Literal['search', 'early_stopping'] = 'search',
+        max_n_estimators: int = 2000,
+        hyperparams_per_horizon: Optional[list[dict]] = None,
+    ):
+        """
+        Fits the model of every horizon, see `XGBoostModel.fit`.
+
+        Args:
+            X (pl.DataFrame): The training data (independent features)
+            Y (pl.DataFrame): The labels, one column per horizon in horizon order
+            hyperparams_per_horizon (Optional[list[dict]]): The hyperparameters of
+                every horizon from `tune`, skips the tuning if given
+            (the other arguments as in `XGBoostModel.fit`)
+        """
+        features, labels = to_feature_matrix(X), to_label_matrix(Y)
+
+        if hyperparams_per_horizon is None:
+            if hyperparameter_tuning and n_search_trials:
+                hyperparams_per_horizon = self._tune(
+                    features,
+                    labels,
+                    feature_names=X.columns,
+                    n_search_trials=n_search_trials,
+                    n_splits=n_splits,
+                    n_workers=n_workers,
+                    pruner=pruner,
+                    n_estimators_mode=n_estimators_mode,
+                    max_n_estimators=max_n_estimators,
                 )
+            else:
+                hyperparams_per_horizon = [{} for _ in self.models]
+        logger.info(f'Fitting XGBoost models for horizons {list(self.models)}')
+
+        # QuantileDMatrix only works with the hist tree method
+        matrix_type = (
+            xgb.QuantileDMatrix
+            if self.profile.get('tree_method', 'hist') == 'hist'
+            else xgb.DMatrix
+        )
+        matrix_kwargs = (
+            {'max_bin': self.profile.get('max_bin', 256)}
+            if matrix_type is xgb.QuantileDMatrix
+            else {}
+        )
+        dtrain = matrix_type(
+            features,
+            labels[:, 0],
+            feature_names=X.columns,
+            nthread=self.profile.get('n_jobs', os.cpu_count() or 1),
+            **matrix_kwargs,
+        )
+        for index, (horizon, model) in enumerate(self.models.items()):
+            logger.info(
+                f'Fitting the model of horizon {horizon} with {hyperparams_per_horizon[index]}'
+            )
+            dtrain.set_label(labels[:, index])
+            model.fit_matrix(dtrain, hyperparams_per_horizon[index])
+
+    def predict(self, X: pl.DataFrame) -> dict[int, np.ndarray]:
+        return {horizon: model.predict(X) for horizon, model in self.models.items()}
+
+    def update(
+        self,
+        X: pl.DataFrame,
+        Y: pl.DataFrame,
+        mode: Literal['continue', 'refresh'] = 'continue',
+        n_estimators: int = 10,
+    ):
+        """
+        Updates the model of every horizon with new data, see `XGBoostModel.update`.
+
+        Args:
+            X (pl.DataFrame): The new data (independent features)
+            Y (pl.DataFrame): The new labels, one column per horizon in horizon order
+            (the other arguments as in `XGBoostModel.update`)
+        """
+        for model, label in zip(self.models.values(), Y.columns, strict=True):
+            model.update(X, Y.get_column(label), mode=mode, n_estimators=n_estimators)
+
+    def save(self, model_dir: Path):
+        for horizon, model in self.models.items():
+            model.save(str(self.model_path(model_dir, horizon)))
+
+    def load(self, model_dir: Path):
+        for horizon, model in self.models.items():
+            model.load(str(self.model_path(model_dir, horizon)))
+
+    def exists(self, model_dir: Path) -> bool:
+        """Whether a saved model of every horizon exists in `model_dir`"""
+        return all(
+            self.model_path(model_dir, horizon).exists() for horizon in self.models
+        )
+
+
+def _study_name(label_index: int) -> str:
+    return 'xgboost' if label_index == 0 else f'xgboost_label_{label_index}'
+
+
+def _journal_storage(storage_path: str) -> 'optuna.storages.JournalStorage':
+    from optuna.storages import JournalStorage
+    from optuna.storages.journal import JournalFileBackend
+
+    return JournalStorage(JournalFileBackend(storage_path))
 
-                # train the model on the training set
-                model = XGBRegressor(**params)
-                model.fit(X_train_fold, y_train_fold)
 
-                # evaluate the model on the validation set
-                y_pred = model.predict(X_val_fold)
-                mae = mean_absolute_error(y_val_fold, y_pred)
-                mae_scores.append(mae)
+def _create_pruner(
+    pruner: Literal['median', 'hyperband', 'none'], n_splits: int
+) -> 'optuna.pruners.BasePruner':
+    """Create the pruner, the folds of the cross-validation are its steps"""
+    import optuna
 
-            # Return average MAE
-            return np.mean(mae_scores)
+    if pruner == 'median':
+        return optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0)
+    if pruner == 'hyperband':
+        return optuna.pruners.HyperbandPruner(min_resource=1, max_resource=n_splits)
+    return optuna.pruners.NopPruner()
 
-        # Create a study object that minimizes the objective function
-        study = optuna.create_study(direction='minimize')
 
-        # Run trials = optimize the objective function
-        logger.info(f'Running {n_search_trials} trials')
-        study.optimize(objective, n_trials=n_search_trials)
+@dataclass
+class _Fold:
+    dtrain: xgb.QuantileDMatrix
+    dstop: xgb.QuantileDMatrix
+    dval: xgb.QuantileDMatrix
+    y_val: np.ndarray
+    train_rows: slice
+    stop_rows: slice
+    val_rows: slice
+
+    def set_labels(self, y: np.ndarray) -> None:
+        """Swap the labels, the quantized features of the fold stay as they are"""
+        self.dtrain.set_label(y[self.train_rows])
+        self.dstop.set_label(y[self.stop_rows])
+        self.dval.set_label(y[self.val_rows])
+        self.y_val = y[self.val_rows]
+
+
+def _build_folds(
+    X_train: np.ndarray,
+    y_train: np.ndarray,
+    n_splits: int,
+    n_jobs: int,
+    max_bin: int = 256,
+    feature_names: Optional[list[str]] = None,
+) -> list[_Fold]:
+    """
+    Split the data into time-based folds and quantize every fold once.
+
+    The folds of a time series split are consecutive rows, so they are sliced as row
+    ranges, which are views of the feature matrix instead of copies. The latest
+    `EARLY_STOPPING_FRACTION` of the training range of a fold is held out for early
+    stopping. The early stopping and validation matrices of a fold reuse the quantile
+    cuts of its training matrix, and the folds are shared by all trials of a worker,
+    so the quantization is not repeated per trial.
+
+    Args:
+        X_train: np.ndarray, the training data as a float32 matrix
+        y_train: np.ndarray, the target variable as a float32 vector
+        n_splits: int, the number of splits to use for time-based cross-validation
+        n_jobs: int, the number of threads XGBoost may use
+        max_bin: int, the number of quantile bins per feature
+        feature_names: Optional[list[str]], the names of the feature columns
+
+    Returns:
+        list[_Fold], the quantized training, early stopping and validation matrix of
+        every fold
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+
+    # Time-based cross-validation, since we are dealing with time series data (BE CAREFUL: POTENIAL DATA LEAKAGE)
+    tscv = TimeSeriesSplit(n_splits=n_splits)
+    folds = []
+    for train_index, val_index in tscv.split(X_train):
+        stop_start = (
+            train_index[-1]
+            + 1
+            - max(1, int(len(train_index) * EARLY_STOPPING_FRACTION))
+        )
+        train_rows = slice(train_index[0], stop_start)
+        stop_rows = slice(stop_start, train_index[-1] + 1)
+        val_rows = slice(val_index[0], val_index[-1] + 1)
+
+        dtrain = xgb.QuantileDMatrix(
+            X_train[train_rows],
+            y_train[train_rows],
+            feature_names=feature_names,
+            max_bin=max_bin,
+            nthread=n_jobs,
+        )
+        dstop, dval = (
+            xgb.QuantileDMatrix(
+                X_train[rows],
+                y_train[rows],
+                feature_names=feature_names,
+                ref=dtrain,
+                max_bin=max_bin,
+                nthread=n_jobs,
+            )
+            for rows in (stop_rows, val_rows)
+        )
+        folds.append(
+            _Fold(
+                dtrain=dtrain,
+                dstop=dstop,
+                dval=dval,
+                y_val=y_train[val_rows],
+                train_rows=train_rows,
+                stop_rows=stop_rows,
+                val_rows=val_rows,
+            )
+        )
+
+    return folds
+
+
+def _objective(
+    trial: 'optuna.Trial',
+    folds: list[_Fold],
+    n_jobs: int,
+    profile: Optional[dict] = None,
+    max_n_estimators: Optional[int] = None,
+) -> float:
+    """
+    Objective function for Optuna that returns the mean absolute error we
+    want to minimize.
+
+    Every fold is trained with the native API and stops early once the MAE on the
+    held out end of its training range stops improving. The MAE of the best
+    iteration is then scored on the validation fold, which took no part in training.
+
+    Args:
+        trial: optuna.Trial, the trial object
+        folds: list[_Fold], the quantized folds
+        n_jobs: int, the number of threads XGBoost may use
+        profile: Optional[dict], the XGBRegressor settings of the training profile
+        max_n_estimators: Optional[int], a fixed tree budget instead of searching
+            `n_estimators`
+
+    Returns:
+        float, the mean absolute error
+
+    Raises:
+        optuna.TrialPruned: If the trial is worse than the others after a fold
+    """
+    import optuna
+    from sklearn.metrics import mean_absolute_error
+
+    # Use Optuna to search for the best hyperparameters
+    n_estimators = max_n_estimators or trial.suggest_int('n_estimators', 100, 1000)
+    params = {
+        'max_depth': trial.suggest_int('max_depth', 3, 10),
+        'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3),
+        'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
+        # NOTE: there is totally room for improving the search space
+        # Find the complete list of hyperparameters here:
+        # https://xgboost.readthedocs.io/en/stable/parameter.html
+        # The profile settings, in the names of the native API
+        **{
+            name: value
+            for name, value in (profile or {}).items()
+            if name in ('tree_method', 'max_bin', 'objective', 'eval_metric')
+        },
+        'nthread': n_jobs,
+    }
+    params.setdefault('tree_method', 'hist')
+    params.setdefault('eval_metric', 'mae')
+
+    # A FixedTrial (e.g. in the benchmarks) does not belong to a study
+    study_name = trial.study.study_name if hasattr(trial, 'study') else None
+
+    mae_scores = []
+    best_iterations = []
+    boosting_rounds = 0
+    for fold_index, fold in enumerate(folds):
+        with instrumentation.measure(
+            'cv_fold', kind='fold', study=study_name, fold=fold_index
+        ) as measurement:
+            measurement.rows_in = fold.dtrain.num_row() + fold.dstop.num_row()
+            measurement.rows_out = fold.dval.num_row()
+
+            # train the model on the training set
+            booster = xgb.train(
+                params,
+                fold.dtrain,
+                num_boost_round=n_estimators,
+                evals=[(fold.dstop, 'early_stopping')],
+                early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+                verbose_eval=False,
+            )
+
+            # evaluate the best iteration on the validation set
+            y_pred = booster.predict(
+                fold.dval, iteration_range=(0, booster.best_iteration + 1)
+            )
+        mae_scores.append(mean_absolute_error(fold.y_val, y_pred))
+        best_iterations.append(booster.best_iteration + 1)
+        boosting_rounds += booster.num_boosted_rounds()
+        trial.set_user_attr('boosting_rounds', boosting_rounds)
+
+        # Report the MAE so far, so the pruner can stop a bad trial after this fold
+        trial.report(np.mean(mae_scores), step=fold_index)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    trial.set_user_attr('best_iterations', best_iterations)
+
+    # Return average MAE
+    return np.mean(mae_scores)
+
+
+def _measured_objective(trial: 'optuna.Trial', *args) -> float:
+    # A pruned trial is recorded with the TrialPruned error
+    with instrumentation.measure(
+        'optuna_trial', kind='trial', study=trial.study.study_name
+    ):
+        return _objective(trial, *args)
+
+
+def _optimize(
+    storage_path: str,
+    X_train: np.ndarray,
+    Y_train: np.ndarray,
+    n_search_trials: int,
+    n_splits: int,
+    n_jobs: int,
+    pruner: Literal['median', 'hyperband', 'none'],
+    profile: dict,
+    max_n_estimators: Optional[int] = None,
+    feature_names: Optional[list[str]] = None,
+    seed: Optional[int] = None,
+) -> None:
+    """
+    Run trials of the shared study of every label column until it has
+    `n_search_trials` finished trials.
+
+    Runs in a worker process, so it loads the studies from the journal file and
+    quantizes the folds once for all of its trials and labels.
+    """
+    import optuna
+    from optuna.study import MaxTrialsCallback
+    from optuna.trial import TrialState
+
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    folds = _build_folds(
+        X_train,
+        Y_train[:, 0],
+        n_splits,
+        n_jobs,
+        max_bin=profile.get('max_bin', 256),
+        feature_names=feature_names,
+    )
+    for label_index in range(Y_train.shape[1]):
+        for fold in folds:
+            fold.set_labels(Y_train[:, label_index])
+
+        study = optuna.load_study(
+            study_name=_study_name(label_index),
+            storage=_journal_storage(storage_path),
+            sampler=optuna.samplers.TPESampler(seed=seed),
+            pruner=_create_pruner(pruner, n_splits),
+        )
+        study.optimize(
+            lambda trial: _measured_objective(
+                trial, folds, n_jobs, profile, max_n_estimators
+            ),
+            n_trials=n_search_trials,
+            callbacks=[
+                MaxTrialsCallback(
+                    n_search_trials, states=(TrialState.COMPLETE, TrialState.PRUNED)
+                )
+            ],
+        )
+
 
-        # Return best set of hyperparameters
-        return study.best_trial.params
+def _optimize_in_worker(*args, **kwargs) -> list[dict]:
+    # The measurements of the trials and folds go back to the parent process
+    _optimize(*args, **kwargs)
+    return instrumentation.records()
@@ -1,36 +1,423 @@
-import pandas as pd
-from config.config import hopsworksCredentialsConfig, training_config
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional
+
+import numpy as np
+import polars as pl
+import polars.selectors as cs
+from config import config
 from feature_reader import BasicFeatureViewManager
 from loguru import logger
+from models import model_state
+from models.model_state import ModelState
+from pipeline_common import instrumentation
+from pipeline_common.dag import DagRunner, Stage
+from training_data_cache import TrainingDataCache
+from utils import time_series_features
 from utils.time_series_features import TimeSeriesFeaturesGenerator
 
+# The model modules are imported by the functions of their model, so a run does not
+# import the libraries (statsmodels, XGBoost) of the other one
+if TYPE_CHECKING:
+    from models.sarima_model import SarimaModel
+    from models.xgboost_model import MultiHorizonXGBoostModel
 
-def pipeline():
+XGBOOST_STATE_FILE = 'xgboost_state.json'
+SARIMA_STATE_FILE = 'sarima_state.json'
+
+
+def _model_dir() -> Path:
+    # Resolved on use, so importing the pipeline does not load the settings
+    return Path(__file__).parent / config.training_config.model_dir
+
+
+def _split_training_data(
+    training_data: pl.DataFrame,
+) -> tuple[pl.Series, pl.DataFrame, pl.DataFrame]:
+    """
+    Split the training data into the dates, the features and the labels.
+
+    Rows whose label is not known yet for some horizon (the latest days) are left out.
+    The rows are sorted by date, then station: the folds and the early stopping holdout
+    are row ranges, and neither the feature store nor the features without the time
+    based ones keep the rows in time order.
+
+    Returns:
+        tuple[pl.Series, pl.DataFrame, pl.DataFrame]: The dates, the features and
+            the labels of every horizon in horizon order
+    """
+    labels = list(config.training_config.get_label_columns().values())
+    training_data = training_data.drop_nulls(subset=labels).sort(
+        pl.col('date').cast(pl.Date), 'station_id'
+    )
+    dates = training_data.get_column('date').cast(pl.Date)
+    # Every label column is left out of the features, configured or not
+    X = training_data.drop(
+        'date', 'station_id', cs.starts_with(config.training_config.label), strict=False
+    )
+    return dates, X, training_data.select(labels)
+
+
+def tune_xgboost_model(training_data: pl.DataFrame) -> list[dict]:
+    """
+    Find the best hyperparameters of the XGBoost model of every horizon.
+
+    Args:
+        training_data (pl.DataFrame): The training data with the date and the labels
+
+    Returns:
+        list[dict]: The hyperparameters of every horizon, empty without tuning
+    """
+    labels = config.training_config.get_label_columns()
+    if (
+        not config.training_config.hyperparameter_tuning
+        or not config.training_config.hyperparameter_tuning_search_trials
+    ):
+        return [{} for _ in labels]
+
+    from models.xgboost_model import MultiHorizonXGBoostModel
+
+    _, X, Y = _split_training_data(training_data)
+    return MultiHorizonXGBoostModel(
+        list(labels), profile=config.training_config.get_training_profile()
+    ).tune(
+        X,
+        Y,
+        n_search_trials=config.training_config.hyperparameter_tuning_search_trials,
+        n_splits=config.training_config.hyperparameter_tuning_n_splits,
+        n_workers=config.training_config.hyperparameter_tuning_n_workers,
+        pruner=config.training_config.hyperparameter_tuning_pruner,
+        n_estimators_mode=config.training_config.hyperparameter_tuning_n_estimators_mode,
+        max_n_estimators=config.training_config.hyperparameter_tuning_max_n_estimators,
+    )
+
+
+def train_xgboost_model(
+    training_data: pl.DataFrame, tune: Callable[[], list[dict]]
+) -> Optional[tuple['MultiHorizonXGBoostModel', ModelState]]:
+    """
+    Train the XGBoost model of every horizon, incrementally on the new data if possible.
+
+    The models of all horizons share the feature matrix and the tuning folds.
+
+    In the incremental mode the models of the previous run are loaded and updated
+    with the rows after the date they were trained until. A full fit on the whole
+    window happens on the first run, on the schedule and when the MAE on the new
+    data drifts away from the recent MAEs.
+
+    Args:
+        training_data (pl.DataFrame): The training data with the date and the labels
+        tune (Callable[[], list[dict]]): Returns the tuned hyperparameters of every
+            horizon, only called for a full fit
+
+    Returns:
+        Optional[tuple[MultiHorizonXGBoostModel, ModelState]]: The trained models and
+            their state, None if there is no new data to update them with
+    """
+    from models.xgboost_model import MultiHorizonXGBoostModel
+
+    labels = config.training_config.get_label_columns()
+    dates, X, Y = _split_training_data(training_data)
+    trained_until = dates.max().isoformat()
+    today = date.today()
+
+    model = MultiHorizonXGBoostModel(
+        list(labels), profile=config.training_config.get_training_profile()
+    )
+    model_dir = _model_dir()
+    state = (
+        ModelState.load(model_dir / XGBOOST_STATE_FILE)
+        if config.training_config.incremental_training
+        else None
+    )
+    if state is not None and model.exists(model_dir):
+        if state.is_full_fit_due(today, config.training_config.full_fit_every_days):
+            logger.info(f'Full fit is due, the last one was on {state.last_full_fit}')
+        else:
+            model.load(model_dir)
+            new_rows = dates > date.fromisoformat(state.trained_until)
+            if not new_rows.any():
+                logger.info(f'No new data since {state.trained_until}')
+                return None
+
+            from sklearn.metrics import mean_absolute_error
+
+            # Evaluate before updating, so the MAE is out-of-sample
+            predictions = model.predict(X.filter(new_rows))
+            mae = float(
+                np.mean(
+                    [
+                        mean_absolute_error(
+                            Y.get_column(label).filter(new_rows), predictions[horizon]
+                        )
+                        for horizon, label in labels.items()
+                    ]
+                )
+            )
+            if state.is_drifting(mae, config.training_config.drift_tolerance):
+                logger.warning(f'MAE {mae:.2f} on new data drifted, full fit instead')
+            else:
+                logger.info(
+                    f'Updating the models with {new_rows.sum()} new rows (MAE {mae:.2f})'
+                )
+                model.update(
+                    X.filter(new_rows),
+                    Y.filter(new_rows),
+                    mode=config.training_config.incremental_update_mode,
+                    n_estimators=config.training_config.incremental_n_estimators,
+                )
+                state.record_update(trained_until, mae)
+                return model, state
+
+    logger.info(f'Fitting the models on {len(X)} rows')
+    model.fit(X, Y, hyperparams_per_horizon=tune())
+    return model, ModelState(
+        trained_until=trained_until, last_full_fit=today.isoformat()
+    )
+
+
+def train_sarima_model(
+    training_data: pl.DataFrame,
+) -> Optional[tuple['SarimaModel', ModelState]]:
+    """
+    Train the SARIMA model of every station, incrementally on the new data if possible.
+
+    In the incremental mode the models of the previous run are loaded and only the
+    days after their last day are filtered through them, with the fitted parameters.
+    The parameters are estimated again on the same schedule and drift check as the
+    XGBoost model, the MAE being that of the one-step-ahead forecasts of the new days.
+
+    Args:
+        training_data (pl.DataFrame): The training data with the station, the date
+            and the forecasted column
+
+    Returns:
+        Optional[tuple[SarimaModel, ModelState]]: The trained models and their state,
+            None if there is no new data to filter
+    """
+    from models.sarima_model import SarimaModel
+
+    trained_until = training_data.get_column('date').cast(pl.Date).max().isoformat()
+    today = date.today()
+
+    model = SarimaModel(
+        config.training_config.sarima_column,
+        order=config.training_config.sarima_order,
+        seasonal_order=config.training_config.sarima_seasonal_order,
+        n_workers=config.training_config.sarima_n_workers,
+    )
+    model_dir = _model_dir()
+    state = (
+        ModelState.load(model_dir / SARIMA_STATE_FILE)
+        if config.training_config.incremental_training
+        else None
+    )
+    if state is not None and model.exists(model_dir):
+        if state.is_full_fit_due(today, config.training_config.full_fit_every_days):
+            logger.info(f'Full fit is due, the last one was on {state.last_full_fit}')
+        else:
+            model.load(model_dir)
+            # The forecast errors are measured before every day is filtered
+            mae = model.update(training_data)
+            if mae is None:
+                logger.info(f'No new data since {state.trained_until}')
+                return None
+
+            if state.is_drifting(mae, config.training_config.drift_tolerance):
+                logger.warning(f'MAE {mae:.2f} on new data drifted, full fit instead')
+            else:
+                logger.info(f'Filtered the new days through the models (MAE {mae:.2f})')
+                state.record_update(trained_until, mae)
+                return model, state
+
+    model.fit(training_data)
+    return model, ModelState(
+        trained_until=trained_until, last_full_fit=today.isoformat()
+    )
+
+
+def read_training_data() -> pl.DataFrame:
+    """Read the features and the labels of the configured time range"""
     # Initialize the basic feature view manager
     logger.info('Initializing the basic feature view manager')
     feature_view_manager = BasicFeatureViewManager(
-        api_key=hopsworksCredentialsConfig.api_key,
-        project_name=hopsworksCredentialsConfig.project_name,
-        feature_view_name=training_config.feature_view_basic_features_name,
-        feature_view_version=training_config.feature_view_basic_features_version,
-        label=training_config.label,
-        start_datetime=training_config.start_date,
-        end_datetime=training_config.end_date,
+        api_key=config.hopsworksCredentialsConfig.api_key,
+        project_name=config.hopsworksCredentialsConfig.project_name,
+        feature_view_name=config.training_config.feature_view_basic_features_name,
+        feature_view_version=config.training_config.feature_view_basic_features_version,
+        label=list(config.training_config.get_label_columns().values()),
+        start_datetime=config.training_config.start_date,
+        end_datetime=config.training_config.end_date,
+        cache=TrainingDataCache(
+            config.training_config.training_data_cache_dir,
+            max_size_mb=config.training_config.training_data_cache_max_size_mb,
+            max_age_hours=config.training_config.training_data_cache_max_age_hours,
+        )
+        if config.training_config.training_data_cache
+        else None,
     )
 
     # Get training data
     logger.info('Getting training data')
-    training_data = (
+    X, y = (
         feature_view_manager.get_training_data()
-    )  # NOTE: Returns pandas dataframe, hence, we will continue to use it as such
-    training_data = pd.DataFrame(training_data)
+    )  # NOTE: Returns Polars dataframes, the data stays in Arrow memory until training
+    training_data = pl.concat([X, y], how='horizontal')
     logger.info(f'Training data successfully retrieved: {training_data.shape}')
+    return training_data
+
+
+def create_features(read: pl.DataFrame) -> pl.DataFrame:
+    """Create the time-based features if enabled"""
+    if not config.training_config.add_time_based_features:
+        return read
+
+    logger.info('Creating time-based features')
+    training_data = TimeSeriesFeaturesGenerator(
+        config.training_config.time_series_features,
+        calendar_features=config.training_config.calendar_features,
+    ).create_time_features(read)
+    logger.info(f'Successfully created time-based features: {training_data.shape}')
+    return training_data
+
 
-    # Create time-based features if enabled
-    if training_config.add_time_based_features:
-        logger.info('Creating time-based features')
-        training_data = TimeSeriesFeaturesGenerator.create_time_features(training_data)
-        logger.info(f'Successfully created time-based features: {training_data.shape}')
+def _incremental_config(state_path: Path) -> dict:
+    # The incremental training continues from the saved model, so it is an input too
+    if not config.training_config.incremental_training:
+        return {'incremental_training': False}
+    return {
+        'incremental_training': True,
+        'incremental_update_mode': config.training_config.incremental_update_mode,
+        'incremental_n_estimators': config.training_config.incremental_n_estimators,
+        'full_fit_every_days': config.training_config.full_fit_every_days,
+        'drift_tolerance': config.training_config.drift_tolerance,
+        'today': date.today().isoformat(),
+        'state': state_path.read_text() if state_path.exists() else None,
+    }
+
+
+def build_stages() -> list[Stage]:
+    """
+    The stages of the configured model.
+
+    Reading always runs (the training data cache keeps it cheap), the stages after
+    it are skipped when their inputs, settings and code did not change. Tuning is
+    a lazy input of the fit, so it only runs for a full fit.
+    """
+    # The feature view is an external source, its data is addressed by its content
+    read = Stage('read', read_training_data, cache=False)
+
+    if config.training_config.model_name == 'sarima':
+        from models import sarima_model
+
+        # SARIMA only uses the series itself, not the time-based features
+        return [
+            read,
+            Stage(
+                'fit',
+                lambda read: train_sarima_model(read),
+                inputs=('read',),
+                config={
+                    'column': config.training_config.sarima_column,
+                    'order': config.training_config.sarima_order,
+                    'seasonal_order': config.training_config.sarima_seasonal_order,
+                    **_incremental_config(_model_dir() / SARIMA_STATE_FILE),
+                },
+                code=(sarima_model, model_state),
+            ),
+        ]
+
+    from models import xgboost_model
+
+    labels = config.training_config.get_label_columns()
+    profile = config.training_config.get_training_profile()
+    return [
+        read,
+        Stage(
+            'features',
+            create_features,
+            inputs=('read',),
+            config={
+                'add_time_based_features': config.training_config.add_time_based_features,
+                'time_series_features': config.training_config.time_series_features,
+                'calendar_features': config.training_config.calendar_features,
+            },
+            code=(time_series_features,),
+        ),
+        Stage(
+            'tune',
+            lambda features: tune_xgboost_model(features),
+            inputs=('features',),
+            config={
+                'labels': labels,
+                'profile': profile,
+                'hyperparameter_tuning': config.training_config.hyperparameter_tuning,
+                'search_trials': config.training_config.hyperparameter_tuning_search_trials,
+                'n_splits': config.training_config.hyperparameter_tuning_n_splits,
+                'n_workers': config.training_config.hyperparameter_tuning_n_workers,
+                'pruner': config.training_config.hyperparameter_tuning_pruner,
+                'n_estimators_mode': config.training_config.hyperparameter_tuning_n_estimators_mode,
+                'max_n_estimators': config.training_config.hyperparameter_tuning_max_n_estimators,
+            },
+            code=(xgboost_model,),
+        ),
+        Stage(
+            'fit',
+            lambda features, tune: train_xgboost_model(features, tune),
+            inputs=('features',),
+            lazy_inputs=('tune',),
+            config={
+                'labels': labels,
+                'profile': profile,
+                **_incremental_config(_model_dir() / XGBOOST_STATE_FILE),
+            },
+            code=(xgboost_model, model_state),
+        ),
+    ]
+
+
+def pipeline():
+    if config.training_config.model_name not in ('xgbosst', 'sarima'):
+        logger.warning(
+            f'Training {config.training_config.model_name} is not implemented yet'
+        )
+        return
+
+    metrics_dir = Path(__file__).parent / config.training_config.metrics_dir
+    instrumentation.configure(
+        'training-pipeline',
+        profile_dir=metrics_dir / 'profiles'
+        if config.training_config.profile_stages
+        else None,
+    )
+    runner = DagRunner(
+        build_stages(),
+        cache_dir=Path(__file__).parent / config.training_config.stage_cache_dir
+        if config.training_config.stage_cache
+        else None,
+        keep=config.training_config.stage_cache_keep,
+    )
+    try:
+        if runner.run(['read'])['read'].is_empty():
+            logger.warning('No training data in the configured time range')
+            return
+
+        logger.info(f'Training the {config.training_config.model_name} model')
+        trained = runner.run(['fit'])['fit']
+    finally:
+        instrumentation.write_report(metrics_dir)
+    if trained is None:
+        return
+
+    model, state = trained
+    model_dir = _model_dir()
+    model.save(model_dir)
+    state.save(
+        model_dir / SARIMA_STATE_FILE
+        if config.training_config.model_name == 'sarima'
+        else model_dir / XGBOOST_STATE_FILE
+    )
+    logger.info(f'Successfully trained the {config.training_config.model_name} model')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,5 @@
+import os
+
+# Dummy credentials, the tests never talk to Hopsworks
+os.environ.setdefault('API_KEY', 'test')
+os.environ.setdefault('PROJECT_NAME', 'test')
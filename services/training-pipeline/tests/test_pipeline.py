@@ -0,0 +1,16 @@
+from benchmarks.synthetic_data import generate_feature_view_data
+from config import config
+from pipeline import _split_training_data
+
+
+def test_training_data_is_split_in_time_order(monkeypatch):
+    monkeypatch.setattr(config.training_config, 'label_horizons', [1])
+    # Ordered by station like the local feature store, not by date
+    data = generate_feature_view_data(3, 20).sort('station_id', 'date')
+
+    dates, X, Y = _split_training_data(data)
+
+    assert dates.is_sorted()
+    expected = data.sort('date', 'station_id')
+    assert X.get_column('tsun').equals(expected.get_column('tsun'))
+    assert Y.get_column('tsun_label').equals(expected.get_column('tsun_label'))
@@ -0,0 +1,80 @@
+import polars as pl
+import pytest
+from benchmarks.synthetic_data import generate_feature_view_data
+from config.config import TimeSeriesFeatureSpec
+from utils.time_series_features import TimeSeriesFeaturesGenerator
+
+N_HISTORY_DAYS = 60
+N_NEW_DAYS = 3
+
+
+@pytest.fixture
+def engine() -> TimeSeriesFeaturesGenerator:
+    return TimeSeriesFeaturesGenerator(
+        [
+            TimeSeriesFeatureSpec(
+                columns=['tavg', 'tsun'],
+                lags=[1, 7],
+                rolling_windows=[7, 30],
+                rolling_stats=['mean', 'std', 'min', 'max'],
+                ewm_spans=[7],
+                ewm_stats=['mean', 'std'],
+            ),
+        ],
+        calendar_features=['day_of_year', 'solar_declination'],
+    )
+
+
+@pytest.fixture
+def data() -> pl.DataFrame:
+    # Whole numbers, like the feature pipeline stores them
+    return generate_feature_view_data(4, N_HISTORY_DAYS + N_NEW_DAYS).with_columns(
+        pl.col(pl.Float32).round(0)
+    )
+
+
+def _days(data: pl.DataFrame) -> pl.Series:
+    return data.get_column('date').unique().sort()
+
+
+def test_appended_days_equal_the_full_recompute(engine, data, tmp_path):
+    days = _days(data)
+    engine.create_time_features(
+        data.filter(pl.col('date') < days[N_HISTORY_DAYS]), state_dir=tmp_path
+    )
+
+    for day in days[N_HISTORY_DAYS:]:
+        full = engine.create_time_features(data.filter(pl.col('date') <= day)).filter(
+            pl.col('date') == day
+        )
+        incremental = engine.update_time_features(
+            data.filter(pl.col('date') == day), tmp_path
+        )
+
+        assert incremental.equals(full), f'Features of {day} differ'
+
+
+def test_several_appended_days_at_once_equal_the_full_recompute(engine, data, tmp_path):
+    first_new_day = _days(data)[N_HISTORY_DAYS]
+    engine.create_time_features(
+        data.filter(pl.col('date') < first_new_day), state_dir=tmp_path
+    )
+
+    full = engine.create_time_features(data).filter(pl.col('date') >= first_new_day)
+    incremental = engine.update_time_features(
+        data.filter(pl.col('date') >= first_new_day), tmp_path
+    )
+
+    assert incremental.equals(full)
+
+
+def test_days_already_in_the_state_are_skipped(engine, data, tmp_path):
+    first_new_day = _days(data)[N_HISTORY_DAYS]
+    engine.create_time_features(
+        data.filter(pl.col('date') < first_new_day), state_dir=tmp_path
+    )
+    engine.update_time_features(data.filter(pl.col('date') == first_new_day), tmp_path)
+
+    assert engine.update_time_features(
+        data.filter(pl.col('date') <= first_new_day), tmp_path
+    ).is_empty()
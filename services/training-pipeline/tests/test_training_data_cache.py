@@ -0,0 +1,49 @@
+import polars as pl
+import pytest
+from training_data_cache import TrainingDataCache, TrainingDataKey
+
+DATA = pl.DataFrame({'tsun': list(range(10_000)), 'tsun_label': list(range(10_000))})
+
+
+def _key(version: int) -> TrainingDataKey:
+    return TrainingDataKey('basic_solar_features', version, None, None, 'tsun_label')
+
+
+@pytest.fixture
+def entry_size_mb(tmp_path) -> float:
+    file_path = tmp_path / 'entry.arrow'
+    DATA.write_ipc(file_path, compression='uncompressed')
+    return file_path.stat().st_size / 1024 / 1024
+
+
+def test_entry_is_served_while_the_commit_is_the_latest(tmp_path):
+    cache = TrainingDataCache(str(tmp_path / 'cache'))
+    cache.put(_key(1), DATA, latest_commit='1')
+
+    assert cache.get(_key(1), latest_commit='1').equals(DATA)
+    # The index is persisted, so another run sees the entry
+    assert TrainingDataCache(str(tmp_path / 'cache')).get(_key(1), '1').equals(DATA)
+
+
+def test_entry_is_invalidated_by_a_new_commit(tmp_path):
+    cache = TrainingDataCache(str(tmp_path / 'cache'))
+    cache.put(_key(1), DATA, latest_commit='1')
+
+    assert cache.get(_key(1), latest_commit='2') is None
+    # The stale entry is evicted, it is not served for its old commit either
+    assert cache.get(_key(1), latest_commit='1') is None
+    assert not list((tmp_path / 'cache').glob('*.arrow'))
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, entry_size_mb):
+    cache = TrainingDataCache(str(tmp_path / 'cache'), max_size_mb=2.5 * entry_size_mb)
+    cache.put(_key(1), DATA, latest_commit='1')
+    cache.put(_key(2), DATA, latest_commit='1')
+    # Reading the first entry makes the second the least recently used
+    assert cache.get(_key(1), latest_commit='1') is not None
+
+    cache.put(_key(3), DATA, latest_commit='1')
+
+    assert cache.get(_key(1), latest_commit='1') is not None
+    assert cache.get(_key(2), latest_commit='1') is None
+    assert cache.get(_key(3), latest_commit='1') is not None
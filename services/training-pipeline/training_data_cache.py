@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional
+
+import polars as pl
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class TrainingDataKey:
+    feature_view_name: str
+    feature_view_version: int
+    start_datetime: Optional[str]
+    end_datetime: Optional[str]
+    label: str
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(
+            json.dumps(asdict(self), sort_keys=True).encode()
+        ).hexdigest()[:32]
+
+
+class TrainingDataCache:
+    """
+    A local cache of training datasets, stored as uncompressed Arrow IPC files.
+
+    An entry is keyed by the feature view, its version, the time range and the label,
+    and remembers the latest commit of the feature group it was read at. It is only
+    served while that commit is still the latest one. Without commit information
+    (feature groups without time travel) an entry is served for `max_age_hours`.
+    Reads memory-map the file, so a cache hit costs milliseconds. Once the cache is
+    larger than `max_size_mb`, the least recently used entries are evicted.
+
+    Layout:
+        <cache_dir>/<key digest>.arrow
+        <cache_dir>/_index.json
+    """
+
+    def __init__(
+        self, cache_dir: str, max_size_mb: float = 2048, max_age_hours: float = 24
+    ):
+        """
+        Set up the cache
+
+        Args:
+            cache_dir (str): The cache directory, relative to the service directory
+            max_size_mb (float): The size the cache is evicted down to
+            max_age_hours (float): How long an entry without commit information is
+                served
+        """
+        self._cache_dir = Path(Path(__file__).parent / cache_dir)
+        self._index_path = self._cache_dir / '_index.json'
+        self._max_size_bytes = max_size_mb * 1024 * 1024
+        self._max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+
+        if self._index_path.exists():
+            with self._index_path.open('r') as f:
+                self._index: dict[str, dict] = json.load(f)
+        else:
+            self._index = {}
+
+    def _entry_path(self, digest: str) -> Path:
+        return self._cache_dir / f'{digest}.arrow'
+
+    def get(
+        self, key: TrainingDataKey, latest_commit: Optional[str]
+    ) -> Optional[pl.DataFrame]:
+        """
+        Get a cached training dataset
+
+        Args:
+            key (TrainingDataKey): The key of the training dataset
+            latest_commit (Optional[str]): The latest commit of the feature group, None
+                if unknown
+
+        Returns:
+            Optional[pl.DataFrame]: The memory-mapped training dataset, None on a miss
+        """
+        with self._lock:
+            entry = self._index.get(key.digest)
+            file_path = self._entry_path(key.digest)
+            if entry is None or not file_path.exists():
+                logger.info(f'Training data cache miss for {key}')
+                return None
+
+            if latest_commit is None:
+                is_valid = time.time() - entry['created_at'] <= self._max_age_seconds
+            else:
+                is_valid = entry['commit'] == latest_commit
+            if not is_valid:
+                logger.info(f'Training data cache entry for {key} is stale')
+                self._evict(key.digest)
+                self._write_index()
+                return None
+
+            entry['last_accessed'] = time.time()
+            self._write_index()
+
+        logger.info(f'Training data cache hit for {key}')
+        return pl.read_ipc(file_path, memory_map=True)
+
+    def put(
+        self, key: TrainingDataKey, data: pl.DataFrame, latest_commit: Optional[str]
+    ) -> None:
+        """
+        Cache a training dataset and evict the least recently used entries
+
+        Args:
+            key (TrainingDataKey): The key of the training dataset
+            data (pl.DataFrame): The training dataset, features and labels
+            latest_commit (Optional[str]): The latest commit of the feature group, None
+                if unknown
+        """
+        with self._lock:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            file_path = self._entry_path(key.digest)
+
+            # Uncompressed, so the file can be memory-mapped on read
+            tmp_path = file_path.with_suffix('.tmp')
+            data.write_ipc(tmp_path, compression='uncompressed')
+            os.replace(tmp_path, file_path)
+
+            now = time.time()
+            self._index[key.digest] = {
+                **asdict(key),
+                'commit': latest_commit,
+                'size_bytes': file_path.stat().st_size,
+                'created_at': now,
+                'last_accessed': now,
+            }
+
+            total_size = sum(entry['size_bytes'] for entry in self._index.values())
+            for digest, entry in sorted(
+                self._index.items(), key=lambda item: item[1]['last_accessed']
+            ):
+                if total_size <= self._max_size_bytes or digest == key.digest:
+                    break
+                total_size -= entry['size_bytes']
+                self._evict(digest)
+
+            self._write_index()
+
+    def _evict(self, digest: str) -> None:
+        entry = self._index.pop(digest)
+        self._entry_path(digest).unlink(missing_ok=True)
+        logger.info(
+            f'Evicted training data of {entry["feature_view_name"]} version {entry["feature_view_version"]} from the cache'
+        )
+
+    def _write_index(self) -> None:
+        tmp_path = self._index_path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(self._index, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self._index_path)
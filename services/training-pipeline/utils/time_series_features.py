@@ -1,36 +1,461 @@
-import pandas as pd
+import hashlib
+import json
+import math
+import os
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+import polars as pl
+from config.config import TimeSeriesFeatureSpec
 from loguru import logger
 
+# Marks the rows a feature computation is for, as opposed to the persisted context
+NEW_ROW_COLUMN = '__is_new'
+
 
 class TimeSeriesFeaturesGenerator:
-    """Utility class for generating time-based features for solar data"""
+    """
+    Declarative time series feature engine for the solar data.
+
+    Every feature is a Polars expression evaluated per station, and all of them are
+    added in a single lazy query, so Polars computes them in one pass over the data
+    sorted by station and date. Rolling windows are in days (based on the date
+    column, so missing days are not counted), lags are in observations of the same
+    station.
+
+    Features can also be computed incrementally (`update_time_features`): the tail
+    of every station that the lags and rolling windows still reach, and the last
+    moments of the exponentially weighted statistics, are persisted between runs,
+    so new days only cost O(window) per station.
+
+    Feature names:
+        <column>_lag_<n>
+        <column>_rolling_<stat>_<window>d
+        <column>_ewm_<stat>_<span>
+        day_of_year_sin, day_of_year_cos, solar_declination
+
+    State layout:
+        <state_dir>/tails.parquet
+        <state_dir>/ewm_moments.parquet
+        <state_dir>/_state.json
+    """
+
+    def __init__(
+        self,
+        specs: Sequence[TimeSeriesFeatureSpec],
+        calendar_features: Sequence[str] = (),
+        datetime_column: str = 'date',
+        group_by: str = 'station_id',
+    ):
+        """
+        Set up the feature engine
+
+        Args:
+            specs (Sequence[TimeSeriesFeatureSpec]): The features per group of columns
+            calendar_features (Sequence[str]): The calendar encodings of the date
+            datetime_column (str): The name of the date column
+            group_by (str): The column the time series are grouped by
+        """
+        self.specs = specs
+        self.calendar_features = calendar_features
+        self.datetime_column = datetime_column
+        self.group_by = group_by
+
+    def _lag(self, column: str, lag: int) -> pl.Expr:
+        return (
+            pl.col(column).shift(lag).over(self.group_by).alias(f'{column}_lag_{lag}')
+        )
+
+    def _rolling(self, column: str, stat: str, window: int) -> pl.Expr:
+        def rolling(expr: pl.Expr, stat: str) -> pl.Expr:
+            return getattr(expr, f'rolling_{stat}_by')(
+                self.datetime_column, window_size=f'{window}d'
+            ).over(self.group_by)
+
+        if stat in ('min', 'max'):
+            expr = rolling(pl.col(column), stat)
+        else:
+            # Window sums in float64 rather than Polars' online variance, so the
+            # value only depends on the rows in the window (exact for whole numbers)
+            value = pl.col(column).cast(pl.Float64)
+            expr = rolling(value, 'mean')
+            if stat == 'std':
+                count = rolling(value.is_not_null().cast(pl.Float64), 'sum')
+                variance = (rolling(value.pow(2), 'mean') - expr.pow(2)) * (
+                    count / (count - 1)
+                )
+                expr = pl.when(count > 1).then(variance.clip(lower_bound=0).sqrt())
+        return expr.alias(f'{column}_rolling_{stat}_{window}d')
 
     @staticmethod
+    def _moment_column(column: str, power: int, span: int) -> str:
+        return f'__{column}_ewm_m{power}_{span}'
+
+    def _ewm_moment(
+        self, value: pl.Expr, column: str, power: int, span: int
+    ) -> pl.Expr:
+        return (
+            value.ewm_mean(span=span, adjust=False, ignore_nulls=True)
+            .over(self.group_by)
+            .alias(self._moment_column(column, power, span))
+        )
+
+    def _ewm(self, column: str, stat: str, span: int, inline: bool) -> pl.Expr:
+        """The ewm statistic, from the moments computed inline or by an earlier step"""
+
+        def moment(power: int) -> pl.Expr:
+            if inline:
+                return self._ewm_moment(pl.col(column).pow(power), column, power, span)
+            return pl.col(self._moment_column(column, power, span))
+
+        if stat == 'mean':
+            expr = moment(1)
+        else:
+            # Biased standard deviation from the weighted first and second moments,
+            # two recursive means, so it can be carried forward from its last value
+            expr = (moment(2) - moment(1).pow(2)).clip(lower_bound=0).sqrt()
+        return expr.alias(f'{column}_ewm_{stat}_{span}')
+
+    def _calendar(self, name: str) -> list[pl.Expr]:
+        day_of_year = pl.col(self.datetime_column).dt.ordinal_day()
+        if name == 'day_of_year':
+            angle = 2 * math.pi * day_of_year / 365.25
+            return [
+                angle.sin().alias('day_of_year_sin'),
+                angle.cos().alias('day_of_year_cos'),
+            ]
+
+        # Cooper's approximation, in degrees. It only depends on the date; the
+        # stations have no latitude in the feature view to derive day length from.
+        return [
+            (23.45 * (2 * math.pi * (284 + day_of_year) / 365).sin()).alias(
+                'solar_declination'
+            )
+        ]
+
+    def _moments(self) -> list[tuple[str, int, int]]:
+        """Get the (column, power, span) of the moments the ewm statistics need"""
+        moments = []
+        for spec in self.specs:
+            for column in spec.columns:
+                for span in spec.ewm_spans:
+                    powers = [1, 2] if 'std' in spec.ewm_stats else [1]
+                    moments += [(column, power, span) for power in powers]
+        return moments
+
+    def _window_expressions(self) -> list[pl.Expr]:
+        expressions = []
+        for spec in self.specs:
+            for column in spec.columns:
+                expressions += [self._lag(column, lag) for lag in spec.lags]
+                expressions += [
+                    self._rolling(column, stat, window)
+                    for window in spec.rolling_windows
+                    for stat in spec.rolling_stats
+                ]
+        return expressions
+
+    def _ewm_expressions(self, inline: bool) -> list[pl.Expr]:
+        return [
+            self._ewm(column, stat, span, inline)
+            for spec in self.specs
+            for column in spec.columns
+            for span in spec.ewm_spans
+            for stat in spec.ewm_stats
+        ]
+
+    def _calendar_expressions(self) -> list[pl.Expr]:
+        return [
+            expression
+            for name in self.calendar_features
+            for expression in self._calendar(name)
+        ]
+
+    def expressions(self) -> list[pl.Expr]:
+        """Get the expressions of all configured features, on the raw columns"""
+        return (
+            self._window_expressions()
+            + self._ewm_expressions(inline=True)
+            + self._calendar_expressions()
+        )
+
+    def _moment_expressions(self, on_moment_columns: bool = False) -> list[pl.Expr]:
+        """
+        Get the expressions of the ewm moments
+
+        Args:
+            on_moment_columns (bool): Whether the moment columns hold the inputs (the
+                persisted moments in the seed rows, the powers in the new rows)
+                instead of the raw columns
+
+        Returns:
+            list[pl.Expr]: The expressions of the moment columns
+        """
+        return [
+            self._ewm_moment(
+                pl.col(self._moment_column(column, power, span))
+                if on_moment_columns
+                else pl.col(column).pow(power),
+                column,
+                power,
+                span,
+            )
+            for column, power, span in self._moments()
+        ]
+
+    def _moment_columns(self) -> list[str]:
+        return [
+            self._moment_column(column, power, span)
+            for column, power, span in self._moments()
+        ]
+
+    def _input_columns(self) -> list[str]:
+        columns = [self.group_by, self.datetime_column]
+        for spec in self.specs:
+            columns += [column for column in spec.columns if column not in columns]
+        return columns
+
+    def _tail(self, data: pl.DataFrame) -> pl.DataFrame:
+        """Get the rows of every station that the lags and windows of new days reach"""
+        max_lag = max((lag for spec in self.specs for lag in spec.lags), default=0)
+        max_window = max(
+            (window for spec in self.specs for window in spec.rolling_windows),
+            default=0,
+        )
+        date = pl.col(self.datetime_column)
+        position_from_end = pl.int_range(pl.len()).reverse().over(self.group_by)
+
+        # The last row of a station is always kept, it holds the station's last date
+        return data.select(self._input_columns()).filter(
+            (position_from_end < max(max_lag, 1))
+            | (date > date.max().over(self.group_by) - pl.duration(days=max_window))
+        )
+
+    def _last_moments(self, data: pl.DataFrame) -> pl.DataFrame:
+        return data.group_by(self.group_by, maintain_order=True).agg(
+            pl.col(self.datetime_column).last(),
+            *[pl.col(column).last() for column in self._moment_columns()],
+        )
+
+    def _fingerprint(self) -> str:
+        definition = {
+            'specs': [spec.model_dump() for spec in self.specs],
+            'datetime_column': self.datetime_column,
+            'group_by': self.group_by,
+        }
+        return hashlib.sha256(
+            json.dumps(definition, sort_keys=True).encode()
+        ).hexdigest()
+
+    def _save_state(
+        self, state_dir: Path, tails: pl.DataFrame, moments: pl.DataFrame
+    ) -> None:
+        state_dir.mkdir(parents=True, exist_ok=True)
+        for name, data in (('tails', tails), ('ewm_moments', moments)):
+            tmp_path = state_dir / f'{name}.tmp'
+            data.write_parquet(tmp_path)
+            os.replace(tmp_path, state_dir / f'{name}.parquet')
+
+        # Written last, so a half-written state is never read
+        tmp_path = state_dir / '_state.tmp'
+        with tmp_path.open('w') as f:
+            json.dump(
+                {
+                    'fingerprint': self._fingerprint(),
+                    'n_stations': tails.get_column(self.group_by).n_unique(),
+                    'last_date': str(tails.get_column(self.datetime_column).max()),
+                },
+                f,
+                indent=4,
+            )
+        os.replace(tmp_path, state_dir / '_state.json')
+
+    def _load_state(
+        self, state_dir: Path
+    ) -> Optional[tuple[pl.DataFrame, pl.DataFrame]]:
+        state_path = state_dir / '_state.json'
+        if not state_path.exists():
+            return None
+
+        with state_path.open('r') as f:
+            state = json.load(f)
+        if state['fingerprint'] != self._fingerprint():
+            raise ValueError(
+                f'The time series feature state in {state_dir} was built with other feature specs, recompute it with create_time_features'
+            )
+
+        return (
+            pl.read_parquet(state_dir / 'tails.parquet'),
+            pl.read_parquet(state_dir / 'ewm_moments.parquet'),
+        )
+
     def create_time_features(
-        df: pd.DataFrame, datetime_column: str = 'date'
-    ) -> pd.DataFrame:
+        self,
+        df: Union[pl.DataFrame, pl.LazyFrame],
+        state_dir: Optional[Path] = None,
+    ) -> pl.DataFrame:
         """
-        Create time-based features from a datetime column
+        Create the time series features over the whole history
 
         Args:
-            df (pd.DataFrame): Input DataFrame with datetime column
-            datetime_column (date): Name of the datetime column
+            df (Union[pl.DataFrame, pl.LazyFrame]): Input data with the date and the
+                station columns
+            state_dir (Optional[Path]): Where to persist the state that
+                `update_time_features` continues from, not persisted if None
 
         Returns:
-            pl.DataFrame: DataFrame with additional time-based features
+            pl.DataFrame: The data sorted by date and station, with the features added
         """
         try:
-            # TODO: Add more time-based features
-            # First ensure your date column is set as the index and is datetime type
-            df[datetime_column] = pd.to_datetime(df[datetime_column])
+            logger.info(f'Computing {len(self.expressions())} time series features')
 
-            # Create time-based features
-            df = df.set_index(datetime_column).sort_index()
-            df['tavg_rolling_mean'] = df['tavg'].rolling('7D').mean()
-            df = df.reset_index(drop=False)
+            # The rolling windows need the dates sorted within every station
+            data = (
+                df.lazy()
+                .with_columns(pl.col(self.datetime_column).cast(pl.Date))
+                .sort(self.group_by, self.datetime_column)
+                .with_columns(*self._window_expressions(), *self._moment_expressions())
+                .with_columns(
+                    *self._ewm_expressions(inline=False),
+                    *self._calendar_expressions(),
+                )
+                .collect()
+            )
+            if state_dir is not None:
+                self._save_state(state_dir, self._tail(data), self._last_moments(data))
 
-            return df
+            # The time-based splits of the training need the rows in time order
+            return data.drop(self._moment_columns()).sort(
+                self.datetime_column, self.group_by
+            )
 
         except Exception as e:
             logger.error(f'Error creating time features: {str(e)}')
             raise
+
+    def update_time_features(
+        self, df: Union[pl.DataFrame, pl.LazyFrame], state_dir: Path
+    ) -> pl.DataFrame:
+        """
+        Create the time series features of new days from the persisted state
+
+        The lags and rolling windows are computed over the persisted tail of every
+        station and the new days, and the ewm moments continue from their persisted
+        values, so the features equal those of `create_time_features` over the whole
+        history. (The rolling mean and std are window sums, exact for the
+        whole-number values the feature pipeline stores.) Days up to the last day of
+        their station in the state are skipped. Without a state, the input is
+        treated as the whole history.
+
+        Args:
+            df (Union[pl.DataFrame, pl.LazyFrame]): The new days, with the date and the
+                station columns
+            state_dir (Path): The directory of the state, advanced past the new days
+
+        Returns:
+            pl.DataFrame: The new days sorted by date and station, with the features
+                added
+        """
+        state = self._load_state(state_dir)
+        if state is None:
+            logger.info(f'No time series feature state in {state_dir}, full compute')
+            return self.create_time_features(df, state_dir=state_dir)
+
+        try:
+            tails, moments = state
+            last_dates = tails.group_by(self.group_by).agg(
+                pl.col(self.datetime_column).max().alias('__last_date')
+            )
+            new = (
+                df.lazy()
+                .with_columns(pl.col(self.datetime_column).cast(pl.Date))
+                .join(last_dates.lazy(), on=self.group_by, how='left')
+                .filter(
+                    pl.col('__last_date').is_null()
+                    | (pl.col(self.datetime_column) > pl.col('__last_date'))
+                )
+                .drop('__last_date')
+                .sort(self.group_by, self.datetime_column)
+                .collect()
+            )
+            logger.info(f'Computing time series features of {new.height} new rows')
+
+            # Lags and rolling windows over the tail and the new days
+            context = (
+                pl.concat(
+                    [
+                        tails.with_columns(pl.lit(False).alias(NEW_ROW_COLUMN)),
+                        new.select(tails.columns).with_columns(
+                            pl.lit(True).alias(NEW_ROW_COLUMN)
+                        ),
+                    ],
+                    how='vertical_relaxed',
+                )
+                .lazy()
+                .sort(self.group_by, self.datetime_column)
+                .with_columns(self._window_expressions())
+                .collect()
+            )
+
+            # The ewm moments continue from one seed row per station holding the
+            # persisted moments, the new rows hold the powers of their values
+            seeded = (
+                pl.concat(
+                    [
+                        moments.with_columns(pl.lit(False).alias(NEW_ROW_COLUMN)),
+                        new.select(
+                            self.group_by,
+                            self.datetime_column,
+                            *[
+                                pl.col(column)
+                                .pow(power)
+                                .alias(self._moment_column(column, power, span))
+                                for column, power, span in self._moments()
+                            ],
+                            pl.lit(True).alias(NEW_ROW_COLUMN),
+                        ),
+                    ],
+                    how='vertical_relaxed',
+                )
+                .lazy()
+                .sort(self.group_by, self.datetime_column)
+                .with_columns(self._moment_expressions(on_moment_columns=True))
+                .collect()
+            )
+            new_moments = seeded.filter(pl.col(NEW_ROW_COLUMN))
+
+            features = pl.concat(
+                [
+                    new,
+                    context.filter(pl.col(NEW_ROW_COLUMN)).drop(
+                        *tails.columns, NEW_ROW_COLUMN
+                    ),
+                    new_moments.select(self._moment_columns()),
+                ],
+                how='horizontal',
+            ).with_columns(
+                *self._ewm_expressions(inline=False), *self._calendar_expressions()
+            )
+
+            if not new.is_empty():
+                # Stations without new days keep their moments
+                updated_moments = pl.concat(
+                    [
+                        moments.join(
+                            new.select(self.group_by).unique(),
+                            on=self.group_by,
+                            how='anti',
+                        ),
+                        self._last_moments(new_moments),
+                    ],
+                    how='vertical_relaxed',
+                )
+                self._save_state(state_dir, self._tail(context), updated_moments)
+
+            return features.drop(self._moment_columns()).sort(
+                self.datetime_column, self.group_by
+            )
+
+        except Exception as e:
+            logger.error(f'Error updating time features: {str(e)}')
+            raise